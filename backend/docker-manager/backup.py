@@ -0,0 +1,557 @@
+import asyncio
+import io
+import os
+import tarfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from fnmatch import fnmatch
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from chunk_store import BACKUP_CHUNK_SIZE, ChunkStore, fixed_pieces, is_region_file, manifest_keys, region_pieces
+from container_config import (
+    build_container_config, build_server_properties_archive, container_name, data_volume_name
+)
+from docker_client import DockerClient, DockerError, run
+from players import server_address
+from rcon import RconError
+from rcon_pool import get_rcon_pool
+
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', '7'))
+BACKUP_TIMEOUT = float(os.environ.get('BACKUP_TIMEOUT', '1800'))
+# Верхний уровень /data, который не нужен для восстановления: образ itzg скачает его заново
+BACKUP_EXCLUDE = [
+    pattern.strip() for pattern in
+    os.environ.get('BACKUP_EXCLUDE', 'logs,crash-reports,debug,libraries,versions,cache,.cache,*.jar,bedrock-server-*').split(',')
+    if pattern.strip()
+]
+RESTORE_BATCH_BYTES = int(os.environ.get('RESTORE_BATCH_BYTES', str(64 * 1024 * 1024)))
+
+DATA_PATH = '/data'
+TAR_BLOCK = 512
+ZERO_BLOCK = b'\0' * TAR_BLOCK
+MINECRAFT_UID = 1000
+
+
+class BackupError(Exception):
+    """Бэкап не найден или Docker не отдал/не принял данные"""
+
+
+class TarReader:
+    """
+    Разбор tar из GET /containers/{id}/archive по кускам, без буферизации архива: feed возвращает
+    события ('member', описание), ('data', байты) и ('end', описание). Docker пишет длинные имена
+    заголовками PAX, поэтому поддерживаются PAX ('x') и длинные имена GNU ('L').
+    """
+
+    def __init__(self) -> None:
+        self.finished = False
+        self._buffer = bytearray()
+        self._remaining = 0
+        self._padding = 0
+        self._member: Optional[Dict[str, Any]] = None
+        self._meta: Optional[bytes] = None
+        self._meta_data = bytearray()
+        self._overrides: Dict[str, str] = {}
+
+    def feed(self, data: bytes) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        buffer = self._buffer
+        buffer += data
+        position = 0
+        while True:
+            if self._remaining:
+                take = min(self._remaining, len(buffer) - position)
+                if take == 0:
+                    break
+                piece = bytes(buffer[position:position + take])
+                position += take
+                self._remaining -= take
+                if self._meta is not None:
+                    self._meta_data += piece
+                elif self._member is not None:
+                    events.append(('data', piece))
+                if not self._remaining:
+                    self._finish(events)
+                continue
+            if self._padding:
+                take = min(self._padding, len(buffer) - position)
+                if take == 0:
+                    break
+                position += take
+                self._padding -= take
+                continue
+            if self.finished or len(buffer) - position < TAR_BLOCK:
+                break
+
+            header = bytes(buffer[position:position + TAR_BLOCK])
+            position += TAR_BLOCK
+            if header == ZERO_BLOCK:
+                self.finished = True
+                continue
+            try:
+                info = tarfile.TarInfo.frombuf(header, 'utf-8', 'surrogateescape')
+            except tarfile.HeaderError as e:
+                raise BackupError(f'Bad tar header: {e}')
+
+            if info.type in (tarfile.GNUTYPE_LONGNAME, tarfile.XHDTYPE, tarfile.XGLTYPE):
+                self._meta = info.type
+                self._meta_data = bytearray()
+                size = info.size
+            else:
+                overrides, self._overrides = self._overrides, {}
+                size = int(overrides.get('size', info.size))
+                self._member = {
+                    'name': overrides.get('path', info.name),
+                    'type': 'dir' if info.isdir() else 'file' if info.isfile() else 'symlink' if info.issym() else 'other',
+                    'size': size,
+                    'mode': info.mode,
+                    'mtime': int(float(overrides.get('mtime', info.mtime))),
+                    'linkname': overrides.get('linkpath', info.linkname)
+                }
+                events.append(('member', self._member))
+            self._remaining = size
+            self._padding = (-size) % TAR_BLOCK
+            if not size:
+                self._finish(events)
+        del buffer[:position]
+        return events
+
+    def _finish(self, events: List[Tuple[str, Any]]) -> None:
+        if self._meta == tarfile.GNUTYPE_LONGNAME:
+            self._overrides['path'] = bytes(self._meta_data).rstrip(b'\0').decode('utf-8', 'surrogateescape')
+        elif self._meta == tarfile.XHDTYPE:
+            self._overrides.update(parse_pax(bytes(self._meta_data)))
+        elif self._member is not None:
+            events.append(('end', self._member))
+        self._meta = None
+        self._member = None
+
+
+def parse_pax(data: bytes) -> Dict[str, str]:
+    """Записи PAX вида «длина ключ=значение\\n»"""
+    records = {}
+    position = 0
+    while position < len(data):
+        space = data.find(b' ', position)
+        if space < 0:
+            break
+        length = int(data[position:space])
+        key, _, value = data[space + 1:position + length - 1].partition(b'=')
+        records[key.decode('utf-8')] = value.decode('utf-8', 'surrogateescape')
+        position += length
+    return records
+
+
+def is_excluded(path: str, exclude: List[str]) -> bool:
+    top = path.split('/', 1)[0]
+    return any(fnmatch(top, pattern) for pattern in exclude)
+
+
+class SnapshotWriter:
+    """
+    Файлы из TarReader — в ChunkStore. Регионы (.mca) режутся по чанкам Minecraft и буферизуются
+    по одному файлу (обычно единицы МБ); остальные файлы — кусками BACKUP_CHUNK_SIZE по мере чтения.
+    """
+
+    def __init__(self, store: ChunkStore, exclude: List[str], chunk_size: int = BACKUP_CHUNK_SIZE) -> None:
+        self.store = store
+        self.exclude = exclude
+        self.chunk_size = chunk_size
+        self.files: List[Dict[str, Any]] = []
+        self.dirs: List[Dict[str, Any]] = []
+        self.symlinks: List[Dict[str, Any]] = []
+        self.stats = {'files': 0, 'bytes': 0, 'chunks': 0, 'newChunks': 0, 'newBytes': 0, 'storedBytes': 0, 'excluded': 0}
+        self._current: Optional[Dict[str, Any]] = None
+        self._region = False
+        self._buffer = bytearray()
+
+    def handle(self, events: List[Tuple[str, Any]]) -> None:
+        for kind, value in events:
+            if kind == 'data':
+                if self._current is not None:
+                    self._buffer += value
+                    if not self._region and len(self._buffer) >= self.chunk_size:
+                        self._flush_fixed(final=False)
+            elif kind == 'member':
+                self._start(value)
+            elif self._current is not None:
+                if self._region:
+                    data = bytes(self._buffer)
+                    for start, end in region_pieces(data):
+                        self._put(data[start:end])
+                else:
+                    self._flush_fixed(final=True)
+                self.files.append(self._current)
+                self.stats['files'] += 1
+                self._current = None
+                self._buffer = bytearray()
+
+    def _start(self, member: Dict[str, Any]) -> None:
+        # Docker отдаёт /data как каталог data/ — пути в манифесте относительно /data
+        path = member['name'].split('/', 1)[1] if '/' in member['name'] else ''
+        path = path.rstrip('/')
+        if not path:
+            return
+        if is_excluded(path, self.exclude):
+            self.stats['excluded'] += 1
+            return
+        if member['type'] == 'dir':
+            self.dirs.append({'path': path, 'mode': member['mode'], 'mtime': member['mtime']})
+        elif member['type'] == 'symlink':
+            self.symlinks.append({'path': path, 'target': member['linkname']})
+        elif member['type'] == 'file':
+            self._current = {'path': path, 'mode': member['mode'], 'mtime': member['mtime'],
+                             'size': member['size'], 'pieces': []}
+            self._region = is_region_file(path)
+            self._buffer = bytearray()
+
+    def _flush_fixed(self, final: bool) -> None:
+        size = self.chunk_size
+        data = bytes(self._buffer)
+        end = len(data) if final else len(data) - len(data) % size
+        for start, stop in fixed_pieces(end, size):
+            self._put(data[start:stop])
+        self._buffer = bytearray(data[end:])
+
+    def _put(self, data: bytes) -> None:
+        key, new, stored = self.store.put(data)
+        self._current['pieces'].append([key, len(data)])
+        self.stats['chunks'] += 1
+        self.stats['bytes'] += len(data)
+        if new:
+            self.stats['newChunks'] += 1
+            self.stats['newBytes'] += len(data)
+            self.stats['storedBytes'] += stored
+
+    @property
+    def incomplete(self) -> bool:
+        return self._current is not None
+
+    def manifest(self) -> Dict[str, Any]:
+        return {'format': 1, 'files': self.files, 'dirs': self.dirs, 'symlinks': self.symlinks}
+
+
+@asynccontextmanager
+async def quiesced(client: DockerClient, server: Dict[str, Any], docker_host: str,
+                   state: Dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Согласованный снимок мира на время чтения архива. Java с RCON: save-off и save-all flush —
+    сервер сбрасывает чанки на диск и не пишет регионы, пока архив читается. Иначе (Bedrock, RCON
+    недоступен) контейнер замораживается. Остановленный контейнер снимается как есть.
+    """
+    if not state.get('Running'):
+        yield 'stopped'
+        return
+    if state.get('Paused'):
+        yield 'paused'
+        return
+
+    name = container_name(server['id'])
+    if server['edition'] == 'java' and server.get('rcon_port') and server.get('rcon_password'):
+        pool = get_rcon_pool()
+        host = server_address(server.get('docker_url'), docker_host)
+        try:
+            await pool.command(host, server['rcon_port'], server['rcon_password'], 'save-off')
+            await pool.command(host, server['rcon_port'], server['rcon_password'], 'save-all flush', timeout=120)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError):
+            pass
+        else:
+            try:
+                yield 'save-off'
+            finally:
+                try:
+                    await pool.command(host, server['rcon_port'], server['rcon_password'], 'save-on')
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError):
+                    pass
+            return
+
+    await client.container_action(name, 'pause', timeout=30)
+    try:
+        yield 'paused'
+    finally:
+        await client.container_action(name, 'unpause', timeout=30)
+
+
+async def snapshot_container(client: DockerClient, ref: str, store: ChunkStore,
+                             exclude: Optional[List[str]] = None,
+                             on_progress: Optional[Callable[[int], None]] = None) -> SnapshotWriter:
+    """Прочитать /data контейнера одним потоком archive и разложить файлы по кускам в хранилище"""
+    reader = TarReader()
+    writer = SnapshotWriter(store, BACKUP_EXCLUDE if exclude is None else exclude)
+    received = [0]
+
+    async def on_chunk(piece: bytes) -> None:
+        writer.handle(reader.feed(piece))
+        received[0] += len(piece)
+        if on_progress:
+            on_progress(received[0])
+
+    await client.get_archive(ref, DATA_PATH, on_chunk, timeout=BACKUP_TIMEOUT)
+    if not reader.finished or writer.incomplete:
+        raise BackupError('Archive stream ended in the middle of a file')
+    return writer
+
+
+class _PieceReader:
+    """Файл из кусков хранилища для tarfile.addfile: читается по куску, не целиком"""
+
+    def __init__(self, store: ChunkStore, pieces: List[List[Any]]) -> None:
+        self.store = store
+        self.pieces = list(pieces)
+        self._current = b''
+
+    def read(self, size: int = -1) -> bytes:
+        # tarfile.copyfileobj считает короткое чтение концом данных, поэтому буфер добирается до size
+        while (size < 0 or len(self._current) < size) and self.pieces:
+            key, _ = self.pieces.pop(0)
+            self._current += self.store.get(key)
+        if size < 0:
+            size = len(self._current)
+        data, self._current = self._current[:size], self._current[size:]
+        return data
+
+
+def restore_batches(store: ChunkStore, manifest: Dict[str, Any],
+                    batch_bytes: int = RESTORE_BATCH_BYTES) -> Iterator[bytes]:
+    """
+    Tar-архивы для PUT /archive не больше batch_bytes данных: каталоги в первом, затем файлы и ссылки.
+    Генератор: следующий архив собирается только после отправки предыдущего, в памяти один архив.
+    """
+    def new_archive() -> Tuple[io.BytesIO, tarfile.TarFile]:
+        buffer = io.BytesIO()
+        return buffer, tarfile.open(fileobj=buffer, mode='w', format=tarfile.PAX_FORMAT)
+
+    def member(path: str, kind: bytes, mode: int, mtime: int, size: int = 0) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(path)
+        info.type = kind
+        info.mode = mode & 0o7777
+        info.mtime = mtime
+        info.size = size
+        info.uid = info.gid = MINECRAFT_UID
+        return info
+
+    buffer, archive = new_archive()
+    pending = 0
+    for entry in manifest['dirs']:
+        archive.addfile(member(entry['path'], tarfile.DIRTYPE, entry['mode'], entry['mtime']))
+    for entry in manifest['files']:
+        archive.addfile(member(entry['path'], tarfile.REGTYPE, entry['mode'], entry['mtime'], entry['size']),
+                        _PieceReader(store, entry['pieces']))
+        pending += entry['size']
+        if pending >= batch_bytes:
+            archive.close()
+            batch = buffer.getvalue()
+            buffer, archive = new_archive()
+            pending = 0
+            yield batch
+            del batch
+    for entry in manifest['symlinks']:
+        info = member(entry['path'], tarfile.SYMTYPE, 0o777, 0)
+        info.linkname = entry['target']
+        archive.addfile(info)
+    archive.close()
+    yield buffer.getvalue()
+
+
+async def restore_into(client: DockerClient, ref: str, store: ChunkStore, manifest: Dict[str, Any]) -> int:
+    """Записать файлы бэкапа в /data контейнера (он может быть остановлен); вернуть число байт"""
+    total = 0
+    for batch in restore_batches(store, manifest):
+        await client.put_archive(ref, DATA_PATH, batch, timeout=BACKUP_TIMEOUT)
+        total += len(batch)
+        # отправленный архив не должен дожить до сборки следующего
+        del batch
+    return total
+
+
+def create_backup(conn, server_id: int, job_id: Optional[int] = None) -> int:
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO server_backups (server_id, job_id) VALUES (%s, %s) RETURNING id",
+            (server_id, job_id)
+        )
+        backup_id = cur.fetchone()[0]
+    conn.commit()
+    return backup_id
+
+
+def list_backups(cur, server_id: Any) -> List[Dict[str, Any]]:
+    cur.execute(
+        "SELECT id, status, consistency, file_count, total_bytes, chunk_count, new_chunks, new_bytes, stored_bytes, "
+        "elapsed_ms, message, created_at, finished_at FROM server_backups WHERE server_id = %s ORDER BY id DESC",
+        (server_id,)
+    )
+    return cur.fetchall()
+
+
+def run_backup(conn, client: DockerClient, server: Dict[str, Any], docker_host: str,
+               store: Optional[ChunkStore] = None, job_id: Optional[int] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Бэкап сервера: строка server_backups, согласованный снимок /data в хранилище кусков,
+    манифест и статистика, затем ротация до BACKUP_KEEP бэкапов и сборка мусора в хранилище.
+    """
+    store = store or ChunkStore()
+    backup_id = create_backup(conn, server['id'], job_id)
+    started = time.monotonic()
+    name = container_name(server['id'])
+
+    async def snapshot() -> Tuple[SnapshotWriter, str]:
+        info = await client.inspect_container(name, timeout=10)
+        async with quiesced(client, server, docker_host, info.get('State') or {}) as consistency:
+            writer = await snapshot_container(client, info['Id'], store, on_progress=on_progress)
+        return writer, consistency
+
+    try:
+        writer, consistency = run(snapshot())
+        manifest_key = store.put_manifest(writer.manifest())
+    except Exception as e:
+        message = getattr(e, 'message', None) or str(e) or type(e).__name__
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE server_backups SET status = 'failed', message = %s, finished_at = CURRENT_TIMESTAMP "
+                "WHERE id = %s",
+                (message[:1000], backup_id)
+            )
+        conn.commit()
+        raise BackupError(message)
+
+    stats = writer.stats
+    elapsed_ms = round((time.monotonic() - started) * 1000)
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE server_backups SET status = 'succeeded', manifest = %s, consistency = %s, file_count = %s, "
+            "total_bytes = %s, chunk_count = %s, new_chunks = %s, new_bytes = %s, stored_bytes = %s, "
+            "elapsed_ms = %s, finished_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (manifest_key, consistency, stats['files'], stats['bytes'], stats['chunks'], stats['newChunks'],
+             stats['newBytes'], stats['storedBytes'], elapsed_ms, backup_id)
+        )
+        cur.execute(
+            "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+            (server['id'], 'INFO', f"Backup {backup_id} completed: {stats['files']} files, "
+                                   f"{stats['newBytes'] // 1024} KB new of {stats['bytes'] // 1024} KB")
+        )
+    conn.commit()
+
+    pruned = prune_backups(conn, store, server['id'])
+    return {
+        'backupId': backup_id,
+        'consistency': consistency,
+        **stats,
+        'dedupRatio': round(stats['bytes'] / stats['newBytes'], 1) if stats['newBytes'] else None,
+        'elapsedMs': elapsed_ms,
+        'pruned': pruned
+    }
+
+
+def prune_backups(conn, store: ChunkStore, server_id: int, keep: int = BACKUP_KEEP) -> Dict[str, int]:
+    """
+    Оставить keep последних удачных бэкапов сервера (неудачные удаляются) и, если что-то удалено,
+    убрать из хранилища куски, на которые не ссылается ни один оставшийся манифест.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM server_backups WHERE server_id = %s AND status <> 'running' AND id NOT IN ("
+            "  SELECT id FROM server_backups WHERE server_id = %s AND status = 'succeeded' "
+            "  ORDER BY id DESC LIMIT %s"
+            ") RETURNING id",
+            (server_id, server_id, keep)
+        )
+        deleted = cur.rowcount
+        manifests = []
+        if deleted:
+            cur.execute("SELECT manifest FROM server_backups WHERE status = 'succeeded' AND manifest IS NOT NULL")
+            manifests = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    if not deleted:
+        return {'backups': 0, 'chunks': 0, 'bytes': 0}
+
+    live = set(manifests)
+    for key in manifests:
+        live |= manifest_keys(store.get_manifest(key))
+    removed, freed = store.sweep(live)
+    return {'backups': deleted, 'chunks': removed, 'bytes': freed}
+
+
+def run_restore(conn, client: DockerClient, server: Dict[str, Any], backup_id: int,
+                store: Optional[ChunkStore] = None) -> Dict[str, Any]:
+    """
+    Восстановить сервер из бэкапа в новый том: временный контейнер с той же конфигурацией получает
+    файлы бэкапа и server.properties, и только потом заменяет старый. Сбой до замены оставляет
+    старый контейнер и мир нетронутыми. Старый том /data удаляется после замены.
+    """
+    store = store or ChunkStore()
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT manifest FROM server_backups WHERE id = %s AND server_id = %s AND status = 'succeeded'",
+            (backup_id, server['id'])
+        )
+        row = cur.fetchone()
+    conn.commit()
+    if row is None:
+        raise BackupError(f"Backup {backup_id} of server {server['id']} not found")
+    manifest = store.get_manifest(row['manifest'])
+
+    name = container_name(server['id'])
+    temp_name = f'{name}-restore'
+    volume = f"{data_volume_name(server['id'])}-{uuid.uuid4().hex[:8]}"
+
+    async def restore() -> Dict[str, Any]:
+        try:
+            old = await client.inspect_container(name, timeout=10)
+        except DockerError as e:
+            if e.status != 404:
+                raise
+            old = None
+        try:
+            await client.remove_container(temp_name, force=True)
+        except DockerError as e:
+            if e.status != 404:
+                raise
+
+        config = build_container_config(server)
+        old_binds = ((old or {}).get('HostConfig') or {}).get('Binds') or []
+        config['HostConfig']['Binds'] = [bind for bind in old_binds if bind.split(':')[1:2] != [DATA_PATH]]
+        config['HostConfig']['Binds'].append(f'{volume}:{DATA_PATH}')
+        created = await client.create_container(temp_name, config, timeout=30)
+        try:
+            written = await restore_into(client, created['Id'], store, manifest)
+            await client.put_archive(created['Id'], DATA_PATH, build_server_properties_archive(server), timeout=30)
+        except BaseException:
+            await client.remove_container(created['Id'], force=True)
+            await client.remove_volume(volume)
+            raise
+
+        was_running = bool(old and (old.get('State') or {}).get('Running'))
+        old_volumes = []
+        if old is not None:
+            old_volumes = [mount['Name'] for mount in old.get('Mounts') or []
+                           if mount.get('Type') == 'volume' and mount.get('Destination') == DATA_PATH and mount.get('Name')]
+            # v=1 удаляет и анонимный том /data из VOLUME образа itzg; именованный удаляется отдельно
+            await client.remove_container(old['Id'], force=True, volumes=True)
+        await client.rename_container(created['Id'], name)
+        if was_running:
+            await client.container_action(created['Id'], 'start', timeout=30)
+        for old_volume in old_volumes:
+            try:
+                await client.remove_volume(old_volume)
+            except DockerError:
+                pass
+        return {'containerId': created['Id'][:12], 'volume': volume, 'started': was_running, 'bytes': written}
+
+    result = run(restore())
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE servers SET status = %s, data_volume = %s, hibernation_mode = NULL, hibernated_at = NULL, "
+            "hibernated_memory_mb = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            ('starting' if result['started'] else 'offline', volume, server['id'])
+        )
+        cur.execute(
+            "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+            (server['id'], 'INFO', f"World restored from backup {backup_id} into volume {volume}")
+        )
+    conn.commit()
+    return {'backupId': backup_id, 'files': len(manifest['files']), **result}
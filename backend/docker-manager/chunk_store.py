@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+from typing import Dict, Any, Iterable, List, Set, Tuple
+
+BACKUP_STORE_DIR = os.environ.get('BACKUP_STORE_DIR', '/var/lib/minecraft-backups')
+BACKUP_COMPRESSION_LEVEL = int(os.environ.get('BACKUP_COMPRESSION_LEVEL', '6'))
+BACKUP_CHUNK_SIZE = int(os.environ.get('BACKUP_CHUNK_SIZE', str(1024 * 1024)))
+BACKUP_SWEEP_GRACE_SECONDS = int(os.environ.get('BACKUP_SWEEP_GRACE_SECONDS', '3600'))
+
+# Регион Anvil: 1024 записи положения (3 байта сектора + 1 байт длины), 1024 метки времени, данные секторами по 4 КБ
+REGION_SECTOR = 4096
+REGION_HEADER = 2 * REGION_SECTOR
+REGION_PATTERN = re.compile(r'(^|/)(region|entities|poi)/r\.-?\d+\.-?\d+\.mca$')
+
+# Первый байт объекта: z — zlib, r — как есть (данные чанков Minecraft уже сжаты и почти не ужимаются)
+CODEC_ZLIB = b'z'
+CODEC_RAW = b'r'
+
+
+def is_region_file(path: str) -> bool:
+    return REGION_PATTERN.search(path) is not None
+
+
+def region_pieces(data: bytes) -> List[Tuple[int, int]]:
+    """
+    Границы файла региона по чанкам Minecraft: заголовок, затем каждый чанк своими секторами.
+    Неизменённый чанк даёт те же байты и тот же ключ, даже если соседние чанки переписаны или
+    сдвинуты. Кусками покрывается весь файл, поэтому восстановление побайтовое.
+    """
+    size = len(data)
+    if size < REGION_HEADER:
+        return [(0, size)] if size else []
+    boundaries = {0, REGION_HEADER, size}
+    for (entry,) in struct.iter_unpack('>I', data[:REGION_SECTOR]):
+        offset, count = (entry >> 8) * REGION_SECTOR, (entry & 0xff) * REGION_SECTOR
+        if count and offset >= REGION_HEADER and offset + count <= size:
+            boundaries.update((offset, offset + count))
+    edges = sorted(boundaries)
+    return list(zip(edges, edges[1:]))
+
+
+def fixed_pieces(size: int, chunk_size: int = BACKUP_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+
+class ChunkStore:
+    """
+    Локальное хранилище кусков по адресу содержимого: objects/ab/<sha256>. Одинаковые куски из разных
+    бэкапов и серверов хранятся один раз; запись атомарна (временный файл и rename), поэтому
+    прерванный бэкап не оставляет битых объектов.
+    """
+
+    def __init__(self, root: str = BACKUP_STORE_DIR, level: int = BACKUP_COMPRESSION_LEVEL) -> None:
+        self.root = root
+        self.level = level
+        self.objects = os.path.join(root, 'objects')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.objects, key[:2], key)
+
+    def put(self, data: bytes) -> Tuple[str, bool, int]:
+        """Сохранить кусок; (ключ, новый ли он, байт на диске). Повтор только обновляет mtime для sweep"""
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        try:
+            os.utime(path)
+            return key, False, 0
+        except FileNotFoundError:
+            pass
+
+        compressed = zlib.compress(data, self.level)
+        # Сжатие, не давшее и 5%, не стоит распаковки при восстановлении
+        payload = CODEC_ZLIB + compressed if len(compressed) < len(data) * 0.95 else CODEC_RAW + data
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return key, True, len(payload)
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), 'rb') as f:
+            payload = f.read()
+        data = zlib.decompress(payload[1:]) if payload[:1] == CODEC_ZLIB else payload[1:]
+        if hashlib.sha256(data).hexdigest() != key:
+            raise ValueError(f'Chunk {key} is corrupted')
+        return data
+
+    def put_manifest(self, manifest: Dict[str, Any]) -> str:
+        key, _, _ = self.put(gzip.compress(json.dumps(manifest, separators=(',', ':')).encode('utf-8'), mtime=0))
+        return key
+
+    def get_manifest(self, key: str) -> Dict[str, Any]:
+        return json.loads(gzip.decompress(self.get(key)))
+
+    def keys(self) -> Iterable[Tuple[str, float, int]]:
+        """(ключ, mtime, размер) всех объектов"""
+        if not os.path.isdir(self.objects):
+            return
+        for prefix in os.listdir(self.objects):
+            directory = os.path.join(self.objects, prefix)
+            for entry in os.scandir(directory):
+                if not entry.name.startswith('.tmp-'):
+                    stat = entry.stat()
+                    yield entry.name, stat.st_mtime, stat.st_size
+
+    def sweep(self, live: Set[str], grace_seconds: int = BACKUP_SWEEP_GRACE_SECONDS) -> Tuple[int, int]:
+        """
+        Удалить объекты, на которые не ссылается ни один манифест. Объекты моложе grace_seconds не трогаются:
+        их мог только что записать или переиспользовать бэкап, манифест которого ещё не сохранён.
+        Возвращает (удалено объектов, освобождено байт).
+        """
+        cutoff = time.time() - grace_seconds
+        removed = freed = 0
+        for key, mtime, size in list(self.keys()):
+            if key in live or mtime > cutoff:
+                continue
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += size
+        return removed, freed
+
+
+def manifest_keys(manifest: Dict[str, Any]) -> Set[str]:
+    return {key for entry in manifest['files'] for key, _ in entry['pieces']}
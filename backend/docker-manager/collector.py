@@ -0,0 +1,46 @@
+"""
+Сборщик метрик контейнеров (CPU, память, TPS через RCON) с записью в server_metric_chunks:
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 python collector.py [--once]
+
+Загрузка CPU считается по разнице с прошлым замером, поэтому первый цикл пишет только память и TPS.
+"""
+import os
+import sys
+import time
+
+from db_pool import get_pool
+from metrics import run_collection
+
+METRICS_INTERVAL = float(os.environ.get('METRICS_INTERVAL', '15'))
+METRICS_ROLLUP_INTERVAL = float(os.environ.get('METRICS_ROLLUP_INTERVAL', '60'))
+
+
+def main() -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    once = '--once' in sys.argv
+
+    pool = get_pool(database_url)
+    last_rollup = 0.0
+
+    while True:
+        started = time.monotonic()
+        rollup = once or started - last_rollup >= METRICS_ROLLUP_INTERVAL
+        conn = pool.acquire()
+        try:
+            summary = run_collection(conn, docker_host, rollup=rollup)
+        finally:
+            pool.release(conn)
+        if rollup:
+            last_rollup = started
+
+        print(f"sampled {summary['servers']} server(s), stored {summary['stored']} "
+              f"in {(time.monotonic() - started) * 1000:.0f} ms", flush=True)
+        if once:
+            return
+        time.sleep(max(0.0, METRICS_INTERVAL - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    main()
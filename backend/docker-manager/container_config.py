@@ -0,0 +1,204 @@
+import io
+import tarfile
+from typing import Dict, Any, List, Optional
+
+from profiles import DEFAULT_PROFILE, resource_profile
+
+CONTAINER_PREFIX = 'minecraft-'
+WARM_CONTAINER_PREFIX = 'minecraft-warm-'
+
+IMAGES = {
+    'java': 'itzg/minecraft-server',
+    'bedrock': 'itzg/minecraft-bedrock-server'
+}
+IMAGE_TAG = 'latest'
+GAME_PORTS = {
+    'java': '25565/tcp',
+    'bedrock': '19132/udp'
+}
+RCON_CONTAINER_PORT = '25575/tcp'
+MIB = 1024 * 1024
+
+RESOURCE_COLUMNS = (
+    "s.resource_profile, s.heap_mb, s.memory_mb, s.cpus, s.cpu_limit, s.jvm_gc, s.view_distance, s.simulation_distance, "
+    "s.data_volume"
+)
+SETTINGS_COLUMNS = "st.motd, st.gamemode, st.difficulty, st.pvp, st.whitelist, st.properties"
+SETTINGS_JOIN = "LEFT JOIN server_settings st ON st.server_id = s.id"
+
+# Свойства, которые задаёт бэкенд: порты и RCON не переопределяются через server_settings.properties
+RESERVED_PROPERTIES = {'server-port', 'server-portv6', 'query.port', 'enable-rcon', 'rcon.port', 'rcon.password'}
+
+
+def container_name(server_id: Any) -> str:
+    return f"{CONTAINER_PREFIX}{server_id}"
+
+
+def data_volume_name(server_id: Any) -> str:
+    """Именованный том /data: мир переживает пересоздание контейнера"""
+    return f"{CONTAINER_PREFIX}data-{server_id}"
+
+
+def warm_data_volume(name: str) -> str:
+    """Том /data тёплого контейнера; после захвата остаётся томом сервера"""
+    return f"{name}-data"
+
+
+def server_data_volume(server: Dict[str, Any]) -> str:
+    """Том с миром сервера: записанный в servers.data_volume (тёплый контейнер, восстановление) или по умолчанию"""
+    return server.get('data_volume') or data_volume_name(server['id'])
+
+
+def image_for(edition: str) -> str:
+    """Образ itzg для редакции; версия Minecraft задаётся через VERSION, а не тегом"""
+    return IMAGES['java'] if edition == 'java' else IMAGES['bedrock']
+
+
+def memory_setting(memory_mb: int) -> str:
+    """Значение MEMORY для образа itzg: 2048 -> 2G, 1536 -> 1536M"""
+    return f"{memory_mb // 1024}G" if memory_mb % 1024 == 0 else f"{memory_mb}M"
+
+
+def template_resources(edition: str) -> Dict[str, Any]:
+    """Ресурсы тёплого контейнера: профиль по умолчанию"""
+    return resource_profile(edition, 0, DEFAULT_PROFILE)
+
+
+def resource_env(edition: str, resources: Dict[str, Any]) -> List[str]:
+    """
+    Env, зависящий от профиля. Куча и флаги GC читаются только при создании контейнера,
+    поэтому их смена требует пересоздания; остальное меняется без него.
+    """
+    if edition != 'java':
+        return []
+    heap_mb = resources.get('heap_mb') or template_resources('java')['heap_mb']
+    env = [f"MEMORY={memory_setting(heap_mb)}"]
+    if resources.get('jvm_gc') == 'aikar':
+        env.append("USE_AIKAR_FLAGS=TRUE")
+    return env
+
+
+def resource_limits(resources: Dict[str, Any], min_memory_mb: int = 0) -> Dict[str, Any]:
+    """
+    Лимиты cgroup для HostConfig и POST /containers/{id}/update. MemorySwap равен Memory:
+    без свопа сервер под нагрузкой не уходит в своп, а упирается в лимит. NanoCpus — предел CPU,
+    CpuShares — вес по резерву: при занятом хосте каждый контейнер получает не меньше своей доли.
+    """
+    memory = max(resources['memory_mb'], min_memory_mb) * MIB
+    cpus = float(resources['cpus'])
+    return {
+        "Memory": memory,
+        "MemorySwap": memory,
+        "NanoCpus": int(float(resources.get('cpu_limit') or cpus) * 1e9),
+        "CpuShares": max(2, int(cpus * 1024))
+    }
+
+
+def build_template_config(edition: str, version: str, port: int,
+                          resources: Optional[Dict[str, Any]] = None, rcon_port: Optional[int] = None,
+                          rcon_password: Optional[str] = None, data_volume: Optional[str] = None) -> Dict[str, Any]:
+    """Часть конфигурации, не зависящая от конкретного сервера: общая для тёплых контейнеров"""
+    resources = resources or template_resources(edition)
+    game_port = GAME_PORTS['java'] if edition == 'java' else GAME_PORTS['bedrock']
+    config = {
+        "Image": f"{image_for(edition)}:{IMAGE_TAG}",
+        "Env": [
+            "EULA=TRUE",
+            f"VERSION={version}",
+            "ONLINE_MODE=FALSE"
+        ] + resource_env(edition, resources),
+        "HostConfig": {
+            "PortBindings": {
+                game_port: [{"HostPort": str(port)}]
+            },
+            "RestartPolicy": {
+                "Name": "unless-stopped"
+            },
+            **resource_limits(resources)
+        },
+        "ExposedPorts": {
+            game_port: {}
+        }
+    }
+
+    # RCON есть только у Java; без пароля образ itzg сгенерировал бы свой, неизвестный бэкенду
+    if edition == 'java' and rcon_port and rcon_password:
+        config["Env"] += ["ENABLE_RCON=TRUE", f"RCON_PASSWORD={rcon_password}", "RCON_PORT=25575"]
+        config["HostConfig"]["PortBindings"][RCON_CONTAINER_PORT] = [{"HostPort": str(rcon_port)}]
+        config["ExposedPorts"][RCON_CONTAINER_PORT] = {}
+    if data_volume:
+        config["HostConfig"]["Binds"] = [f"{data_volume}:/data"]
+    return config
+
+
+def build_container_config(server: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Конфигурация контейнера для POST /containers/create. Игровые настройки не передаются
+    через env: server.properties кладётся архивом перед каждым запуском (build_server_properties_archive).
+    """
+    config = build_template_config(
+        server['edition'], server['version'], server['port'],
+        server if server.get('memory_mb') else None, server.get('rcon_port'), server.get('rcon_password'),
+        server_data_volume(server)
+    )
+    config["name"] = container_name(server['id'])
+    return config
+
+
+def matches_template(server: Dict[str, Any]) -> bool:
+    """Тёплый контейнер подходит серверу, если env профиля совпадает: лимиты cgroup меняются через update"""
+    return resource_env(server['edition'], server) == resource_env(server['edition'], template_resources(server['edition']))
+
+
+def property_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return ' '.join(str(value).splitlines())
+
+
+def server_properties(server: Dict[str, Any]) -> Dict[str, str]:
+    """
+    server.properties из server_settings и профиля. Ключи properties (JSONB) переопределяют
+    остальные, кроме портов и RCON; у Bedrock дальность симуляции называется tick-distance.
+    """
+    motd = server.get('motd') or f"Welcome to {server['name']}"
+    properties = {
+        'motd' if server['edition'] == 'java' else 'server-name': motd,
+        'max-players': server['max_players'],
+        'gamemode': server.get('gamemode') or 'survival',
+        'difficulty': server.get('difficulty') or 'normal'
+    }
+    if server['edition'] == 'java':
+        properties['pvp'] = server.get('pvp') is not False
+        properties['white-list'] = bool(server.get('whitelist'))
+        properties['enforce-whitelist'] = bool(server.get('whitelist'))
+    else:
+        properties['allow-list'] = bool(server.get('whitelist'))
+    if server.get('view_distance'):
+        properties['view-distance'] = server['view_distance']
+    if server.get('simulation_distance'):
+        key = 'simulation-distance' if server['edition'] == 'java' else 'tick-distance'
+        properties[key] = server['simulation_distance']
+
+    for key, value in (server.get('properties') or {}).items():
+        if key not in RESERVED_PROPERTIES and value is not None:
+            properties[key] = value
+    return {key: property_value(value) for key, value in properties.items()}
+
+
+def build_server_properties_archive(server: Dict[str, Any]) -> bytes:
+    """
+    tar с server.properties: env у созданного контейнера не меняется, а образ itzg не
+    перезаписывает свойства, для которых не задана переменная окружения. Файл целиком
+    принадлежит бэкенду: ключи, которых нет в server_settings, сервер заполнит значениями по умолчанию.
+    """
+    properties = ''.join(f"{key}={value}\n" for key, value in server_properties(server).items()).encode('utf-8')
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as archive:
+        info = tarfile.TarInfo('server.properties')
+        info.size = len(properties)
+        info.mode = 0o644
+        info.uid = info.gid = 1000
+        archive.addfile(info, io.BytesIO(properties))
+    return buffer.getvalue()
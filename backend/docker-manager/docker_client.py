@@ -0,0 +1,511 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import urllib.parse
+from typing import Dict, Any, List, Optional, Tuple, Iterable, Awaitable, AsyncIterator, Callable
+
+from tracing import span
+
+DOCKER_MAX_CONNECTIONS = int(os.environ.get('DOCKER_MAX_CONNECTIONS', '16'))
+DOCKER_RETRIES = int(os.environ.get('DOCKER_RETRIES', '2'))
+DOCKER_BACKOFF_SECONDS = float(os.environ.get('DOCKER_BACKOFF_SECONDS', '0.2'))
+DOCKER_DEFAULT_TIMEOUT = float(os.environ.get('DOCKER_DEFAULT_TIMEOUT', '10'))
+
+RETRYABLE_STATUSES = (502, 503, 504)
+
+
+class DockerError(Exception):
+    """Docker Engine API ответил кодом ошибки"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f'Docker API {status}: {message}')
+        self.status = status
+        self.message = message
+
+
+class DockerConnectionError(Exception):
+    """Не удалось связаться с Docker Engine API (обрыв, таймаут, отказ в соединении)"""
+
+
+class DockerResponse:
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode('utf-8')) if self.body else None
+
+
+class _Connection:
+    __slots__ = ('reader', 'writer')
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    def is_usable(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    def close(self) -> None:
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class DockerClient:
+    """
+    Асинхронный клиент Docker Engine API поверх asyncio streams.
+    Поддерживает http://, tcp:// и unix:// адреса, держит keep-alive соединения,
+    ограничивает параллелизм числом соединений, а каждый вызов — общим дедлайном с повторами.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = DOCKER_MAX_CONNECTIONS,
+        retries: int = DOCKER_RETRIES,
+        backoff: float = DOCKER_BACKOFF_SECONDS,
+        default_timeout: float = DOCKER_DEFAULT_TIMEOUT
+    ) -> None:
+        self.base_url = base_url
+        self.max_connections = max(1, max_connections)
+        self.retries = retries
+        self.backoff = backoff
+        self.default_timeout = default_timeout
+
+        parsed = urllib.parse.urlparse(base_url)
+        if parsed.scheme == 'unix':
+            self._unix_path: Optional[str] = parsed.path
+            self._host, self._port = 'localhost', 0
+            self._path_prefix = ''
+        else:
+            self._unix_path = None
+            self._host = parsed.hostname or 'localhost'
+            self._port = parsed.port or 2375
+            self._path_prefix = parsed.path.rstrip('/')
+
+        self._idle: List[_Connection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.connections_opened = 0
+        self.requests_sent = 0
+        self.retries_made = 0
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        query: Optional[Dict[str, Any]] = None,
+        body: Any = None,
+        timeout: Optional[float] = None,
+        idempotent: Optional[bool] = None,
+        data: Optional[bytes] = None,
+        content_type: str = 'application/json'
+    ) -> DockerResponse:
+        """
+        Выполнить запрос с общим дедлайном timeout на все попытки.
+        body сериализуется в JSON, data отправляется как есть (например, tar-архив).
+        Неидемпотентные запросы повторяются только если упали до отправки.
+        """
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD', 'DELETE')
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout if timeout is not None else self.default_timeout)
+
+        target = self._path_prefix + path
+        if query:
+            target += '?' + urllib.parse.urlencode(
+                {k: (json.dumps(v) if isinstance(v, (dict, list)) else v) for k, v in query.items()}
+            )
+        payload = json.dumps(body).encode('utf-8') if body is not None else data
+
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise DockerConnectionError(f'{method} {path}: deadline exceeded')
+
+            sent = [False]
+            try:
+                with span('docker', docker_operation(method, path)):
+                    response = await asyncio.wait_for(
+                        self._attempt(method, target, payload, content_type, sent), remaining
+                    )
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                if attempt >= self.retries or (sent[0] and not idempotent):
+                    raise DockerConnectionError(f'{method} {path}: {e!r}') from e
+            else:
+                if response.status in RETRYABLE_STATUSES and idempotent and attempt < self.retries:
+                    pass
+                elif response.status >= 400:
+                    raise DockerError(response.status, _error_message(response))
+                else:
+                    return response
+
+            attempt += 1
+            self.retries_made += 1
+            delay = self.backoff * (2 ** (attempt - 1)) * (0.5 + random.random())
+            await asyncio.sleep(max(0.0, min(delay, deadline - loop.time())))
+
+    async def _attempt(self, method: str, target: str, payload: Optional[bytes], content_type: str,
+                       sent: List[bool]) -> DockerResponse:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+
+        async with self._semaphore:
+            conn, reused = await self._acquire()
+            try:
+                head = [
+                    f'{method} {target} HTTP/1.1',
+                    f'Host: {self._host}',
+                    'Connection: keep-alive',
+                    'Content-Length: ' + str(len(payload) if payload else 0)
+                ]
+                if payload:
+                    head.append(f'Content-Type: {content_type}')
+                conn.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + (payload or b''))
+                await conn.writer.drain()
+                self.requests_sent += 1
+                sent[0] = True
+
+                try:
+                    status, headers = await _read_head(conn.reader)
+                except (OSError, asyncio.IncompleteReadError):
+                    # Сервер мог закрыть простаивающее keep-alive соединение — запрос не обработан
+                    if reused:
+                        sent[0] = False
+                    raise
+                body, keep_alive = await _read_body(conn.reader, method, status, headers)
+            except BaseException:
+                conn.close()
+                raise
+
+            if keep_alive and conn.is_usable():
+                self._idle.append(conn)
+            else:
+                conn.close()
+            return DockerResponse(status, headers, body)
+
+    async def _acquire(self) -> Tuple[_Connection, bool]:
+        while self._idle:
+            conn = self._idle.pop()
+            if conn.is_usable():
+                return conn, True
+            conn.close()
+
+        if self._unix_path:
+            reader, writer = await asyncio.open_unix_connection(self._unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(self._host, self._port)
+        self.connections_opened += 1
+        return _Connection(reader, writer), False
+
+    async def request_lines(
+        self,
+        method: str,
+        path: str,
+        on_line: Callable[[bytes], None],
+        query: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> int:
+        """
+        Запрос с потоковым телом (pull образа): on_line вызывается на каждую строку по мере чтения.
+        Без повторов — такие запросы не идемпотентны по наблюдаемому прогрессу.
+        """
+        buffer = b''
+
+        async def on_chunk(piece: bytes) -> None:
+            nonlocal buffer
+            buffer += piece
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    on_line(line)
+
+        status = await self.request_stream(
+            method, path, on_chunk, query=query,
+            timeout=timeout if timeout is not None else self.default_timeout
+        )
+        if buffer.strip():
+            on_line(buffer)
+        return status
+
+    async def request_stream(
+        self,
+        method: str,
+        path: str,
+        on_chunk: Callable[[bytes], Awaitable[None]],
+        query: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None
+    ) -> int:
+        """
+        Запрос с потоковым телом без разбиения на строки (логи с follow=1). Следующий кусок читается
+        только после on_chunk, поэтому медленный потребитель тормозит чтение сокета, а не копит память.
+        timeout=None — без дедлайна: поток follow длится, пока работает контейнер.
+        """
+        target = self._path_prefix + path
+        if query:
+            target += '?' + urllib.parse.urlencode(query)
+        with span('docker', docker_operation(method, path)):
+            if timeout is None:
+                return await self._stream(method, target, on_chunk)
+            return await asyncio.wait_for(self._stream(method, target, on_chunk), timeout)
+
+    async def _stream(self, method: str, target: str, on_chunk: Callable[[bytes], Awaitable[None]]) -> int:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+
+        async with self._semaphore:
+            conn, _ = await self._acquire()
+            try:
+                conn.writer.write((
+                    f'{method} {target} HTTP/1.1\r\nHost: {self._host}\r\n'
+                    'Connection: keep-alive\r\nContent-Length: 0\r\n\r\n'
+                ).encode('latin-1'))
+                await conn.writer.drain()
+                self.requests_sent += 1
+
+                status, headers = await _read_head(conn.reader)
+                if status >= 400:
+                    body, _ = await _read_body(conn.reader, method, status, headers)
+                    conn.close()
+                    raise DockerError(status, _error_message(DockerResponse(status, headers, body)))
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                async for piece in _iter_body(conn.reader, headers):
+                    await on_chunk(piece)
+                if 'content-length' not in headers and headers.get('transfer-encoding', '').lower() != 'chunked':
+                    keep_alive = False
+            except BaseException:
+                conn.close()
+                raise
+
+            if keep_alive and conn.is_usable():
+                self._idle.append(conn)
+            else:
+                conn.close()
+            return status
+
+    async def gather(self, coros: Iterable[Awaitable[Any]]) -> List[Any]:
+        """Выполнить корутины параллельно; исключения возвращаются как результаты"""
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    async def list_containers(self, all: bool = True, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        query: Dict[str, Any] = {'all': '1' if all else '0'}
+        if filters:
+            query['filters'] = filters
+        return (await self.request('GET', '/containers/json', query=query)).json() or []
+
+    async def inspect_container(self, ref: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return (await self.request('GET', f'/containers/{_quote(ref)}/json', timeout=timeout)).json()
+
+    async def container_stats(self, ref: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Один снимок /stats без второго замера (one-shot): Docker не ждёт секунду ради precpu_stats,
+        поэтому загрузка CPU считается по разнице с предыдущим снимком на стороне вызывающего.
+        """
+        response = await self.request('GET', f'/containers/{_quote(ref)}/stats',
+                                      query={'stream': 'false', 'one-shot': 'true'}, timeout=timeout)
+        return response.json()
+
+    async def container_logs(self, ref: str, on_chunk: Callable[[bytes], Awaitable[None]], since: Optional[str] = None,
+                             follow: bool = True, timeout: Optional[float] = None) -> int:
+        """Поток логов с метками времени; без Tty он мультиплексирован (8-байтный заголовок на кадр)"""
+        query = {'follow': '1' if follow else '0', 'stdout': '1', 'stderr': '1', 'timestamps': '1'}
+        if since:
+            query['since'] = since
+        return await self.request_stream('GET', f'/containers/{_quote(ref)}/logs', on_chunk, query=query, timeout=timeout)
+
+    async def create_container(self, name: str, config: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = await self.request('POST', '/containers/create', query={'name': name}, body=config, timeout=timeout)
+        return response.json()
+
+    async def image_exists(self, image: str) -> bool:
+        try:
+            await self.request('GET', f'/images/{_quote(image)}/json')
+            return True
+        except DockerError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    async def pull_image(self, image: str, tag: str, on_progress: Optional[Callable[[float], None]] = None,
+                         timeout: Optional[float] = None) -> None:
+        """Скачать образ; on_progress получает долю скачанных байт по всем слоям (0..1)"""
+        layers: Dict[str, Tuple[int, int]] = {}
+        errors: List[str] = []
+
+        def on_line(line: bytes) -> None:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                return
+            if event.get('error'):
+                errors.append(event['error'])
+                return
+            detail = event.get('progressDetail') or {}
+            if event.get('id') and detail.get('total'):
+                layers[event['id']] = (detail.get('current', 0), detail['total'])
+            if on_progress and layers:
+                done = sum(current for current, _ in layers.values())
+                total = sum(total for _, total in layers.values())
+                on_progress(min(1.0, done / total) if total else 0.0)
+
+        await self.request_lines('POST', '/images/create', on_line,
+                                 query={'fromImage': image, 'tag': tag}, timeout=timeout)
+        if errors:
+            raise DockerError(500, errors[-1])
+
+    async def rename_container(self, ref: str, name: str) -> None:
+        await self.request('POST', f'/containers/{_quote(ref)}/rename', query={'name': name})
+
+    async def update_container(self, ref: str, resources: Dict[str, Any], timeout: Optional[float] = None) -> None:
+        """Поменять лимиты cgroup (Memory, MemorySwap, NanoCpus) без пересоздания, в том числе у запущенного"""
+        await self.request('POST', f'/containers/{_quote(ref)}/update', body=resources, timeout=timeout, idempotent=True)
+
+    async def remove_container(self, ref: str, force: bool = False, volumes: bool = False,
+                               timeout: Optional[float] = None) -> None:
+        """Удалить контейнер; volumes=True удаляет и его анонимные тома, именованные остаются всегда"""
+        await self.request('DELETE', f'/containers/{_quote(ref)}',
+                           query={'force': '1' if force else '0', 'v': '1' if volumes else '0'}, timeout=timeout)
+
+    async def remove_volume(self, name: str, timeout: Optional[float] = None) -> None:
+        await self.request('DELETE', f'/volumes/{_quote(name)}', timeout=timeout)
+
+    async def get_archive(self, ref: str, path: str, on_chunk: Callable[[bytes], Awaitable[None]],
+                          timeout: Optional[float] = None) -> int:
+        """tar с содержимым path контейнера потоком: каталог /data приходит с префиксом data/"""
+        return await self.request_stream('GET', f'/containers/{_quote(ref)}/archive', on_chunk,
+                                         query={'path': path}, timeout=timeout)
+
+    async def put_archive(self, ref: str, path: str, tar_bytes: bytes, timeout: Optional[float] = None) -> None:
+        """Распаковать tar в контейнер (работает и для остановленного контейнера)"""
+        await self.request('PUT', f'/containers/{_quote(ref)}/archive', query={'path': path},
+                           data=tar_bytes, content_type='application/x-tar', timeout=timeout, idempotent=True)
+
+    async def container_action(self, ref: str, action: str, timeout: Optional[float] = None) -> int:
+        """start / stop / restart; 304 (уже в нужном состоянии) считается успехом"""
+        response = await self.request('POST', f'/containers/{_quote(ref)}/{action}', timeout=timeout, idempotent=True)
+        return response.status
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    raw = await reader.readuntil(b'\r\n\r\n')
+    lines = raw.decode('latin-1').split('\r\n')
+    parts = lines[0].split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise ValueError(f'Malformed status line: {lines[0]!r}')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+async def _iter_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size_line = await reader.readuntil(b'\r\n')
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                await reader.readuntil(b'\r\n')
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+    elif 'content-length' in headers:
+        remaining = int(headers['content-length'])
+        while remaining > 0:
+            piece = await reader.read(min(remaining, 65536))
+            if not piece:
+                raise asyncio.IncompleteReadError(b'', remaining)
+            remaining -= len(piece)
+            yield piece
+    else:
+        while True:
+            piece = await reader.read(65536)
+            if not piece:
+                return
+            yield piece
+
+
+async def _read_body(reader: asyncio.StreamReader, method: str, status: int, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+    keep_alive = headers.get('connection', '').lower() != 'close'
+
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+        return b'', keep_alive
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        return b''.join([piece async for piece in _iter_body(reader, headers)]), keep_alive
+
+    if 'content-length' in headers:
+        return await reader.readexactly(int(headers['content-length'])), keep_alive
+
+    return await reader.read(), False
+
+
+def _error_message(response: DockerResponse) -> str:
+    try:
+        return (response.json() or {}).get('message') or response.body.decode('utf-8', 'replace')
+    except ValueError:
+        return response.body.decode('utf-8', 'replace')
+
+
+def docker_operation(method: str, path: str) -> str:
+    """Метка вызова для трассы: имя или id контейнера, тома, образа заменяется на {id}"""
+    parts = path.split('?', 1)[0].strip('/').split('/')
+    if len(parts) > 2 and parts[0] == 'images':
+        parts = [parts[0], '{id}', parts[-1]]
+    elif len(parts) > 1 and parts[0] in ('containers', 'volumes', 'exec', 'networks') and parts[1] not in ('json', 'create'):
+        parts[1] = '{id}'
+    return f"{method} /{'/'.join(parts)}"
+
+
+def _quote(ref: str) -> str:
+    return urllib.parse.quote(str(ref), safe='')
+
+
+def normalize_docker_url(docker_host: str) -> str:
+    """tcp://host:2375 → http://host:2375, unix:// оставляется как есть"""
+    if docker_host.startswith('tcp://'):
+        return 'http://' + docker_host[len('tcp://'):]
+    return docker_host.rstrip('/')
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_clients: Dict[str, DockerClient] = {}
+_lock = threading.Lock()
+
+
+def get_client(docker_host: str) -> DockerClient:
+    """Клиент на уровне модуля: keep-alive соединения переживают тёплые вызовы функции"""
+    url = normalize_docker_url(docker_host)
+    client = _clients.get(url)
+    if client is None:
+        client = DockerClient(url)
+        _clients[url] = client
+    return client
+
+
+def run(coro: Awaitable[Any]) -> Any:
+    """
+    Выполнить корутину на постоянном цикле событий модуля из синхронного обработчика.
+    asyncio.run() закрывал бы цикл, а с ним и keep-alive соединения.
+    """
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+        return _loop.run_until_complete(coro)
@@ -0,0 +1,222 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from container_config import container_name
+from docker_client import DockerError, get_client, run
+from metrics import memory_mb
+from player_query import PING_TIMEOUT, QueryError, query_server
+from players import server_address
+
+HIBERNATE_IDLE_MINUTES = int(os.environ.get('HIBERNATE_IDLE_MINUTES', '15'))
+HIBERNATE_MODE = os.environ.get('HIBERNATE_MODE', 'stop')
+HIBERNATE_PARALLELISM = int(os.environ.get('HIBERNATE_PARALLELISM', '8'))
+HIBERNATE_MODES = ('stop', 'pause')
+PLAYER_SNAPSHOT_MAX_AGE = int(os.environ.get('PLAYER_SNAPSHOT_MAX_AGE', '120'))
+
+WAKE_ACTIONS = {'stop': 'start', 'pause': 'unpause'}
+# После unpause сервер сразу принимает игроков, после start JVM ещё загружает мир
+WAKE_STATUS = {'stop': 'starting', 'pause': 'online'}
+
+
+class WakeError(Exception):
+    """Сервер не спит или Docker не смог его разбудить"""
+
+
+def idle_servers(conn, docker_host: str, idle_minutes: int = HIBERNATE_IDLE_MINUTES) -> List[Dict[str, Any]]:
+    """
+    Серверы online без игроков во всех опросах за окно: свежий снимок доступен, last_active_at
+    и последняя смена статуса старше окна (только что запущенный сервер окно ещё не прожил).
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT s.id, s.edition, s.port, h.url AS docker_url FROM servers s "
+            "JOIN server_player_snapshots p ON p.server_id = s.id "
+            "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id "
+            "WHERE s.status = 'online' AND s.auto_hibernate AND s.port IS NOT NULL "
+            "AND p.reachable AND p.players_online = 0 "
+            "AND p.polled_at > CURRENT_TIMESTAMP - make_interval(secs => %s) "
+            "AND p.last_active_at < CURRENT_TIMESTAMP - make_interval(mins => %s) "
+            "AND s.updated_at < CURRENT_TIMESTAMP - make_interval(mins => %s) "
+            "ORDER BY s.id",
+            (PLAYER_SNAPSHOT_MAX_AGE, idle_minutes, idle_minutes)
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+async def hibernate_containers(targets: List[Dict[str, Any]], docker_host: str, mode: str,
+                               parallelism: int = HIBERNATE_PARALLELISM) -> List[Any]:
+    """
+    Для каждого кандидата: повторный пинг (за время с последнего опроса мог зайти игрок),
+    снимок памяти контейнера и stop/pause. Результат — занятая память в МБ, 'busy' или исключение.
+    """
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def one(target: Dict[str, Any]) -> Any:
+        async with semaphore:
+            try:
+                host = server_address(target['docker_url'], docker_host)
+                try:
+                    status = await query_server(target['edition'], host, target['port'], PING_TIMEOUT)
+                    if status['online'] > 0:
+                        return 'busy'
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, QueryError):
+                    pass
+
+                client = get_client(target['docker_url'] or docker_host)
+                name = container_name(target['id'])
+                try:
+                    used = memory_mb(await client.container_stats(name, timeout=10))
+                except DockerError:
+                    used = None
+                await client.container_action(name, mode, timeout=60)
+                return used
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(one(target) for target in targets))
+
+
+def mark_sleeping(conn, hibernated: List[Tuple[int, Optional[float]]], mode: str) -> List[Dict[str, Any]]:
+    """Один UPDATE на все уснувшие серверы и один INSERT логов; сервер, который успели перевести, не трогается"""
+    if not hibernated:
+        return []
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        rows = execute_values(
+            cur,
+            "UPDATE servers AS s SET status = 'sleeping', hibernation_mode = v.mode, "
+            "hibernated_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP, "
+            "hibernated_memory_mb = COALESCE(v.used_mb, s.memory_mb) "
+            "FROM (VALUES %s) AS v(id, used_mb, mode) WHERE s.id = v.id AND s.status = 'online' "
+            "RETURNING s.id, s.hibernated_memory_mb, "
+            "(SELECT h.name FROM docker_hosts h WHERE h.id = s.docker_host_id) AS docker_host",
+            [(server_id, round(used) if used is not None else None, mode) for server_id, used in hibernated],
+            template="(%s::integer, %s::integer, %s::varchar)",
+            page_size=len(hibernated),
+            fetch=True
+        )
+        if rows:
+            verb = 'stopped' if mode == 'stop' else 'paused'
+            execute_values(
+                cur,
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES %s",
+                [(row['id'], 'INFO', f'Server hibernated: no players online, container {verb}') for row in rows],
+                page_size=len(rows)
+            )
+    conn.commit()
+    return rows
+
+
+def hibernation_by_host(cur) -> Dict[Optional[int], Dict[str, Any]]:
+    """
+    Спящие серверы по хостам. Память освобождает только stop: замороженный (pause) контейнер
+    остаётся в памяти и экономит лишь CPU. Ключ — docker_host_id (None — хост по умолчанию).
+    """
+    cur.execute(
+        "SELECT docker_host_id, COUNT(*) AS sleeping, "
+        "COUNT(*) FILTER (WHERE hibernation_mode = 'pause') AS paused, "
+        "COALESCE(SUM(hibernated_memory_mb) FILTER (WHERE hibernation_mode = 'stop'), 0) AS freed_memory_mb "
+        "FROM servers WHERE status = 'sleeping' GROUP BY docker_host_id"
+    )
+    return {
+        row['docker_host_id']: {
+            'sleeping': row['sleeping'],
+            'paused': row['paused'],
+            'freedMemoryMb': int(row['freed_memory_mb'])
+        }
+        for row in cur.fetchall()
+    }
+
+
+def run_hibernation(conn, docker_host: str, idle_minutes: int = HIBERNATE_IDLE_MINUTES,
+                    mode: str = HIBERNATE_MODE) -> Dict[str, Any]:
+    """Один цикл: найти простаивающие серверы, усыпить их и посчитать освобождённую память по хостам"""
+    started = time.monotonic()
+    mode = mode if mode in HIBERNATE_MODES else 'stop'
+    candidates = idle_servers(conn, docker_host, idle_minutes)
+    outcomes = run(hibernate_containers(candidates, docker_host, mode)) if candidates else []
+
+    hibernated = []
+    busy = 0
+    errors = {}
+    for target, outcome in zip(candidates, outcomes):
+        if outcome == 'busy':
+            busy += 1
+        elif isinstance(outcome, Exception):
+            errors[str(target['id'])] = getattr(outcome, 'message', None) or str(outcome) or type(outcome).__name__
+        else:
+            hibernated.append((target['id'], outcome))
+
+    rows = mark_sleeping(conn, hibernated, mode)
+    freed: Dict[str, int] = {}
+    if mode == 'stop':
+        for row in rows:
+            key = row['docker_host'] or 'default'
+            freed[key] = freed.get(key, 0) + (row['hibernated_memory_mb'] or 0)
+
+    return {
+        'mode': mode,
+        'candidates': len(candidates),
+        'hibernated': len(rows),
+        'busy': busy,
+        'failed': errors,
+        'freedMemoryMb': freed,
+        'elapsedMs': round((time.monotonic() - started) * 1000)
+    }
+
+
+def wake_server(conn, server_id: int, docker_host: str, reason: str) -> str:
+    """
+    Разбудить спящий сервер: start или unpause по режиму, статус, сброс окна простоя.
+    Сервер переводится в starting и коммитится до вызова Docker: второе пробуждение его уже не застанет,
+    а транзакция не висит открытой весь вызов. При сбое сервер возвращается в sleeping.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "UPDATE servers s SET status = 'starting', updated_at = CURRENT_TIMESTAMP "
+            "WHERE s.id = %s AND s.status = 'sleeping' "
+            "RETURNING s.hibernation_mode, (SELECT h.url FROM docker_hosts h WHERE h.id = s.docker_host_id) AS docker_url",
+            (server_id,)
+        )
+        server = cur.fetchone()
+    conn.commit()
+    if server is None:
+        raise WakeError(f'Server {server_id} is not sleeping')
+
+    mode = server['hibernation_mode'] or 'stop'
+    try:
+        run(get_client(server['docker_url'] or docker_host).container_action(
+            container_name(server_id), WAKE_ACTIONS[mode], timeout=60
+        ))
+    except Exception as e:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE servers SET status = 'sleeping', updated_at = CURRENT_TIMESTAMP "
+                "WHERE id = %s AND status = 'starting'",
+                (server_id,)
+            )
+        conn.commit()
+        raise WakeError(f"Wake failed: {getattr(e, 'message', None) or str(e) or type(e).__name__}")
+
+    status = WAKE_STATUS[mode]
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE servers SET status = %s, hibernation_mode = NULL, hibernated_at = NULL, "
+            "hibernated_memory_mb = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (status, server_id)
+        )
+        cur.execute(
+            "UPDATE server_player_snapshots SET last_active_at = CURRENT_TIMESTAMP WHERE server_id = %s",
+            (server_id,)
+        )
+        cur.execute(
+            "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+            (server_id, 'INFO', f'Server woken: {reason}')
+        )
+    conn.commit()
+    return status
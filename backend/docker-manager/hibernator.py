@@ -0,0 +1,43 @@
+"""
+Усыпление серверов без игроков: остановка (или pause) контейнеров, простаивающих дольше окна:
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 python hibernator.py [--once]
+
+Окно считается по снимкам онлайна, поэтому рядом должен работать poller.py. Будит серверы wake_proxy.py.
+"""
+import os
+import sys
+import time
+
+from db_pool import get_pool
+from hibernate import run_hibernation
+
+HIBERNATE_INTERVAL = float(os.environ.get('HIBERNATE_INTERVAL', '60'))
+
+
+def main() -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    once = '--once' in sys.argv
+
+    pool = get_pool(database_url)
+
+    while True:
+        started = time.monotonic()
+        conn = pool.acquire()
+        try:
+            summary = run_hibernation(conn, docker_host)
+        finally:
+            pool.release(conn)
+
+        freed = ', '.join(f'{host}: {mb} MB' for host, mb in sorted(summary['freedMemoryMb'].items()))
+        print(f"{summary['candidates']} idle server(s), {summary['hibernated']} hibernated ({summary['mode']}), "
+              f"{summary['busy']} busy, {len(summary['failed'])} failed"
+              f"{f', freed {freed}' if freed else ''} in {summary['elapsedMs']} ms", flush=True)
+        if once:
+            return
+        time.sleep(max(0.0, HIBERNATE_INTERVAL - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,54 @@
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
-import urllib.request
-import urllib.error
+import asyncio
+from datetime import datetime, timedelta, timezone
+from psycopg2.extras import RealDictCursor, execute_values
+from typing import Dict, Any, List, Optional, Tuple
 
+from db_pool import get_pool
+from docker_client import DockerClient, DockerError, get_client, run
+from jobs import enqueue_create_job, enqueue_job, get_job, run_pending_jobs
+from container_config import CONTAINER_PREFIX, RESOURCE_COLUMNS, SETTINGS_COLUMNS, SETTINGS_JOIN
+from prewarm import PREWARM_TOP_COMBOS, WARM_POOL_SIZE, run_prewarm
+from scheduler import can_grow, list_hosts, register_host
+from players import run_player_poll, server_address
+from metrics import pick_resolution, query_metrics, run_collection
+from rcon import RconError
+from rcon_pool import broadcast, get_rcon_pool
+from reconcile import list_containers_on_hosts, run_reconcile
+from hibernate import WakeError, hibernation_by_host, run_hibernation, wake_server
+from profiles import UnknownProfile, profile_json, resource_profile
+from resources import start_with_profile
+from backup import list_backups
+from tracing import json_dumps, traced
+
+MAX_BULK_SERVERS = 1000
+BULK_PARALLELISM = int(os.environ.get('BULK_PARALLELISM', '16'))
+MAX_BULK_PARALLELISM = 64
+JOB_RUN_BUDGET_SECONDS = float(os.environ.get('JOB_RUN_BUDGET_SECONDS', '25'))
+# Бэкап и восстановление длятся минуты — их разбирает worker.py, а не вызов функции
+JOB_RUN_KINDS = tuple(kind.strip() for kind in os.environ.get('JOB_RUN_KINDS', 'create').split(',') if kind.strip())
+MAX_COMMAND_LENGTH = 1000
+
+# Всё, что нужно start_with_profile: ресурсы, настройки server.properties и хост сервера
+MANAGED_SERVER_SQL = (
+    "SELECT s.id, s.name, s.status, s.edition, s.version, s.port, s.rcon_port, s.rcon_password, s.max_players, "
+    "s.docker_host_id, h.url AS docker_url, " + RESOURCE_COLUMNS + ", " + SETTINGS_COLUMNS + " FROM servers s "
+    "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id " + SETTINGS_JOIN
+)
+
+ACTION_STATUS = {
+    'start': 'online',
+    'stop': 'offline',
+    'restart': 'online'
+}
+
+@traced('docker-manager')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Business: Управление Docker контейнерами для Minecraft серверов через HTTP API
-    Args: event с httpMethod, body (serverId, action)
+    Args: event с httpMethod, body (serverId | serverIds, action, command, parallelism, maxPlayers, profile, backupId),
+          queryStringParameters (serverId | serverIds=1,2,3 | all=1 | jobId | view=hosts | view=metrics | view=backups | view=prometheus)
     Returns: HTTP response со статусом контейнера
     """
     method: str = event.get('httpMethod', 'POST')
@@ -20,7 +59,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'POST, GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Maintenance-Token, X-Trace',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -34,11 +73,12 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database not configured'}),
+            'body': json_dumps({'error': 'Database not configured'}),
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(database_url)
+    pool = get_pool(database_url)
+    conn = pool.acquire()
     
     try:
         if method == 'POST':
@@ -46,39 +86,71 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             server_id = body_data.get('serverId')
             action = body_data.get('action')
             
+            if 'serverIds' in body_data:
+                if action == 'command':
+                    return broadcast_command(event, body_data, docker_host, conn)
+                return bulk_manage_containers(event, body_data, docker_host, conn)
+            
+            if action == 'run-jobs':
+                return run_jobs(event, docker_host, conn)
+            
+            if action == 'prewarm':
+                return prewarm(event, body_data, docker_host, conn)
+            
+            if action == 'register-host':
+                return register_docker_host(event, body_data, conn)
+            
+            if action == 'poll-players':
+                return poll_players(event, docker_host, conn)
+            
+            if action == 'collect-metrics':
+                return collect_metrics(event, docker_host, conn)
+            
+            if action == 'reconcile':
+                return reconcile_statuses(event, docker_host, conn)
+            
+            if action == 'hibernate':
+                return hibernate_idle(event, docker_host, conn)
+            
             if not server_id or not action:
                 return {
                     'statusCode': 400,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'serverId and action required'}),
+                    'body': json_dumps({'error': 'serverId and action required'}),
                     'isBase64Encoded': False
                 }
             
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    "SELECT id, name, edition, version, port, rcon_port, max_players "
-                    "FROM servers WHERE id = %s",
-                    (server_id,)
-                )
+                cur.execute(MANAGED_SERVER_SQL + " WHERE s.id = %s", (server_id,))
                 server = cur.fetchone()
                 
                 if not server:
                     return {
                         'statusCode': 404,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Server not found'}),
+                        'body': json_dumps({'error': 'Server not found'}),
                         'isBase64Encoded': False
                     }
                 
                 if action == 'create':
                     return create_container_via_api(server, docker_host, cur, conn)
+                elif action == 'wake' or (action == 'start' and server['status'] == 'sleeping'):
+                    return wake(server, docker_host, conn)
                 elif action in ['start', 'stop', 'restart']:
-                    return manage_container(server, action, docker_host, cur, conn)
+                    return manage_container(server, action, server['docker_url'] or docker_host, cur, conn)
+                elif action == 'command':
+                    return send_command(server, body_data.get('command'), docker_host, cur, conn)
+                elif action == 'resize':
+                    return resize_server(server, body_data, cur, conn)
+                elif action == 'backup':
+                    return enqueue_server_job(server, 'backup', None, cur, conn)
+                elif action == 'restore':
+                    return restore_backup(server, body_data.get('backupId'), cur, conn)
                 else:
                     return {
                         'statusCode': 400,
                         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                        'body': json.dumps({'error': 'Invalid action'}),
+                        'body': json_dumps({'error': 'Invalid action'}),
                         'isBase64Encoded': False
                     }
         
@@ -86,13 +158,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             params = event.get('queryStringParameters', {}) or {}
             server_id = params.get('serverId')
             
-            if server_id:
+            if params.get('jobId'):
+                return get_job_status(params['jobId'], conn)
+            elif params.get('view') == 'hosts':
+                return get_hosts(conn)
+            elif params.get('view') == 'metrics':
+                return get_metrics(params, conn)
+            elif params.get('view') == 'backups':
+                return get_backups(params, conn)
+            elif params.get('serverIds') or params.get('all'):
+                return get_bulk_container_status(event, params, docker_host, conn)
+            elif server_id:
                 return get_container_status(server_id, docker_host, conn)
             else:
                 return {
                     'statusCode': 400,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'serverId required'}),
+                    'body': json_dumps({'error': 'serverId, serverIds or all required'}),
                     'isBase64Encoded': False
                 }
         
@@ -100,152 +182,432 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             return {
                 'statusCode': 405,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}),
+                'body': json_dumps({'error': 'Method not allowed'}),
                 'isBase64Encoded': False
             }
     finally:
-        conn.close()
+        pool.release(conn)
 
 def create_container_via_api(server: Dict, docker_host: str, cur, conn) -> Dict[str, Any]:
-    """Создать контейнер через Docker HTTP API"""
-    container_name = f"minecraft-{server['id']}"
+    """Поставить создание контейнера в очередь: образ может скачиваться дольше таймаута запроса"""
+    job = enqueue_create_job(cur, server['id'])
+    conn.commit()
     
-    image = "itzg/minecraft-server" if server['edition'] == 'java' else "itzg/minecraft-bedrock-server"
-    
-    container_config = {
-        "Image": image,
-        "name": container_name,
-        "Env": [
-            "EULA=TRUE",
-            f"VERSION={server['version']}",
-            "MEMORY=2G",
-            f"MAX_PLAYERS={server['max_players']}",
-            f"MOTD=Welcome to {server['name']}",
-            "ONLINE_MODE=FALSE"
-        ],
-        "HostConfig": {
-            "PortBindings": {
-                "25565/tcp": [{"HostPort": str(server['port'])}]
-            },
-            "RestartPolicy": {
-                "Name": "unless-stopped"
-            }
-        },
-        "ExposedPorts": {
-            "25565/tcp": {}
+    return {
+        'statusCode': 202,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({
+            'status': 'queued',
+            'jobId': job['id'],
+            'message': 'Server container creation queued',
+            'port': server['port']
+        }),
+        'isBase64Encoded': False
+    }
+
+def get_job_status(job_id: str, conn) -> Dict[str, Any]:
+    """Прогресс задачи: создание контейнера, бэкап или восстановление"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        job = get_job(cur, job_id)
+    
+    if not job:
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'Job not found'}),
+            'isBase64Encoded': False
         }
+    
+    result = job['result'] or {}
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({
+            'jobId': job['id'],
+            'serverId': str(job['server_id']),
+            'kind': job['kind'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'progress': job['progress'],
+            'message': job['message'],
+            'attempts': job['attempts'],
+            'containerId': result.get('containerId'),
+            'backupId': result.get('backupId'),
+            'updatedAt': job['updated_at'].isoformat()
+        }),
+        'isBase64Encoded': False
     }
+
+def enqueue_server_job(server: Dict, kind: str, params: Optional[Dict[str, Any]], cur, conn) -> Dict[str, Any]:
+    """Поставить бэкап или восстановление в очередь воркера: мир копируется дольше таймаута запроса"""
+    job = enqueue_job(cur, server['id'], kind, params)
+    conn.commit()
     
+    return {
+        'statusCode': 202,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'status': job['status'], 'jobId': job['id'], 'message': f'Server {kind} queued'}),
+        'isBase64Encoded': False
+    }
+
+def restore_backup(server: Dict, backup_id: Any, cur, conn) -> Dict[str, Any]:
+    """Восстановить мир из удачного бэкапа этого сервера"""
+    cur.execute(
+        "SELECT id FROM server_backups WHERE id = %s AND server_id = %s AND status = 'succeeded'",
+        (backup_id if str(backup_id).isdigit() else None, server['id'])
+    )
+    if cur.fetchone() is None:
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'Backup not found'}),
+            'isBase64Encoded': False
+        }
+    
+    return enqueue_server_job(server, 'restore', {'backupId': int(backup_id)}, cur, conn)
+
+def get_backups(params: Dict[str, Any], conn) -> Dict[str, Any]:
+    """Бэкапы сервера: размер мира, сколько байт оказались новыми и сколько заняли на диске"""
+    server_id = params.get('serverId')
+    if not server_id or not str(server_id).isdigit():
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'serverId required'}),
+            'isBase64Encoded': False
+        }
+    
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        rows = list_backups(cur, server_id)
+    conn.commit()
+    
+    backups = [{
+        'id': row['id'],
+        'status': row['status'],
+        'consistency': row['consistency'],
+        'files': row['file_count'],
+        'totalBytes': row['total_bytes'],
+        'chunks': row['chunk_count'],
+        'newChunks': row['new_chunks'],
+        'newBytes': row['new_bytes'],
+        'storedBytes': row['stored_bytes'],
+        'elapsedMs': row['elapsed_ms'],
+        'message': row['message'],
+        'createdAt': row['created_at'].isoformat() if row['created_at'] else None,
+        'finishedAt': row['finished_at'].isoformat() if row['finished_at'] else None
+    } for row in rows]
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'serverId': str(server_id), 'backups': backups}),
+        'isBase64Encoded': False
+    }
+
+def run_jobs(event: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Обработать очередь в пределах бюджета вызова (для запуска по расписанию без отдельного воркера)"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    processed = run_pending_jobs(conn, get_client(docker_host), budget_seconds=JOB_RUN_BUDGET_SECONDS,
+                                 docker_host=docker_host, kinds=JOB_RUN_KINDS, hard_deadline=True)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'processed': processed}),
+        'isBase64Encoded': False
+    }
+
+def prewarm(event: Dict[str, Any], body_data: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Скачать образы популярных версий и пополнить пул тёплых контейнеров (по расписанию)"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    summary = run_prewarm(
+        conn,
+        get_client(docker_host),
+        top=int(body_data.get('topCombos') or PREWARM_TOP_COMBOS),
+        pool_size=int(body_data.get('poolSize', WARM_POOL_SIZE))
+    )
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps(summary),
+        'isBase64Encoded': False
+    }
+
+def poll_players(event: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Опросить онлайн запущенных серверов и обновить снимок (по расписанию, без отдельного poller.py)"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    summary = run_player_poll(conn, docker_host)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps(summary),
+        'isBase64Encoded': False
+    }
+
+def collect_metrics(event: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Один цикл сборщика метрик (по расписанию, без отдельного collector.py)"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    summary = run_collection(conn, docker_host)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps(summary),
+        'isBase64Encoded': False
+    }
+
+def hibernate_idle(event: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Усыпить серверы без игроков (по расписанию, без отдельного hibernator.py)"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    summary = run_hibernation(conn, docker_host)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps(summary),
+        'isBase64Encoded': False
+    }
+
+def wake(server: Dict, docker_host: str, conn) -> Dict[str, Any]:
+    """Разбудить спящий сервер (кнопка «Запустить» или wake-прокси на порту сервера)"""
     try:
-        url = f"{docker_host}/containers/create?name={container_name}"
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(container_config).encode('utf-8'),
-            headers={'Content-Type': 'application/json'},
-            method='POST'
-        )
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode('utf-8'))
-            container_id = result.get('Id', '')[:12]
-            
-            start_url = f"{docker_host}/containers/{container_id}/start"
-            start_req = urllib.request.Request(start_url, method='POST')
-            urllib.request.urlopen(start_req, timeout=10)
-            
-            cur.execute(
-                "UPDATE servers SET status = %s WHERE id = %s",
-                ('starting', server['id'])
-            )
-            cur.execute(
-                "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
-                (server['id'], 'INFO', f'Docker container created: {container_id}')
-            )
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'status': 'success',
-                    'containerId': container_id,
-                    'message': 'Server container created and starting',
-                    'port': server['port']
-                }),
-                'isBase64Encoded': False
-            }
+        status = wake_server(conn, server['id'], docker_host, 'requested via API')
+    except WakeError as e:
+        return {
+            'statusCode': 409 if server['status'] != 'sleeping' else 502,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
     
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8') if e.fp else str(e)
-        
-        cur.execute(
-            "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
-            (server['id'], 'ERROR', f'Failed to create container: {error_body}')
-        )
-        conn.commit()
-        
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'status': status, 'message': 'Server is waking up'}),
+        'isBase64Encoded': False
+    }
+
+def reconcile_statuses(event: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Один цикл сверки статусов с Docker (по расписанию, без отдельного reconciler.py)"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    summary = run_reconcile(conn, docker_host)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps(summary),
+        'isBase64Encoded': False
+    }
+
+def get_metrics(params: Dict[str, Any], conn) -> Dict[str, Any]:
+    """Метрики сервера за диапазон from..to (ISO 8601, по умолчанию последний час) для графиков"""
+    server_id = params.get('serverId')
+    
+    try:
+        end = parse_timestamp(params.get('to'))
+        start = parse_timestamp(params.get('from'))
+        server_id = int(server_id)
+    except (TypeError, ValueError):
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'error': 'Docker not available or not configured',
-                'message': 'Using simulation mode - server created in database only',
-                'simulation': True
-            }),
+            'body': json_dumps({'error': 'serverId, from and to (ISO 8601) required'}),
             'isBase64Encoded': False
         }
     
-    except Exception as e:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        if end is None:
+            cur.execute("SELECT LOCALTIMESTAMP AS now")
+            end = cur.fetchone()['now']
+        start = start or end - timedelta(hours=1)
+        resolution = pick_resolution(start, end, params.get('resolution'))
+        points = query_metrics(cur, server_id, start, end, resolution)
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({
+            'serverId': str(server_id),
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'resolution': resolution,
+            'points': points
+        }),
+        'isBase64Encoded': False
+    }
+
+def parse_timestamp(value: Any) -> Any:
+    """ISO 8601 в наивное время UTC, как метки в таблицах метрик"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def is_maintenance_authorized(event: Dict[str, Any]) -> bool:
+    """Служебные действия требуют X-Maintenance-Token, если задан секрет MAINTENANCE_TOKEN"""
+    maintenance_token = os.environ.get('MAINTENANCE_TOKEN')
+    headers = event.get('headers', {}) or {}
+    return not maintenance_token or headers.get('X-Maintenance-Token') == maintenance_token
+
+def bulk_scope(event: Dict[str, Any]) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Условие на серверы массового действия: с X-Maintenance-Token — любые серверы флота,
+    без него — только серверы X-User-Id, чужие id получают not_found
+    """
+    headers = event.get('headers', {}) or {}
+    if headers.get('X-Maintenance-Token') and is_maintenance_authorized(event):
+        return "", ()
+    return " AND s.user_id = %s", (headers.get('X-User-Id', 'demo-user'),)
+
+def forbidden_response() -> Dict[str, Any]:
+    return {
+        'statusCode': 403,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'error': 'Forbidden'}),
+        'isBase64Encoded': False
+    }
+
+def register_docker_host(event: Dict[str, Any], body_data: Dict[str, Any], conn) -> Dict[str, Any]:
+    """Добавить Docker хост в реестр планировщика или изменить его ёмкость"""
+    if not is_maintenance_authorized(event):
+        return forbidden_response()
+    
+    name = body_data.get('name')
+    try:
+        memory_mb = int(body_data['memoryMb'])
+        cpus = float(body_data['cpus'])
+    except (KeyError, TypeError, ValueError):
+        memory_mb = cpus = 0
+    
+    if not name or memory_mb <= 0 or cpus <= 0:
         return {
-            'statusCode': 500,
+            'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'error': str(e),
-                'message': 'Using simulation mode',
-                'simulation': True
-            }),
+            'body': json_dumps({'error': 'name, positive memoryMb and cpus required'}),
             'isBase64Encoded': False
         }
+    
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        host = register_host(cur, name, body_data.get('url'), memory_mb, cpus, bool(body_data.get('enabled', True)))
+        conn.commit()
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({
+            'id': host['id'],
+            'name': host['name'],
+            'url': host['url'],
+            'memoryMb': host['memory_mb'],
+            'cpus': float(host['cpus']),
+            'enabled': host['enabled']
+        }),
+        'isBase64Encoded': False
+    }
 
-def manage_container(server: Dict, action: str, docker_host: str, cur, conn) -> Dict[str, Any]:
-    """Управление контейнером (start/stop/restart)"""
-    container_name = f"minecraft-{server['id']}"
+def get_hosts(conn) -> Dict[str, Any]:
+    """Docker хосты с занятой и свободной ёмкостью и памятью, освобождённой спящими серверами"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        hosts = list_hosts(cur)
+        hibernation = hibernation_by_host(cur)
     
-    status_map = {
-        'start': 'online',
-        'stop': 'offline',
-        'restart': 'online'
+    idle = {'sleeping': 0, 'paused': 0, 'freedMemoryMb': 0}
+    result = []
+    for host in hosts:
+        result.append({
+            'id': host['id'],
+            'name': host['name'],
+            'memoryMb': host['memory_mb'],
+            'freeMemoryMb': host['free_memory_mb'],
+            'cpus': float(host['cpus']),
+            'freeCpus': float(host['free_cpus']),
+            'freeGamePorts': host['free_game_ports'],
+            'freeRconPorts': host['free_rcon_ports'],
+            'hibernation': hibernation.get(host['id'], idle)
+        })
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'hosts': result, 'defaultHostHibernation': hibernation.get(None, idle)}),
+        'isBase64Encoded': False
     }
+
+def manage_container(server: Dict, action: str, docker_host: str, cur, conn) -> Dict[str, Any]:
+    """Управление контейнером (start/stop/restart); start и restart применяют профиль ресурсов и server.properties"""
+    container_name = f"minecraft-{server['id']}"
     
-    new_status = status_map.get(action, 'offline')
+    new_status = ACTION_STATUS.get(action, 'offline')
     
     try:
-        url = f"{docker_host}/containers/{container_name}/{action}"
-        req = urllib.request.Request(url, method='POST')
-        urllib.request.urlopen(req, timeout=30)
+        client = get_client(docker_host)
+        applied = None
+        if action in ('start', 'restart'):
+            applied = run(start_with_profile(client, server, restart=action == 'restart'))
+        else:
+            run(client.container_action(container_name, action, timeout=30))
         
-        cur.execute("UPDATE servers SET status = %s WHERE id = %s", (new_status, server['id']))
+        cur.execute(
+            "UPDATE servers SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (new_status, server['id'])
+        )
         cur.execute(
             "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
             (server['id'], 'INFO', f'Container {action} completed')
         )
+        if applied and applied['recreated']:
+            cur.execute(
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+                (server['id'], 'INFO', f"Container recreated for profile {server['resource_profile']}")
+            )
+        elif applied and applied['profilePending']:
+            cur.execute(
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+                (server['id'], 'WARNING', 'Heap or GC change needs a /data volume to recreate the container; '
+                                          'limits and server.properties were applied')
+            )
         conn.commit()
         
+        result = {'status': new_status, 'message': f'Server {action} successful'}
+        if applied and applied['applied']:
+            result['resources'] = profile_json(server)
+            result['recreated'] = applied['recreated']
+            result['profilePending'] = applied['profilePending']
+        
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'status': new_status, 'message': f'Server {action} successful'}),
+            'body': json_dumps(result),
             'isBase64Encoded': False
         }
     
     except Exception as e:
-        cur.execute("UPDATE servers SET status = %s WHERE id = %s", (new_status, server['id']))
+        cur.execute(
+            "UPDATE servers SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (new_status, server['id'])
+        )
         conn.commit()
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
+            'body': json_dumps({
                 'status': new_status,
                 'message': f'Server {action} (simulation mode)',
                 'simulation': True
@@ -253,43 +615,414 @@ def manage_container(server: Dict, action: str, docker_host: str, cur, conn) ->
             'isBase64Encoded': False
         }
 
+def resize_server(server: Dict, body_data: Dict[str, Any], cur, conn) -> Dict[str, Any]:
+    """
+    Сменить профиль ресурсов: по maxPlayers или явному profile (small..huge), jvmGc — aikar | default.
+    Рост проверяется по остатку хоста сервера; новые лимиты применяются при следующем start/restart.
+    """
+    try:
+        max_players = int(body_data.get('maxPlayers', server['max_players']))
+        if max_players <= 0:
+            raise ValueError('maxPlayers must be positive')
+        resources = resource_profile(server['edition'], max_players, body_data.get('profile'),
+                                     body_data.get('jvmGc') or server.get('jvm_gc'))
+    except (TypeError, ValueError, UnknownProfile) as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    
+    grow_memory = max(0, resources['memory_mb'] - server['memory_mb'])
+    grow_cpus = max(0.0, resources['cpus'] - float(server['cpus']))
+    if (grow_memory or grow_cpus) and not can_grow(cur, server['docker_host_id'], grow_memory, grow_cpus):
+        conn.rollback()
+        return {
+            'statusCode': 409,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': f'Docker host cannot fit {grow_memory} MB / {grow_cpus} CPU more'}),
+            'isBase64Encoded': False
+        }
+    
+    cur.execute(
+        "UPDATE servers SET max_players = %s, resource_profile = %s, heap_mb = %s, memory_mb = %s, cpus = %s, "
+        "cpu_limit = %s, jvm_gc = %s, view_distance = %s, simulation_distance = %s WHERE id = %s",
+        (max_players, resources['resource_profile'], resources['heap_mb'], resources['memory_mb'], resources['cpus'],
+         resources['cpu_limit'], resources['jvm_gc'], resources['view_distance'], resources['simulation_distance'],
+         server['id'])
+    )
+    cur.execute(
+        "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+        (server['id'], 'INFO', f"Resource profile set to {resources['resource_profile']}: "
+                               f"{resources['memory_mb']} MB / {resources['cpus']} CPU reserved "
+                               f"(up to {resources['cpu_limit']}), applies on next start")
+    )
+    conn.commit()
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({
+            'maxPlayers': max_players,
+            'resources': profile_json(resources),
+            'message': 'Resource profile updated, applies on next start or restart'
+        }),
+        'isBase64Encoded': False
+    }
+
+def send_command(server: Dict, command: Any, docker_host: str, cur, conn) -> Dict[str, Any]:
+    """Консольная команда через RCON; соединение берётся из пула и остаётся открытым"""
+    error = validate_command(command)
+    if error is None and (server['edition'] != 'java' or not server['rcon_port'] or not server['rcon_password']):
+        error = 'RCON is available only for Java servers'
+    if error:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': error}),
+            'isBase64Encoded': False
+        }
+    
+    host = server_address(server['docker_url'], docker_host)
+    try:
+        output = run(get_rcon_pool().command(host, server['rcon_port'], server['rcon_password'], command))
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, RconError) as e:
+        return {
+            'statusCode': 502,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': f'RCON failed: {str(e) or type(e).__name__}'}),
+            'isBase64Encoded': False
+        }
+    
+    cur.execute(
+        "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+        (server['id'], 'COMMAND', command)
+    )
+    conn.commit()
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'command': command, 'output': output}),
+        'isBase64Encoded': False
+    }
+
+def validate_command(command: Any) -> Optional[str]:
+    if not isinstance(command, str) or not command.strip():
+        return 'command required'
+    if len(command) > MAX_COMMAND_LENGTH or '\n' in command or '\r' in command:
+        return f'command must be a single line of at most {MAX_COMMAND_LENGTH} characters'
+    return None
+
 def get_container_status(server_id: str, docker_host: str, conn) -> Dict[str, Any]:
-    """Получить статус контейнера"""
+    """Получить статус контейнера на Docker хосте сервера"""
     container_name = f"minecraft-{server_id}"
     
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT s.status, h.url AS docker_url FROM servers s "
+            "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id WHERE s.id = %s",
+            (server_id,)
+        )
+        server = cur.fetchone()
+    
     try:
-        url = f"{docker_host}/containers/{container_name}/json"
-        req = urllib.request.Request(url)
+        server_host = (server['docker_url'] if server else None) or docker_host
+        container_data = run(get_client(server_host).inspect_container(container_name, timeout=10))
         
-        with urllib.request.urlopen(req, timeout=10) as response:
-            container_data = json.loads(response.read().decode('utf-8'))
-            
-            is_running = container_data.get('State', {}).get('Running', False)
-            status = 'online' if is_running else 'offline'
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'status': status,
-                    'containerId': container_data.get('Id', '')[:12],
-                    'uptime': container_data.get('State', {}).get('Status', 'unknown')
-                }),
-                'isBase64Encoded': False
-            }
-    
-    except Exception:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT status FROM servers WHERE id = %s", (server_id,))
-            result = cur.fetchone()
-            status = result['status'] if result else 'offline'
+        is_running = container_data.get('State', {}).get('Running', False)
+        status = 'online' if is_running else 'offline'
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
+            'body': json_dumps({
                 'status': status,
+                'containerId': container_data.get('Id', '')[:12],
+                'uptime': container_data.get('State', {}).get('Status', 'unknown')
+            }),
+            'isBase64Encoded': False
+        }
+    
+    except Exception:
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({
+                'status': server['status'] if server else 'offline',
                 'simulation': True
             }),
             'isBase64Encoded': False
         }
+
+def get_bulk_container_status(event: Dict[str, Any], params: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Статусы многих серверов: один запрос в БД и по одному листингу на каждый Docker хост"""
+    headers = event.get('headers', {})
+    user_id = headers.get('X-User-Id', 'demo-user')
+    
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        if params.get('serverIds'):
+            try:
+                server_ids = sorted({int(part) for part in params['serverIds'].split(',') if part.strip()})
+            except ValueError:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json_dumps({'error': 'serverIds must be a comma-separated list of integers'}),
+                    'isBase64Encoded': False
+                }
+            
+            if len(server_ids) > MAX_BULK_SERVERS:
+                return {
+                    'statusCode': 400,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json_dumps({'error': f'At most {MAX_BULK_SERVERS} servers per request'}),
+                    'isBase64Encoded': False
+                }
+            
+            scope = "s.id = ANY(%s)"
+            scope_args = (server_ids,)
+        else:
+            scope = "s.user_id = %s"
+            scope_args = (user_id,)
+        cur.execute(
+            "SELECT s.id, s.status, h.url AS docker_url FROM servers s "
+            "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id WHERE " + scope,
+            scope_args
+        )
+        rows = cur.fetchall()
+    
+    db_statuses = {str(row['id']): row['status'] for row in rows}
+    server_hosts = {str(row['id']): row['docker_url'] or docker_host for row in rows}
+    listings = list_containers_on_hosts(sorted(set(server_hosts.values())))
+    docker_available = all(listing is not None for listing in listings.values())
+    
+    statuses = {}
+    for server_id, db_status in db_statuses.items():
+        container = (listings[server_hosts[server_id]] or {}).get(server_id)
+        if container:
+            statuses[server_id] = {
+                'status': 'online' if container.get('State') == 'running' else 'offline',
+                'containerId': container.get('Id', '')[:12],
+                'uptime': container.get('Status', 'unknown')
+            }
+        else:
+            statuses[server_id] = {'status': db_status, 'simulation': True}
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({
+            'statuses': statuses,
+            'count': len(statuses),
+            'dockerAvailable': docker_available
+        }),
+        'isBase64Encoded': False
+    }
+
+def bulk_manage_containers(event: Dict[str, Any], body_data: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """
+    Массовый start/stop/restart: параллельные вызовы Docker и одна транзакция на все записи.
+    start и restart применяют профиль ресурсов и server.properties, как одиночный manage_container.
+    """
+    action = body_data.get('action')
+    server_ids = body_data.get('serverIds')
+    
+    if action not in ACTION_STATUS or not isinstance(server_ids, list) or not server_ids:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'serverIds list and action (start, stop, restart) required'}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        server_ids = sorted({int(server_id) for server_id in server_ids})
+        parallelism = int(body_data.get('parallelism') or BULK_PARALLELISM)
+    except (TypeError, ValueError):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'serverIds and parallelism must be integers'}),
+            'isBase64Encoded': False
+        }
+    
+    if len(server_ids) > MAX_BULK_SERVERS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': f'At most {MAX_BULK_SERVERS} servers per request'}),
+            'isBase64Encoded': False
+        }
+    
+    parallelism = max(1, min(parallelism, MAX_BULK_PARALLELISM))
+    new_status = ACTION_STATUS[action]
+    
+    scope, scope_args = bulk_scope(event)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(MANAGED_SERVER_SQL + " WHERE s.id = ANY(%s)" + scope + " ORDER BY s.id", (server_ids,) + scope_args)
+        targets = [(server, get_client(server['docker_url'] or docker_host)) for server in cur.fetchall()]
+    
+    existing = [server for server, _ in targets]
+    outcomes = run(run_bulk_action(targets, action, parallelism))
+    
+    results = {str(server_id): {'result': 'not_found'} for server_id in server_ids}
+    status_rows = []
+    log_rows = []
+    for server, (applied, error) in zip(existing, outcomes):
+        server_id = server['id']
+        if error is None:
+            status_rows.append((server_id, new_status))
+            log_rows.append((server_id, 'INFO', f'Container {action} completed'))
+            result = {'result': 'ok', 'status': new_status}
+            if applied and applied['applied']:
+                result['recreated'] = applied['recreated']
+                result['profilePending'] = applied['profilePending']
+            if applied and applied['recreated']:
+                log_rows.append((server_id, 'INFO', f"Container recreated for profile {server['resource_profile']}"))
+            elif applied and applied['profilePending']:
+                log_rows.append((server_id, 'WARNING', 'Heap or GC change needs a /data volume to recreate the container; '
+                                                       'limits and server.properties were applied'))
+            results[str(server_id)] = result
+        else:
+            # Недоступный хост (отказ в соединении, таймаут) — тоже отказ: статус не меняется,
+            # иначе массовый restart при лежащем Docker рапортует успех и расходится с контейнерами
+            message = error.message if isinstance(error, DockerError) else str(error) or type(error).__name__
+            log_rows.append((server_id, 'ERROR', f'Container {action} failed: {message}'))
+            results[str(server_id)] = {'result': 'failed', 'error': message}
+    
+    with conn.cursor() as cur:
+        if status_rows:
+            execute_values(
+                cur,
+                "UPDATE servers AS s SET status = v.status, updated_at = CURRENT_TIMESTAMP "
+                "FROM (VALUES %s) AS v(id, status) WHERE s.id = v.id",
+                status_rows,
+                template="(%s::integer, %s::varchar)",
+                page_size=1000
+            )
+        if log_rows:
+            execute_values(
+                cur,
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES %s",
+                log_rows,
+                page_size=1000
+            )
+        conn.commit()
+    
+    summary = {'ok': 0, 'failed': 0, 'not_found': 0}
+    for result in results.values():
+        summary[result['result']] += 1
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'action': action, 'results': results, 'summary': summary}),
+        'isBase64Encoded': False
+    }
+
+async def run_bulk_action(targets: List[Tuple[Dict[str, Any], DockerClient]], action: str,
+                          parallelism: int) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+    """
+    Вызвать действие для каждого контейнера на его хосте не более чем parallelism запросами одновременно;
+    для каждого сервера — (итог start_with_profile или None для stop, ошибка или None)
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+    
+    async def one(server: Dict[str, Any], client: DockerClient) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        async with semaphore:
+            try:
+                if action in ('start', 'restart'):
+                    return await start_with_profile(client, server, restart=action == 'restart'), None
+                await client.container_action(f"{CONTAINER_PREFIX}{server['id']}", action, timeout=30)
+                return None, None
+            except Exception as e:
+                return None, e
+    
+    return await asyncio.gather(*(one(server, client) for server, client in targets))
+
+def broadcast_command(event: Dict[str, Any], body_data: Dict[str, Any], docker_host: str, conn) -> Dict[str, Any]:
+    """Одна команда (save-all, say ...) на много серверов: параллельно через пул RCON, логи одной вставкой"""
+    command = body_data.get('command')
+    server_ids = body_data.get('serverIds')
+    
+    error = validate_command(command)
+    if error is None and (not isinstance(server_ids, list) or not server_ids):
+        error = 'serverIds list required'
+    if error:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': error}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        server_ids = sorted({int(server_id) for server_id in server_ids})
+        parallelism = int(body_data.get('parallelism') or BULK_PARALLELISM)
+    except (TypeError, ValueError):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'serverIds and parallelism must be integers'}),
+            'isBase64Encoded': False
+        }
+    
+    if len(server_ids) > MAX_BULK_SERVERS:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': f'At most {MAX_BULK_SERVERS} servers per request'}),
+            'isBase64Encoded': False
+        }
+    
+    parallelism = max(1, min(parallelism, MAX_BULK_PARALLELISM))
+    
+    scope, scope_args = bulk_scope(event)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT s.id, s.edition, s.rcon_port, s.rcon_password, h.url AS docker_url FROM servers s "
+            "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id WHERE s.id = ANY(%s)" + scope + " ORDER BY s.id",
+            (server_ids,) + scope_args
+        )
+        rows = cur.fetchall()
+    
+    results = {str(server_id): {'result': 'not_found'} for server_id in server_ids}
+    targets = []
+    for row in rows:
+        if row['edition'] != 'java' or not row['rcon_port'] or not row['rcon_password']:
+            results[str(row['id'])] = {'result': 'unsupported'}
+            continue
+        targets.append((row['id'], server_address(row['docker_url'], docker_host), row['rcon_port'], row['rcon_password']))
+    
+    outcomes = run(broadcast(get_rcon_pool(), targets, command, parallelism))
+    
+    log_rows = []
+    for (server_id, _, _, _), outcome in zip(targets, outcomes):
+        if isinstance(outcome, Exception):
+            results[str(server_id)] = {'result': 'failed', 'error': str(outcome) or type(outcome).__name__}
+        else:
+            results[str(server_id)] = {'result': 'ok', 'output': outcome}
+            log_rows.append((server_id, 'COMMAND', command))
+    
+    if log_rows:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES %s",
+                log_rows,
+                page_size=1000
+            )
+            conn.commit()
+    
+    summary = {'ok': 0, 'failed': 0, 'unsupported': 0, 'not_found': 0}
+    for result in results.values():
+        summary[result['result']] += 1
+    
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'action': 'command', 'command': command, 'results': results, 'summary': summary}),
+        'isBase64Encoded': False
+    }
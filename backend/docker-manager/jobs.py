@@ -0,0 +1,330 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from container_config import (
+    IMAGE_TAG, RESOURCE_COLUMNS, SETTINGS_COLUMNS, SETTINGS_JOIN, build_container_config,
+    build_server_properties_archive, container_name, image_for
+)
+from docker_client import DockerClient, DockerConnectionError, DockerError, get_client, run
+from backup import BackupError, run_backup, run_restore
+from prewarm import claim_warm_container
+
+JOB_LOCK_TIMEOUT_SECONDS = int(os.environ.get('JOB_LOCK_TIMEOUT', '1800'))
+JOB_RETRY_DELAY_SECONDS = int(os.environ.get('JOB_RETRY_DELAY', '30'))
+IMAGE_PULL_TIMEOUT = float(os.environ.get('IMAGE_PULL_TIMEOUT', '1800'))
+PROGRESS_WRITE_INTERVAL = 1.0
+
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}'
+
+JOB_KINDS = ('create', 'backup', 'restore')
+# Задачи, которые создают или заменяют контейнер сервера: пока они идут, контейнера может не быть
+CONTAINER_JOB_KINDS = ('create', 'restore')
+
+JOB_COLUMNS = "id, server_id, kind, status, stage, progress, message, result, params, attempts, max_attempts"
+
+SERVER_SQL = (
+    "SELECT s.id, s.name, s.status, s.edition, s.version, s.port, s.rcon_port, s.rcon_password, s.max_players, "
+    "s.docker_host_id, h.name AS docker_host, h.url AS docker_url, "
+    + RESOURCE_COLUMNS + ", " + SETTINGS_COLUMNS + " FROM servers s "
+    "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id " + SETTINGS_JOIN + " WHERE s.id = %s"
+)
+
+
+def enqueue_job(cur, server_id: int, kind: str, params: Optional[Dict[str, Any]] = None,
+                max_attempts: int = 3) -> Dict[str, Any]:
+    """Поставить задачу в очередь; активная задача того же вида для сервера переиспользуется"""
+    cur.execute(
+        "INSERT INTO container_jobs (server_id, kind, params, max_attempts) VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (server_id, kind) WHERE status IN ('queued', 'running') DO NOTHING "
+        "RETURNING " + JOB_COLUMNS,
+        (server_id, kind, json.dumps(params) if params is not None else None, max_attempts)
+    )
+    job = cur.fetchone()
+    if job is None:
+        cur.execute(
+            "SELECT " + JOB_COLUMNS + " FROM container_jobs "
+            "WHERE server_id = %s AND kind = %s AND status IN ('queued', 'running')",
+            (server_id, kind)
+        )
+        job = cur.fetchone()
+    return job
+
+
+def enqueue_create_job(cur, server_id: int) -> Dict[str, Any]:
+    """Поставить создание контейнера в очередь: образ может скачиваться дольше таймаута запроса"""
+    return enqueue_job(cur, server_id, 'create')
+
+
+def get_job(cur, job_id: int) -> Optional[Dict[str, Any]]:
+    cur.execute("SELECT " + JOB_COLUMNS + ", updated_at FROM container_jobs WHERE id = %s", (job_id,))
+    return cur.fetchone()
+
+
+def claim_job(conn, worker_id: str = WORKER_ID, kinds: Tuple[str, ...] = JOB_KINDS) -> Optional[Dict[str, Any]]:
+    """
+    Забрать одну задачу из kinds: FOR UPDATE SKIP LOCKED не даёт двум воркерам взять одну и ту же строку.
+    Задачи, зависшие в running дольше JOB_LOCK_TIMEOUT (упавший воркер), забираются повторно.
+    """
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "UPDATE container_jobs SET status = 'running', attempts = attempts + 1, "
+            "locked_by = %s, locked_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = ("
+            "  SELECT id FROM container_jobs "
+            "  WHERE ((status = 'queued' AND run_after <= CURRENT_TIMESTAMP) "
+            "     OR (status = 'running' AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s))) "
+            "    AND kind = ANY(%s) "
+            "  ORDER BY id FOR UPDATE SKIP LOCKED LIMIT 1"
+            ") RETURNING " + JOB_COLUMNS,
+            (worker_id, JOB_LOCK_TIMEOUT_SECONDS, list(kinds))
+        )
+        job = cur.fetchone()
+        conn.commit()
+    return job
+
+
+def update_progress(conn, job_id: int, stage: str, progress: int, message: Optional[str] = None) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE container_jobs SET stage = %s, progress = %s, message = COALESCE(%s, message), "
+            "locked_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (stage, progress, message, job_id)
+        )
+        conn.commit()
+
+
+def process_create_job(conn, client: DockerClient, job: Dict[str, Any], deadline: Optional[float] = None) -> None:
+    """
+    Скачать образ при необходимости, создать и запустить контейнер на хосте сервера,
+    записать итог в БД. client — клиент хоста по умолчанию (DOCKER_HOST_URL).
+    deadline (time.monotonic) обрывает скачивание образа: задача возвращается в очередь без траты
+    попытки, скачанные слои остаются на хосте, и следующий запуск продолжает с них.
+    """
+    job_id = job['id']
+
+    server = load_server(conn, job['server_id'])
+    if server is None:
+        finish_job(conn, job, 'failed', 'Server not found', log=False)
+        return
+
+    if server['docker_url']:
+        client = get_client(server['docker_url'])
+
+    warm = claim_warm_container(conn, client, server)
+    if warm is not None:
+        container_id, server['port'] = warm
+        update_progress(conn, job_id, 'starting', 90, f'Claimed warm container {container_id}')
+        try:
+            run(client.container_action(container_id, 'start', timeout=30))
+        except Exception as e:
+            fail_attempt(conn, job, e, 'Failed to start container')
+            return
+        complete_create_job(conn, job, server, container_id)
+        return
+
+    try:
+        image = image_for(server['edition'])
+        update_progress(conn, job_id, 'pulling', 5, f'Checking image {image}:{IMAGE_TAG}')
+
+        if not run(client.image_exists(f'{image}:{IMAGE_TAG}')):
+            last_write = [0.0]
+
+            def on_progress(fraction: float) -> None:
+                now = time.monotonic()
+                if now - last_write[0] >= PROGRESS_WRITE_INTERVAL:
+                    last_write[0] = now
+                    update_progress(conn, job_id, 'pulling', 5 + int(fraction * 65))
+
+            pull_timeout = IMAGE_PULL_TIMEOUT
+            if deadline is not None:
+                pull_timeout = min(pull_timeout, max(0.0, deadline - time.monotonic()))
+            try:
+                run(client.pull_image(image, IMAGE_TAG, on_progress, timeout=pull_timeout))
+            except (asyncio.TimeoutError, DockerConnectionError):
+                if deadline is None or time.monotonic() < deadline:
+                    raise
+                defer_job(conn, job, f'Pulling {image}:{IMAGE_TAG}, continues on next run')
+                return
+
+        update_progress(conn, job_id, 'creating', 75, 'Creating container')
+        name = container_name(server['id'])
+        try:
+            created = run(client.create_container(name, build_container_config(server), timeout=30))
+            container_id = created.get('Id', '')[:12]
+        except DockerError as e:
+            # Повтор после сбоя мог застать контейнер уже созданным предыдущей попыткой
+            if e.status != 409:
+                raise
+            container_id = run(client.inspect_container(name)).get('Id', '')[:12]
+        run(client.put_archive(container_id, '/data', build_server_properties_archive(server), timeout=30))
+
+        update_progress(conn, job_id, 'starting', 90, 'Starting container')
+        run(client.container_action(container_id, 'start', timeout=30))
+    except Exception as e:
+        fail_attempt(conn, job, e, 'Failed to create container')
+        return
+
+    complete_create_job(conn, job, server, container_id)
+
+
+def load_server(conn, server_id: int) -> Optional[Dict[str, Any]]:
+    """Сервер со всем, что нужно для конфигурации контейнера: профиль, настройки, хост"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(SERVER_SQL, (server_id,))
+        server = cur.fetchone()
+    conn.commit()
+    return server
+
+
+def process_backup_job(conn, client: DockerClient, job: Dict[str, Any], docker_host: str) -> None:
+    """Бэкап мира в хранилище кусков; прогресс — прочитанные мегабайты архива"""
+    server = load_server(conn, job['server_id'])
+    if server is None:
+        finish_job(conn, job, 'failed', 'Server not found', log=False)
+        return
+    if server['docker_url']:
+        client = get_client(server['docker_url'])
+
+    update_progress(conn, job['id'], 'backing-up', 10, 'Reading world from container')
+    last_write = [0.0]
+
+    def on_progress(received: int) -> None:
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_WRITE_INTERVAL:
+            last_write[0] = now
+            update_progress(conn, job['id'], 'backing-up', 50, f'Read {received // (1024 * 1024)} MB')
+
+    try:
+        summary = run_backup(conn, client, server, docker_host, job_id=job['id'], on_progress=on_progress)
+    except Exception as e:
+        fail_attempt(conn, job, e, 'Backup failed')
+        return
+    succeed_job(conn, job, f"Backup {summary['backupId']} completed", summary)
+
+
+def process_restore_job(conn, client: DockerClient, job: Dict[str, Any]) -> None:
+    """Восстановление мира из бэкапа params.backupId"""
+    server = load_server(conn, job['server_id'])
+    backup_id = (job.get('params') or {}).get('backupId')
+    if server is None or backup_id is None:
+        finish_job(conn, job, 'failed', 'Server or backup not found', log=False)
+        return
+    if server['docker_url']:
+        client = get_client(server['docker_url'])
+
+    update_progress(conn, job['id'], 'restoring', 10, f'Restoring backup {backup_id}')
+    try:
+        summary = run_restore(conn, client, server, int(backup_id))
+    except BackupError as e:
+        finish_job(conn, job, 'failed', f'Restore failed: {e}')
+        return
+    except Exception as e:
+        fail_attempt(conn, job, e, 'Restore failed')
+        return
+    succeed_job(conn, job, f'Backup {backup_id} restored', summary)
+
+
+def succeed_job(conn, job: Dict[str, Any], message: str, result: Dict[str, Any]) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE container_jobs SET status = 'succeeded', stage = 'done', progress = 100, "
+            "message = %s, result = %s, locked_by = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (message, json.dumps(result), job['id'])
+        )
+        conn.commit()
+
+
+def complete_create_job(conn, job: Dict[str, Any], server: Dict[str, Any], container_id: str) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE servers SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            ('starting', server['id'])
+        )
+        cur.execute(
+            "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+            (server['id'], 'INFO', f'Docker container created: {container_id}')
+        )
+        cur.execute(
+            "UPDATE container_jobs SET status = 'succeeded', stage = 'done', progress = 100, "
+            "message = %s, result = %s, locked_by = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            ('Server container created and starting',
+             json.dumps({'containerId': container_id, 'port': server['port']}), job['id'])
+        )
+        conn.commit()
+
+
+def fail_attempt(conn, job: Dict[str, Any], error: Exception, prefix: str) -> None:
+    """Повторить задачу позже или, если попытки кончились, пометить её failed"""
+    message = error.message if isinstance(error, DockerError) else str(error)
+    if job['attempts'] < job['max_attempts']:
+        retry_job(conn, job, message)
+    else:
+        finish_job(conn, job, 'failed', f'{prefix}: {message}')
+
+
+def defer_job(conn, job: Dict[str, Any], message: str) -> None:
+    """Вернуть задачу в очередь сразу и без траты попытки (кончился бюджет вызова, а не сломался Docker)"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE container_jobs SET status = 'queued', message = %s, attempts = attempts - 1, locked_by = NULL, "
+            "run_after = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (message, job['id'])
+        )
+        conn.commit()
+
+
+def retry_job(conn, job: Dict[str, Any], message: str) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE container_jobs SET status = 'queued', stage = 'queued', message = %s, locked_by = NULL, "
+            "run_after = CURRENT_TIMESTAMP + make_interval(secs => %s), updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = %s",
+            (f'Attempt {job["attempts"]} failed: {message}', JOB_RETRY_DELAY_SECONDS * job['attempts'], job['id'])
+        )
+        conn.commit()
+
+
+def finish_job(conn, job: Dict[str, Any], status: str, message: str, log: bool = True) -> None:
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE container_jobs SET status = %s, stage = 'done', message = %s, locked_by = NULL, "
+            "updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            (status, message, job['id'])
+        )
+        if status == 'failed' and log:
+            cur.execute(
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
+                (job['server_id'], 'ERROR', message)
+            )
+        conn.commit()
+
+
+def run_pending_jobs(conn, client: DockerClient, budget_seconds: float, max_jobs: Optional[int] = None,
+                     docker_host: Optional[str] = None, kinds: Tuple[str, ...] = JOB_KINDS,
+                     hard_deadline: bool = False) -> int:
+    """
+    Обрабатывать задачи, пока они есть и не исчерпан бюджет времени; вернуть число обработанных.
+    docker_host — DOCKER_HOST_URL, нужен бэкапу для адреса RCON серверов хоста по умолчанию.
+    hard_deadline — вызов не переживёт бюджет (HTTP-функция): скачивание образа обрывается на нём же.
+    """
+    docker_host = docker_host or os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    deadline = time.monotonic() + budget_seconds
+    processed = 0
+    while time.monotonic() < deadline and (max_jobs is None or processed < max_jobs):
+        job = claim_job(conn, kinds=kinds)
+        if job is None:
+            break
+        if job['kind'] == 'create':
+            process_create_job(conn, client, job, deadline if hard_deadline else None)
+        elif job['kind'] == 'backup':
+            process_backup_job(conn, client, job, docker_host)
+        elif job['kind'] == 'restore':
+            process_restore_job(conn, client, job)
+        processed += 1
+    return processed
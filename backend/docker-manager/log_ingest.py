@@ -0,0 +1,404 @@
+import asyncio
+import calendar
+import io
+import os
+import re
+import struct
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from container_config import container_name
+from docker_client import DockerClient, DockerConnectionError, DockerError, normalize_docker_url
+
+LOG_BATCH_LINES = int(os.environ.get('LOG_BATCH_LINES', '5000'))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', '1'))
+LOG_BUFFER_LINES = int(os.environ.get('LOG_BUFFER_LINES', '100000'))
+LOG_SERVER_MAX_PENDING = int(os.environ.get('LOG_SERVER_MAX_PENDING', '10000'))
+LOG_DISCOVER_INTERVAL = float(os.environ.get('LOG_DISCOVER_INTERVAL', '10'))
+LOG_BACKFILL_SECONDS = int(os.environ.get('LOG_BACKFILL_SECONDS', '3600'))
+LOG_MAX_LINE_LENGTH = int(os.environ.get('LOG_MAX_LINE_LENGTH', '4096'))
+LOG_MAX_STREAMS = int(os.environ.get('LOG_MAX_STREAMS', '1000'))
+LOG_DRAIN_TIMEOUT = float(os.environ.get('LOG_DRAIN_TIMEOUT', '60'))
+
+STREAM_STDOUT = 1
+STREAM_STDERR = 2
+FRAME_HEADER = struct.Struct('>B3xI')
+
+# Vanilla: "[10:00:00] [Server thread/INFO]: ...", Paper: "[10:00:00 INFO]: ..."
+LEVEL_PATTERN = re.compile(r'^(?:\[[^\]]*\] )?\[[^\]]*?[/ ](INFO|WARN|WARNING|ERROR|SEVERE|FATAL|DEBUG)\]')
+LEVELS = {
+    'INFO': 'INFO', 'WARN': 'WARN', 'WARNING': 'WARN', 'ERROR': 'ERROR',
+    'SEVERE': 'ERROR', 'FATAL': 'ERROR', 'DEBUG': 'DEBUG'
+}
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]')
+COPY_SPECIAL = re.compile(r'[\\\t\r\n\x00]')
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\r': '\\r', '\n': '\\n', '\x00': ''})
+COPY_SQL = "COPY server_logs (server_id, log_type, message, created_at) FROM STDIN"
+
+
+class LogDemuxer:
+    """
+    Разбор потока /containers/{id}/logs. Без Tty каждый кадр — заголовок [поток, 0, 0, 0, длина BE]
+    и данные; кадры и строки режутся на куски TCP как угодно, поэтому хвосты копятся между вызовами.
+    С Tty поток сырой — это определяется по первым байтам.
+    """
+
+    def __init__(self) -> None:
+        self.multiplexed: Optional[bool] = None
+        self._buffer = b''
+        self._partial = {STREAM_STDOUT: b'', STREAM_STDERR: b''}
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        buffer = self._buffer + data if self._buffer else data
+        if self.multiplexed is None:
+            if len(buffer) < FRAME_HEADER.size:
+                self._buffer = buffer
+                return []
+            self.multiplexed = buffer[0] in (0, 1, 2) and buffer[1:4] == b'\x00\x00\x00'
+        if not self.multiplexed:
+            self._buffer = b''
+            return self._split(STREAM_STDOUT, buffer)
+
+        lines: List[Tuple[int, bytes]] = []
+        offset = 0
+        end = len(buffer)
+        while end - offset >= FRAME_HEADER.size:
+            stream, size = FRAME_HEADER.unpack_from(buffer, offset)
+            start = offset + FRAME_HEADER.size
+            if end - start < size:
+                break
+            offset = start + size
+            lines.extend(self._split(STREAM_STDERR if stream == STREAM_STDERR else STREAM_STDOUT, buffer[start:offset]))
+        self._buffer = buffer[offset:]
+        return lines
+
+    def flush(self) -> List[Tuple[int, bytes]]:
+        """Недописанные строки в конце потока"""
+        lines = [(stream, partial) for stream, partial in self._partial.items() if partial]
+        self._partial = {STREAM_STDOUT: b'', STREAM_STDERR: b''}
+        return lines
+
+    def _split(self, stream: int, payload: bytes) -> List[Tuple[int, bytes]]:
+        partial = self._partial[stream]
+        parts = (partial + payload if partial else payload).split(b'\n')
+        self._partial[stream] = parts.pop()
+        return [(stream, part) for part in parts if part]
+
+
+class LineEncoder:
+    """
+    Строки Docker с меткой времени (timestamps=1) → строки COPY для server_logs.
+    since у Docker включительный, поэтому строки не новее курсора отбрасываются.
+    """
+
+    def __init__(self, server_id: int, cursor_ns: int, max_length: int = LOG_MAX_LINE_LENGTH) -> None:
+        self.cursor_ns = cursor_ns
+        self.max_length = max_length
+        self._prefix = f'{server_id}\t'
+        self._second = ''
+        self._second_ns = 0
+
+    def encode(self, lines: List[Tuple[int, bytes]]) -> List[str]:
+        rows = []
+        for stream, raw in lines:
+            stamp, _, message = raw.decode('utf-8', 'replace').partition(' ')
+            parsed = self._parse_stamp(stamp)
+            if parsed is None:
+                continue
+            timestamp_ns, created_at = parsed
+            if timestamp_ns <= self.cursor_ns:
+                continue
+            self.cursor_ns = timestamp_ns
+
+            message = message.rstrip('\r')
+            if '\x1b' in message:
+                message = ANSI_PATTERN.sub('', message)
+            if not message.strip():
+                continue
+            if len(message) > self.max_length:
+                message = message[:self.max_length]
+            match = LEVEL_PATTERN.match(message)
+            level = LEVELS[match.group(1)] if match else ('ERROR' if stream == STREAM_STDERR else 'INFO')
+            if COPY_SPECIAL.search(message):
+                message = message.translate(COPY_ESCAPES)
+            rows.append(f'{self._prefix}{level}\t{message}\t{created_at}\n')
+        return rows
+
+    def _parse_stamp(self, stamp: str) -> Optional[Tuple[int, str]]:
+        """RFC3339Nano в UTC → (наносекунды эпохи, TIMESTAMP для БД); секунда разбирается один раз"""
+        if len(stamp) < 20 or stamp[-1] != 'Z' or stamp[10] != 'T':
+            return None
+        second = stamp[:19]
+        if second != self._second:
+            try:
+                self._second_ns = calendar.timegm(time.strptime(second, '%Y-%m-%dT%H:%M:%S')) * 1_000_000_000
+            except ValueError:
+                return None
+            self._second = second
+        fraction = stamp[20:-1] if stamp[19] == '.' else ''
+        if fraction and not fraction.isdigit():
+            return None
+        timestamp_ns = self._second_ns + int((fraction + '000000000')[:9])
+        return timestamp_ns, f'{second[:10]} {second[11:]}.{(fraction + "000000")[:6]}'
+
+
+def format_since(cursor_ns: int) -> str:
+    return f'{cursor_ns // 1_000_000_000}.{cursor_ns % 1_000_000_000:09d}'
+
+
+class LogBatch:
+    __slots__ = ('rows', 'counts', 'cursors')
+
+    def __init__(self, rows: List[str], counts: Dict[int, int], cursors: Dict[int, int]) -> None:
+        self.rows = rows
+        self.counts = counts
+        self.cursors = cursors
+
+
+class LogBatcher:
+    """
+    Буфер строк до COPY. Строка занимает место, пока не записана в БД. Сервер, у которого
+    в буфере server_max_pending строк, ждёт в put — его поток перестаёт читаться, и Docker
+    копит логи у себя, а остальные серверы продолжают писать. max_pending ограничивает всех.
+    """
+
+    def __init__(self, batch_lines: int = LOG_BATCH_LINES, max_pending: int = LOG_BUFFER_LINES,
+                 server_max_pending: int = LOG_SERVER_MAX_PENDING) -> None:
+        self.batch_lines = batch_lines
+        self.max_pending = max_pending
+        self.server_max_pending = server_max_pending
+        self.ready = asyncio.Event()
+        self.stalls = 0
+        self._rows: List[str] = []
+        self._counts: Dict[int, int] = {}
+        self._cursors: Dict[int, int] = {}
+        self._pending: Dict[int, int] = {}
+        self._total = 0
+        self._space = asyncio.Condition()
+
+    @property
+    def pending(self) -> int:
+        return self._total
+
+    def _has_space(self, server_id: int) -> bool:
+        return self._pending.get(server_id, 0) < self.server_max_pending and self._total < self.max_pending
+
+    async def put(self, server_id: int, rows: List[str], cursor_ns: int) -> None:
+        async with self._space:
+            if not self._has_space(server_id):
+                self.stalls += 1
+                await self._space.wait_for(lambda: self._has_space(server_id))
+            self._rows.extend(rows)
+            self._counts[server_id] = self._counts.get(server_id, 0) + len(rows)
+            self._cursors[server_id] = cursor_ns
+            self._pending[server_id] = self._pending.get(server_id, 0) + len(rows)
+            self._total += len(rows)
+        if len(self._rows) >= self.batch_lines:
+            self.ready.set()
+
+    def take(self) -> Optional[LogBatch]:
+        self.ready.clear()
+        if not self._rows:
+            return None
+        batch = LogBatch(self._rows, self._counts, self._cursors)
+        self._rows, self._counts, self._cursors = [], {}, {}
+        return batch
+
+    async def release(self, batch: LogBatch) -> None:
+        async with self._space:
+            for server_id, count in batch.counts.items():
+                left = self._pending.get(server_id, 0) - count
+                if left > 0:
+                    self._pending[server_id] = left
+                else:
+                    self._pending.pop(server_id, None)
+            self._total -= len(batch.rows)
+            self._space.notify_all()
+
+
+class PostgresLogStore:
+    """Серверы для чтения логов, курсоры и запись пачек через COPY"""
+
+    def __init__(self, pool, docker_host: str) -> None:
+        self.pool = pool
+        self.docker_host = docker_host
+
+    def targets(self) -> List[Tuple[int, str]]:
+        conn = self.pool.acquire()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    "SELECT s.id, h.url FROM servers s "
+                    "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id "
+                    "WHERE s.status IN ('online', 'starting') ORDER BY s.id"
+                )
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+        return [(row['id'], row['url'] or self.docker_host) for row in rows]
+
+    def cursors(self, server_ids: List[int]) -> Dict[int, int]:
+        conn = self.pool.acquire()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT server_id, since_ns FROM server_log_cursors WHERE server_id = ANY(%s)", (server_ids,))
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+        return {row[0]: row[1] for row in rows}
+
+    def write(self, rows: List[str], cursors: Dict[int, int]) -> None:
+        """Строки и курсоры в одной транзакции: после падения чтение продолжится без дублей и пропусков"""
+        conn = self.pool.acquire()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(COPY_SQL, io.StringIO(''.join(rows)))
+                execute_values(
+                    cur,
+                    "INSERT INTO server_log_cursors (server_id, since_ns) VALUES %s "
+                    "ON CONFLICT (server_id) DO UPDATE SET since_ns = GREATEST(server_log_cursors.since_ns, EXCLUDED.since_ns), "
+                    "updated_at = CURRENT_TIMESTAMP",
+                    sorted(cursors.items())
+                )
+            conn.commit()
+        finally:
+            self.pool.release(conn)
+
+
+class LogIngester:
+    """
+    Чтение логов всех запущенных контейнеров: по потоку follow=1 на сервер, общий буфер и COPY
+    по заполнению (batch_lines) или по времени (flush_interval). Запись в БД идёт в отдельном потоке,
+    чтобы чтение сокетов не останавливалось на время COPY.
+    """
+
+    def __init__(self, store: Any, batcher: Optional[LogBatcher] = None,
+                 flush_interval: float = LOG_FLUSH_INTERVAL, discover_interval: float = LOG_DISCOVER_INTERVAL,
+                 backfill_seconds: int = LOG_BACKFILL_SECONDS, max_streams: int = LOG_MAX_STREAMS) -> None:
+        self.store = store
+        self.batcher = batcher or LogBatcher()
+        self.flush_interval = flush_interval
+        self.discover_interval = discover_interval
+        self.backfill_seconds = backfill_seconds
+        self.max_streams = max_streams
+        self.lines = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.stream_errors = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._cursors: Dict[int, int] = {}
+        self._clients: Dict[str, DockerClient] = {}
+        self._stopping = False
+
+    def client(self, docker_host: str) -> DockerClient:
+        """Свой клиент на хост: каждый поток follow держит соединение, общий лимит get_client бы кончился"""
+        url = normalize_docker_url(docker_host)
+        client = self._clients.get(url)
+        if client is None:
+            client = self._clients[url] = DockerClient(url, max_connections=self.max_streams)
+        return client
+
+    async def run(self, follow: bool = True) -> None:
+        """follow=False — дочитать накопленное с курсоров и выйти (запуск по расписанию)"""
+        flusher = asyncio.create_task(self._flush_loop())
+        try:
+            while True:
+                await self.discover(follow)
+                if not follow:
+                    await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+                    return
+                await asyncio.sleep(self.discover_interval)
+        finally:
+            for task in self._tasks.values():
+                task.cancel()
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            self._stopping = True
+            self.batcher.ready.set()
+            await flusher
+            for client in self._clients.values():
+                await client.close()
+
+    async def discover(self, follow: bool = True) -> None:
+        loop = asyncio.get_running_loop()
+        targets = await loop.run_in_executor(None, self.store.targets)
+        self._tasks = {server_id: task for server_id, task in self._tasks.items() if not task.done()}
+        new = [(server_id, url) for server_id, url in targets if server_id not in self._tasks]
+        unknown = [server_id for server_id, _ in new if server_id not in self._cursors]
+        if unknown:
+            self._cursors.update(await loop.run_in_executor(None, self.store.cursors, unknown))
+        for server_id, url in new[:max(0, self.max_streams - len(self._tasks))]:
+            self._tasks[server_id] = asyncio.create_task(self._follow(server_id, url, follow))
+
+    async def _follow(self, server_id: int, docker_host: str, follow: bool) -> None:
+        cursor = self._cursors.get(server_id) or int((time.time() - self.backfill_seconds) * 1_000_000_000)
+        demuxer = LogDemuxer()
+        encoder = LineEncoder(server_id, cursor)
+
+        async def push(lines: List[Tuple[int, bytes]]) -> None:
+            rows = encoder.encode(lines)
+            if rows:
+                self.lines += len(rows)
+                self._cursors[server_id] = encoder.cursor_ns
+                await self.batcher.put(server_id, rows, encoder.cursor_ns)
+
+        async def on_chunk(data: bytes) -> None:
+            await push(demuxer.feed(data))
+
+        try:
+            await self.client(docker_host).container_logs(
+                container_name(server_id), on_chunk, since=format_since(cursor), follow=follow,
+                timeout=None if follow else LOG_DRAIN_TIMEOUT
+            )
+            await push(demuxer.flush())
+        except (DockerError, DockerConnectionError, OSError, asyncio.IncompleteReadError,
+                asyncio.TimeoutError, ValueError) as e:
+            # Контейнер остановлен или хост недоступен: поток перезапустит следующий discover
+            self.stream_errors += 1
+            self.last_error = f'server {server_id}: {str(e) or type(e).__name__}'
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.batcher.ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+            if self._stopping and self.batcher.pending == 0:
+                return
+
+    async def flush(self) -> None:
+        batch = self.batcher.take()
+        if batch is None:
+            return
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.store.write, batch.rows, batch.cursors)
+                break
+            except Exception as e:
+                # Пачка не теряется: пока БД недоступна, буфер заполняется и чтение потоков останавливается
+                self.write_errors += 1
+                self.last_error = f'write: {e}'
+                await asyncio.sleep(self.flush_interval)
+        self.flushed += len(batch.rows)
+        self.flushes += 1
+        await self.batcher.release(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'streams': sum(1 for task in self._tasks.values() if not task.done()),
+            'lines': self.lines,
+            'flushed': self.flushed,
+            'flushes': self.flushes,
+            'pending': self.batcher.pending,
+            'stalls': self.batcher.stalls,
+            'streamErrors': self.stream_errors,
+            'writeErrors': self.write_errors,
+            'lastError': self.last_error
+        }
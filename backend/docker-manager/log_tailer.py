@@ -0,0 +1,52 @@
+"""
+Чтение логов запущенных контейнеров в server_logs (поток follow=1 на сервер, запись пачками через COPY):
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 python log_tailer.py [--once]
+
+--once дочитывает логи с сохранённых курсоров и завершается — для запуска по расписанию.
+"""
+import asyncio
+import os
+import sys
+
+from db_pool import get_pool
+from log_ingest import LogIngester, PostgresLogStore
+
+LOG_STATS_INTERVAL = float(os.environ.get('LOG_STATS_INTERVAL', '60'))
+
+
+async def report(ingester: LogIngester) -> None:
+    previous = 0
+    while True:
+        await asyncio.sleep(LOG_STATS_INTERVAL)
+        stats = ingester.stats()
+        rate = (stats['flushed'] - previous) / LOG_STATS_INTERVAL
+        previous = stats['flushed']
+        print(f"streams={stats['streams']} flushed={stats['flushed']} ({rate:.0f} lines/s) "
+              f"pending={stats['pending']} stalls={stats['stalls']} errors={stats['streamErrors']}/{stats['writeErrors']} "
+              f"last_error={stats['lastError']}", flush=True)
+
+
+async def run(ingester: LogIngester, once: bool) -> None:
+    reporter = asyncio.create_task(report(ingester))
+    try:
+        await ingester.run(follow=not once)
+    finally:
+        reporter.cancel()
+
+
+def main() -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    once = '--once' in sys.argv
+
+    ingester = LogIngester(PostgresLogStore(get_pool(database_url), docker_host))
+    try:
+        asyncio.run(run(ingester, once))
+    except KeyboardInterrupt:
+        pass
+    print(f"flushed {ingester.flushed} line(s) in {ingester.flushes} batch(es)", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import asyncio
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from container_config import container_name
+from docker_client import DockerClient, get_client, run
+from players import server_address
+from rcon_pool import get_rcon_pool
+
+METRICS_CONCURRENCY = int(os.environ.get('METRICS_CONCURRENCY', '32'))
+METRICS_TIMEOUT = float(os.environ.get('METRICS_TIMEOUT', '5'))
+METRICS_TPS_COMMAND = os.environ.get('METRICS_TPS_COMMAND', 'tick query')
+METRICS_CHUNK_SECONDS = 900
+METRICS_ROLLUP_LOOKBACK_SECONDS = int(os.environ.get('METRICS_ROLLUP_LOOKBACK', '600'))
+METRICS_RAW_RETENTION_HOURS = int(os.environ.get('METRICS_RAW_RETENTION_HOURS', '24'))
+METRICS_MINUTE_RETENTION_DAYS = int(os.environ.get('METRICS_MINUTE_RETENTION_DAYS', '7'))
+METRICS_HOUR_RETENTION_DAYS = int(os.environ.get('METRICS_HOUR_RETENTION_DAYS', '90'))
+MAX_RAW_RANGE = timedelta(hours=3)
+MAX_MINUTE_RANGE = timedelta(days=7)
+
+TPS_PAPER_RE = re.compile(r'TPS from last 1m, 5m, 15m:\D*([\d.]+)')
+MSPT_RE = re.compile(r'Average time per tick:\s*([\d.]+)\s*ms')
+
+# Последний снимок счётчиков CPU по контейнеру: (total_usage, system_cpu_usage).
+# Живёт между циклами сборщика, по записи на запущенный контейнер
+_cpu_previous: Dict[Tuple[str, int], Tuple[int, int]] = {}
+
+
+def cpu_percent(stats: Dict[str, Any], previous: Optional[Tuple[int, int]]) -> Optional[float]:
+    """Загрузка CPU в процентах одного ядра (как docker stats) по разнице с прошлым снимком"""
+    cpu = stats.get('cpu_stats') or {}
+    total = (cpu.get('cpu_usage') or {}).get('total_usage')
+    system = cpu.get('system_cpu_usage')
+    if previous is None or total is None or system is None:
+        return None
+    cpu_delta = total - previous[0]
+    system_delta = system - previous[1]
+    if cpu_delta < 0 or system_delta <= 0:
+        return None
+    online_cpus = cpu.get('online_cpus') or len((cpu.get('cpu_usage') or {}).get('percpu_usage') or []) or 1
+    return round(cpu_delta / system_delta * online_cpus * 100, 2)
+
+
+def memory_mb(stats: Dict[str, Any]) -> Optional[float]:
+    """Память без страничного кэша: inactive_file (cgroup v2) или cache (v1)"""
+    memory = stats.get('memory_stats') or {}
+    usage = memory.get('usage')
+    if usage is None:
+        return None
+    details = memory.get('stats') or {}
+    cache = details.get('inactive_file', details.get('cache', 0))
+    return round(max(0, usage - cache) / (1024 * 1024), 1)
+
+
+def parse_tps(output: str) -> Optional[float]:
+    """TPS из ответа `tps` (Paper) или `tick query` (ванильный 1.20.3+: среднее время тика)"""
+    match = TPS_PAPER_RE.search(output)
+    if match:
+        return min(20.0, float(match.group(1)))
+    match = MSPT_RE.search(output)
+    if match:
+        mspt = float(match.group(1))
+        return 20.0 if mspt <= 50 else round(1000 / mspt, 2)
+    return None
+
+
+def collection_targets(conn, docker_host: str) -> Tuple[datetime, List[Dict[str, Any]]]:
+    """Запущенные серверы с хостом и адресом RCON; время цикла берётся из БД, как и у остальных меток"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT s.id, s.edition, s.rcon_port, s.rcon_password, h.url AS docker_url FROM servers s "
+            "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id "
+            "WHERE s.status IN ('online', 'starting') ORDER BY s.id"
+        )
+        rows = cur.fetchall()
+        cur.execute("SELECT LOCALTIMESTAMP AS now")
+        now = cur.fetchone()['now']
+    conn.commit()
+
+    for row in rows:
+        row['address'] = server_address(row['docker_url'], docker_host)
+        row['docker_url'] = row['docker_url'] or docker_host
+    return now, rows
+
+
+async def sample_servers(targets: List[Dict[str, Any]], concurrency: int = METRICS_CONCURRENCY,
+                         timeout: float = METRICS_TIMEOUT,
+                         tps_command: Optional[str] = METRICS_TPS_COMMAND) -> List[Tuple[int, Optional[float], Optional[float], Optional[float]]]:
+    """
+    Снять (server_id, cpu, memory_mb, tps) со всех серверов: не больше concurrency запросов сразу,
+    ответ /stats сразу сводится к трём числам, поэтому память не растёт с размером ответов.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    seen = set()
+
+    async def one(target: Dict[str, Any]) -> Tuple[int, Optional[float], Optional[float], Optional[float]]:
+        client: DockerClient = get_client(target['docker_url'])
+        key = (target['docker_url'], target['id'])
+        cpu = memory = tps = None
+        async with semaphore:
+            try:
+                stats = await client.container_stats(container_name(target['id']), timeout=timeout)
+                cpu = cpu_percent(stats, _cpu_previous.get(key))
+                memory = memory_mb(stats)
+                cpu_stats = stats.get('cpu_stats') or {}
+                if cpu_stats.get('system_cpu_usage') is not None:
+                    _cpu_previous[key] = (cpu_stats['cpu_usage']['total_usage'], cpu_stats['system_cpu_usage'])
+                    seen.add(key)
+            except Exception:
+                pass
+            if tps_command and target['edition'] == 'java' and target['rcon_port'] and target['rcon_password']:
+                try:
+                    output = await get_rcon_pool().command(target['address'], target['rcon_port'],
+                                                           target['rcon_password'], tps_command, timeout=timeout)
+                    tps = parse_tps(output)
+                except Exception:
+                    pass
+        return target['id'], cpu, memory, tps
+
+    samples = await asyncio.gather(*(one(target) for target in targets))
+
+    # Остановленные и удалённые контейнеры не копятся в памяти сборщика
+    for key in list(_cpu_previous):
+        if key not in seen:
+            del _cpu_previous[key]
+    return samples
+
+
+def store_samples(conn, samples: List[Tuple[int, Optional[float], Optional[float], Optional[float]]],
+                  now: datetime) -> int:
+    """
+    Дописать замеры в массивы 15-минутного куска сервера одной вставкой на цикл.
+    Кусок хранит смещения в секундах и значения параллельными массивами — строка на сервер
+    на 15 минут вместо строки на каждый замер.
+    """
+    epoch_seconds = int((now - datetime(1970, 1, 1)).total_seconds())
+    chunk_start = datetime(1970, 1, 1) + timedelta(seconds=epoch_seconds - epoch_seconds % METRICS_CHUNK_SECONDS)
+    offset = epoch_seconds % METRICS_CHUNK_SECONDS
+
+    rows = [
+        (server_id, chunk_start, offset, cpu, memory, tps)
+        for server_id, cpu, memory, tps in samples
+        if cpu is not None or memory is not None or tps is not None
+    ]
+    with conn.cursor() as cur:
+        if rows:
+            execute_values(
+                cur,
+                "INSERT INTO server_metric_chunks AS c (server_id, chunk_start, offsets, cpu, memory_mb, tps) "
+                "VALUES %s ON CONFLICT (server_id, chunk_start) DO UPDATE SET "
+                "offsets = c.offsets || EXCLUDED.offsets, cpu = c.cpu || EXCLUDED.cpu, "
+                "memory_mb = c.memory_mb || EXCLUDED.memory_mb, tps = c.tps || EXCLUDED.tps",
+                rows,
+                template="(%s, %s, ARRAY[%s]::smallint[], ARRAY[%s]::real[], ARRAY[%s]::real[], ARRAY[%s]::real[])",
+                page_size=1000
+            )
+        conn.commit()
+    return len(rows)
+
+
+def rollup_metrics(conn, now: datetime, lookback_seconds: int = METRICS_ROLLUP_LOOKBACK_SECONDS) -> Dict[str, int]:
+    """
+    Пересчитать минутные сводки за последние lookback секунд из кусков и часовые — из минутных.
+    Пересчёт идемпотентен: незавершённые минута и час перезаписываются при следующем запуске.
+    """
+    window_start = now - timedelta(seconds=lookback_seconds)
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO server_metric_rollups "
+            "(server_id, resolution, bucket, samples, cpu_avg, cpu_max, memory_avg, memory_max, tps_avg, tps_min) "
+            "SELECT c.server_id, '1m', date_trunc('minute', c.chunk_start + make_interval(secs => u.off)) AS bucket, "
+            "COUNT(*), AVG(u.cpu), MAX(u.cpu), AVG(u.mem), MAX(u.mem), AVG(u.tps), MIN(u.tps) "
+            "FROM server_metric_chunks c, unnest(c.offsets, c.cpu, c.memory_mb, c.tps) AS u(off, cpu, mem, tps) "
+            "WHERE c.chunk_start >= %s - make_interval(secs => %s) "
+            "AND c.chunk_start + make_interval(secs => u.off) >= date_trunc('minute', %s::timestamp) "
+            "GROUP BY c.server_id, bucket "
+            "ON CONFLICT (server_id, resolution, bucket) DO UPDATE SET samples = EXCLUDED.samples, "
+            "cpu_avg = EXCLUDED.cpu_avg, cpu_max = EXCLUDED.cpu_max, memory_avg = EXCLUDED.memory_avg, "
+            "memory_max = EXCLUDED.memory_max, tps_avg = EXCLUDED.tps_avg, tps_min = EXCLUDED.tps_min",
+            (window_start, METRICS_CHUNK_SECONDS, window_start)
+        )
+        minutes = cur.rowcount
+        # Среднее за час взвешивается числом замеров в минуте
+        cur.execute(
+            "INSERT INTO server_metric_rollups "
+            "(server_id, resolution, bucket, samples, cpu_avg, cpu_max, memory_avg, memory_max, tps_avg, tps_min) "
+            "SELECT server_id, '1h', date_trunc('hour', bucket) AS hour, SUM(samples), "
+            "SUM(cpu_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE cpu_avg IS NOT NULL), 0), MAX(cpu_max), "
+            "SUM(memory_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE memory_avg IS NOT NULL), 0), MAX(memory_max), "
+            "SUM(tps_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE tps_avg IS NOT NULL), 0), MIN(tps_min) "
+            "FROM server_metric_rollups WHERE resolution = '1m' AND bucket >= date_trunc('hour', %s::timestamp) "
+            "GROUP BY server_id, hour "
+            "ON CONFLICT (server_id, resolution, bucket) DO UPDATE SET samples = EXCLUDED.samples, "
+            "cpu_avg = EXCLUDED.cpu_avg, cpu_max = EXCLUDED.cpu_max, memory_avg = EXCLUDED.memory_avg, "
+            "memory_max = EXCLUDED.memory_max, tps_avg = EXCLUDED.tps_avg, tps_min = EXCLUDED.tps_min",
+            (window_start,)
+        )
+        hours = cur.rowcount
+        conn.commit()
+    return {'minutes': minutes, 'hours': hours}
+
+
+def prune_metrics(conn, now: datetime) -> int:
+    """Удалить куски и сводки старше сроков хранения"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM server_metric_chunks WHERE chunk_start < %s",
+            (now - timedelta(hours=METRICS_RAW_RETENTION_HOURS),)
+        )
+        deleted = cur.rowcount
+        cur.execute(
+            "DELETE FROM server_metric_rollups WHERE (resolution = '1m' AND bucket < %s) "
+            "OR (resolution = '1h' AND bucket < %s)",
+            (now - timedelta(days=METRICS_MINUTE_RETENTION_DAYS), now - timedelta(days=METRICS_HOUR_RETENTION_DAYS))
+        )
+        deleted += cur.rowcount
+        conn.commit()
+    return deleted
+
+
+def run_collection(conn, docker_host: str, rollup: bool = True) -> Dict[str, Any]:
+    """Один цикл сборщика: замер всех запущенных серверов, запись, сводки и очистка"""
+    now, targets = collection_targets(conn, docker_host)
+    samples = run(sample_servers(targets)) if targets else []
+    summary: Dict[str, Any] = {'servers': len(targets), 'stored': store_samples(conn, samples, now)}
+    if rollup:
+        summary['rollups'] = rollup_metrics(conn, now)
+        summary['pruned'] = prune_metrics(conn, now)
+    return summary
+
+
+def pick_resolution(start: datetime, end: datetime, requested: Optional[str]) -> str:
+    """raw для коротких диапазонов, дальше минутные и часовые сводки — число точек ограничено"""
+    if requested in ('raw', '1m', '1h'):
+        return requested
+    span = end - start
+    if span <= MAX_RAW_RANGE:
+        return 'raw'
+    if span <= MAX_MINUTE_RANGE:
+        return '1m'
+    return '1h'
+
+
+def query_metrics(cur, server_id: int, start: datetime, end: datetime, resolution: str) -> List[Dict[str, Any]]:
+    """Точки графика за [start, end): сырые замеры или сводки выбранного разрешения"""
+    if resolution == 'raw':
+        cur.execute(
+            "SELECT c.chunk_start + make_interval(secs => u.off) AS ts, u.cpu, u.mem, u.tps "
+            "FROM server_metric_chunks c, unnest(c.offsets, c.cpu, c.memory_mb, c.tps) AS u(off, cpu, mem, tps) "
+            "WHERE c.server_id = %s AND c.chunk_start > %s - make_interval(secs => %s) AND c.chunk_start < %s "
+            "AND c.chunk_start + make_interval(secs => u.off) >= %s "
+            "AND c.chunk_start + make_interval(secs => u.off) < %s ORDER BY ts",
+            (server_id, start, METRICS_CHUNK_SECONDS, end, start, end)
+        )
+        return [
+            {'t': row['ts'].isoformat(), 'cpu': row['cpu'], 'memoryMb': row['mem'], 'tps': row['tps']}
+            for row in cur.fetchall()
+        ]
+
+    cur.execute(
+        "SELECT bucket, samples, cpu_avg, cpu_max, memory_avg, memory_max, tps_avg, tps_min "
+        "FROM server_metric_rollups WHERE server_id = %s AND resolution = %s AND bucket >= %s AND bucket < %s "
+        "ORDER BY bucket",
+        (server_id, resolution, start, end)
+    )
+    return [
+        {
+            't': row['bucket'].isoformat(),
+            'samples': row['samples'],
+            'cpu': row['cpu_avg'],
+            'cpuMax': row['cpu_max'],
+            'memoryMb': row['memory_avg'],
+            'memoryMaxMb': row['memory_max'],
+            'tps': row['tps_avg'],
+            'tpsMin': row['tps_min']
+        }
+        for row in cur.fetchall()
+    ]
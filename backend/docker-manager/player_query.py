@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import struct
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+PING_TIMEOUT = float(os.environ.get('PLAYER_PING_TIMEOUT', '1.5'))
+PING_CONCURRENCY = int(os.environ.get('PLAYER_PING_CONCURRENCY', '64'))
+
+JAVA_PROTOCOL_VERSION = -1
+MAX_STATUS_LENGTH = 1 << 20
+
+RAKNET_MAGIC = bytes.fromhex('00ffff00fefefefefdfdfdfd12345678')
+RAKNET_UNCONNECTED_PING = 0x01
+RAKNET_UNCONNECTED_PONG = 0x1c
+RAKNET_CLIENT_GUID = 0x4d435f504f4c4c52
+
+
+class QueryError(Exception):
+    """Сервер не ответил по протоколу или ответ не разобран"""
+
+
+def encode_varint(value: int) -> bytes:
+    """VarInt протокола Minecraft: 7 бит на байт, отрицательные — как uint32"""
+    value &= 0xffffffff
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def read_varint(reader: asyncio.StreamReader) -> int:
+    value = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value
+    raise QueryError('VarInt is too long')
+
+
+def decode_varint(data: bytes, offset: int = 0) -> Tuple[int, int]:
+    value = 0
+    for shift in range(0, 35, 7):
+        if offset >= len(data):
+            raise QueryError('Truncated VarInt')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, offset
+    raise QueryError('VarInt is too long')
+
+
+def pack_packet(packet_id: int, payload: bytes = b'') -> bytes:
+    body = encode_varint(packet_id) + payload
+    return encode_varint(len(body)) + body
+
+
+def pack_string(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return encode_varint(len(data)) + data
+
+
+def flatten_motd(description: Any) -> str:
+    """description в статусе Java — строка или компонент чата с вложенными extra"""
+    if isinstance(description, str):
+        return description
+    if isinstance(description, dict):
+        text = description.get('text', '')
+        for part in description.get('extra') or []:
+            text += flatten_motd(part)
+        return text
+    if isinstance(description, list):
+        return ''.join(flatten_motd(part) for part in description)
+    return ''
+
+
+async def java_status(host: str, port: int, timeout: float = PING_TIMEOUT) -> Dict[str, Any]:
+    """Server List Ping: handshake (next state 1) + Status Request, задержка — время до ответа"""
+    started = time.monotonic()
+
+    async def query() -> Dict[str, Any]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            handshake = (
+                encode_varint(JAVA_PROTOCOL_VERSION) + pack_string(host)
+                + struct.pack('>H', port) + encode_varint(1)
+            )
+            writer.write(pack_packet(0x00, handshake) + pack_packet(0x00))
+            await writer.drain()
+
+            length = await read_varint(reader)
+            if length <= 0 or length > MAX_STATUS_LENGTH:
+                raise QueryError(f'Bad status packet length {length}')
+            data = await reader.readexactly(length)
+            latency = time.monotonic() - started
+        finally:
+            writer.close()
+
+        packet_id, offset = decode_varint(data)
+        if packet_id != 0x00:
+            raise QueryError(f'Unexpected packet 0x{packet_id:02x}')
+        text_length, offset = decode_varint(data, offset)
+        status = json.loads(data[offset:offset + text_length].decode('utf-8'))
+        players = status.get('players') or {}
+        return {
+            'online': int(players.get('online', 0)),
+            'max': int(players.get('max', 0)),
+            'motd': flatten_motd(status.get('description')),
+            'latencyMs': round(latency * 1000, 2)
+        }
+
+    try:
+        return await asyncio.wait_for(query(), timeout)
+    except (ValueError, KeyError, TypeError) as e:
+        raise QueryError(f'Bad status response: {e}')
+
+
+class _PongProtocol(asyncio.DatagramProtocol):
+    def __init__(self) -> None:
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        if not self.future.done() and data[:1] == bytes([RAKNET_UNCONNECTED_PONG]):
+            self.future.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+def parse_bedrock_pong(data: bytes) -> Dict[str, Any]:
+    """Unconnected Pong: id, time, server GUID, magic, строка MCPE;motd;protocol;version;online;max;..."""
+    if len(data) < 35 or data[17:33] != RAKNET_MAGIC:
+        raise QueryError('Bad RakNet pong')
+    (length,) = struct.unpack_from('>H', data, 33)
+    fields = data[35:35 + length].decode('utf-8', errors='replace').split(';')
+    if len(fields) < 6:
+        raise QueryError('Bad Bedrock server id string')
+    try:
+        return {'online': int(fields[4]), 'max': int(fields[5]), 'motd': fields[1]}
+    except ValueError:
+        raise QueryError('Bad Bedrock player counts')
+
+
+async def bedrock_status(host: str, port: int, timeout: float = PING_TIMEOUT) -> Dict[str, Any]:
+    """RakNet Unconnected Ping по UDP"""
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    transport, protocol = await loop.create_datagram_endpoint(_PongProtocol, remote_addr=(host, port))
+    try:
+        ping = struct.pack('>BQ', RAKNET_UNCONNECTED_PING, int(time.time() * 1000) & 0xffffffffffffffff)
+        transport.sendto(ping + RAKNET_MAGIC + struct.pack('>Q', RAKNET_CLIENT_GUID))
+        data = await asyncio.wait_for(protocol.future, timeout)
+    finally:
+        transport.close()
+    result = parse_bedrock_pong(data)
+    result['latencyMs'] = round((time.monotonic() - started) * 1000, 2)
+    return result
+
+
+async def query_server(edition: str, host: str, port: int, timeout: float = PING_TIMEOUT) -> Dict[str, Any]:
+    if edition == 'bedrock':
+        return await bedrock_status(host, port, timeout)
+    return await java_status(host, port, timeout)
+
+
+async def poll_servers(targets: List[Tuple[int, str, str, int]], concurrency: int = PING_CONCURRENCY,
+                       timeout: float = PING_TIMEOUT) -> Dict[int, Optional[Dict[str, Any]]]:
+    """
+    Опросить серверы (server_id, edition, host, port) параллельно, не больше concurrency сразу.
+    Общее время — примерно len / concurrency таймаутов в худшем случае; None — сервер не ответил.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(edition: str, host: str, port: int) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                return await query_server(edition, host, port, timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, QueryError):
+                return None
+
+    results = await asyncio.gather(*(one(edition, host, port) for _, edition, host, port in targets))
+    return {target[0]: result for target, result in zip(targets, results)}
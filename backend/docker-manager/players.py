@@ -0,0 +1,83 @@
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from docker_client import normalize_docker_url, run
+from player_query import PING_CONCURRENCY, PING_TIMEOUT, poll_servers
+
+PLAYER_QUERY_HOST = os.environ.get('PLAYER_QUERY_HOST')
+
+
+def query_address(docker_url: str) -> str:
+    """Адрес, по которому доступны опубликованные порты хоста: хост из URL Docker API"""
+    url = normalize_docker_url(docker_url)
+    if url.startswith('unix://'):
+        return '127.0.0.1'
+    return urlparse(url).hostname or '127.0.0.1'
+
+
+def server_address(docker_url: Optional[str], docker_host: str) -> str:
+    """Адрес портов сервера; хост без url — DOCKER_HOST_URL (или PLAYER_QUERY_HOST)"""
+    if docker_url:
+        return query_address(docker_url)
+    return PLAYER_QUERY_HOST or query_address(docker_host)
+
+
+def poll_targets(conn, docker_host: str) -> List[Tuple[int, str, str, int]]:
+    """Запущенные серверы с адресом опроса"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT s.id, s.edition, s.port, h.url FROM servers s "
+            "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id "
+            "WHERE s.status IN ('online', 'starting') AND s.port IS NOT NULL ORDER BY s.id"
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return [
+        (row['id'], row['edition'], server_address(row['url'], docker_host), row['port'])
+        for row in rows
+    ]
+
+
+def store_snapshots(conn, results: Dict[int, Optional[Dict[str, Any]]]) -> None:
+    """Одна вставка на весь опрос: по строке на сервер, предыдущий снимок перезаписывается"""
+    rows = []
+    for server_id, result in results.items():
+        if result is None:
+            rows.append((server_id, False, 0, None, None, None))
+        else:
+            rows.append((server_id, True, result['online'], result['max'], result['motd'], result['latencyMs']))
+
+    with conn.cursor() as cur:
+        if rows:
+            execute_values(
+                cur,
+                "INSERT INTO server_player_snapshots "
+                "(server_id, reachable, players_online, players_max, motd, latency_ms) VALUES %s "
+                "ON CONFLICT (server_id) DO UPDATE SET reachable = EXCLUDED.reachable, "
+                "players_online = EXCLUDED.players_online, players_max = EXCLUDED.players_max, "
+                "motd = EXCLUDED.motd, latency_ms = EXCLUDED.latency_ms, polled_at = CURRENT_TIMESTAMP, "
+                "last_active_at = CASE WHEN EXCLUDED.players_online > 0 THEN CURRENT_TIMESTAMP "
+                "ELSE server_player_snapshots.last_active_at END",
+                rows,
+                page_size=1000
+            )
+        conn.commit()
+
+
+def run_player_poll(conn, docker_host: str, concurrency: int = PING_CONCURRENCY,
+                    timeout: float = PING_TIMEOUT) -> Dict[str, Any]:
+    """Опросить все запущенные серверы и сохранить снимок онлайна"""
+    started = time.monotonic()
+    targets = poll_targets(conn, docker_host)
+    results = run(poll_servers(targets, concurrency, timeout))
+    store_snapshots(conn, results)
+    return {
+        'polled': len(targets),
+        'reachable': sum(1 for result in results.values() if result is not None),
+        'players': sum(result['online'] for result in results.values() if result is not None),
+        'elapsedMs': round((time.monotonic() - started) * 1000, 1)
+    }
@@ -0,0 +1,41 @@
+"""
+Опрос онлайна запущенных серверов (Server List Ping / RakNet ping) с записью снимка в БД:
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 python poller.py [--once]
+
+Обработчик servers читает только снимок и сам серверы не опрашивает.
+"""
+import os
+import sys
+import time
+
+from db_pool import get_pool
+from players import run_player_poll
+
+PLAYER_POLL_INTERVAL = float(os.environ.get('PLAYER_POLL_INTERVAL', '15'))
+
+
+def main() -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    once = '--once' in sys.argv
+
+    pool = get_pool(database_url)
+
+    while True:
+        started = time.monotonic()
+        conn = pool.acquire()
+        try:
+            summary = run_player_poll(conn, docker_host)
+        finally:
+            pool.release(conn)
+
+        print(f"polled {summary['polled']} server(s), {summary['reachable']} reachable, "
+              f"{summary['players']} player(s) in {summary['elapsedMs']} ms", flush=True)
+        if once:
+            return
+        time.sleep(max(0.0, PLAYER_POLL_INTERVAL - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    main()
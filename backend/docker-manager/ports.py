@@ -0,0 +1,83 @@
+import os
+from typing import List, Optional, Tuple
+
+DEFAULT_DOCKER_HOST = 'default'
+
+GAME_PORT_RANGE = (
+    int(os.environ.get('GAME_PORT_RANGE_START', '25565')),
+    int(os.environ.get('GAME_PORT_RANGE_END', '35564'))
+)
+RCON_PORT_RANGE = (
+    int(os.environ.get('RCON_PORT_RANGE_START', '35565')),
+    int(os.environ.get('RCON_PORT_RANGE_END', '45564'))
+)
+
+
+class PortsExhausted(Exception):
+    """В диапазоне Docker хоста не осталось свободных портов"""
+
+
+def ensure_port_range(cur, docker_host: str, kind: str, start: int, end: int) -> None:
+    """Завести в реестре строки для всех портов диапазона (повторный вызов ничего не меняет)"""
+    cur.execute(
+        "INSERT INTO port_allocations (docker_host, kind, port) "
+        "SELECT %s, %s, port FROM generate_series(%s, %s) AS port ON CONFLICT DO NOTHING",
+        (docker_host, kind, start, end)
+    )
+
+
+def allocate_port(cur, kind: str, server_id: Optional[int] = None,
+                  docker_host: str = DEFAULT_DOCKER_HOST) -> int:
+    """
+    Занять наименьший свободный порт. Частичный индекс по свободным портам делает поиск
+    независимым от заполненности диапазона, а SKIP LOCKED разводит параллельные транзакции
+    по разным строкам без ожидания. Порт освобождается откатом транзакции или release_ports.
+    """
+    cur.execute(
+        "UPDATE port_allocations SET allocated = true, server_id = %s, allocated_at = CURRENT_TIMESTAMP "
+        "WHERE docker_host = %s AND port = ("
+        "  SELECT port FROM port_allocations "
+        "  WHERE docker_host = %s AND kind = %s AND NOT allocated "
+        "  ORDER BY port LIMIT 1 FOR UPDATE SKIP LOCKED"
+        ") RETURNING port",
+        (server_id, docker_host, docker_host, kind)
+    )
+    row = cur.fetchone()
+    if row is None:
+        raise PortsExhausted(f'No free {kind} ports on Docker host {docker_host}')
+    return row[0] if isinstance(row, tuple) else row['port']
+
+
+def allocate_server_ports(cur, server_id: Optional[int] = None,
+                          docker_host: str = DEFAULT_DOCKER_HOST) -> Tuple[int, int]:
+    """Игровой порт и порт RCON для нового сервера"""
+    return (
+        allocate_port(cur, 'game', server_id, docker_host),
+        allocate_port(cur, 'rcon', server_id, docker_host)
+    )
+
+
+def assign_ports(cur, ports: List[int], server_id: int, docker_host: str = DEFAULT_DOCKER_HOST) -> None:
+    """Привязать уже занятые порты к серверу (когда id сервера появляется после выделения)"""
+    cur.execute(
+        "UPDATE port_allocations SET server_id = %s WHERE docker_host = %s AND port = ANY(%s)",
+        (server_id, docker_host, list(ports))
+    )
+
+
+def release_ports(cur, ports: List[int], docker_host: str = DEFAULT_DOCKER_HOST) -> None:
+    """Вернуть порты в свободные — они будут выданы снова"""
+    cur.execute(
+        "UPDATE port_allocations SET allocated = false, server_id = NULL, allocated_at = NULL "
+        "WHERE docker_host = %s AND port = ANY(%s)",
+        (docker_host, list(ports))
+    )
+
+
+def release_server_ports(cur, server_id: int) -> None:
+    """Освободить все порты сервера на всех хостах"""
+    cur.execute(
+        "UPDATE port_allocations SET allocated = false, server_id = NULL, allocated_at = NULL "
+        "WHERE server_id = %s",
+        (server_id,)
+    )
@@ -0,0 +1,240 @@
+import os
+import secrets
+import string
+import uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from container_config import (
+    IMAGE_TAG, WARM_CONTAINER_PREFIX, build_server_properties_archive, build_template_config,
+    container_name, image_for, matches_template, resource_limits, warm_data_volume
+)
+from docker_client import DockerClient, get_client, run
+from ports import DEFAULT_DOCKER_HOST, PortsExhausted, allocate_port, assign_ports, release_ports
+
+WARM_COLUMNS = "docker_host_id, edition, version, container_id, container_name, port, rcon_port, rcon_password"
+
+PREWARM_TOP_COMBOS = int(os.environ.get('PREWARM_TOP_COMBOS', '5'))
+WARM_POOL_SIZE = int(os.environ.get('WARM_POOL_SIZE', '0'))
+IMAGE_PULL_TIMEOUT = float(os.environ.get('IMAGE_PULL_TIMEOUT', '1800'))
+
+
+def popular_combos(conn, limit: int = PREWARM_TOP_COMBOS) -> List[Tuple[str, str, int]]:
+    """Самые частые пары (редакция, версия) среди серверов"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT edition, version, COUNT(*) FROM servers "
+            "GROUP BY edition, version ORDER BY COUNT(*) DESC, edition, version LIMIT %s",
+            (limit,)
+        )
+        return [(row[0], row[1], row[2]) for row in cur.fetchall()]
+
+
+def prewarm_images(client: DockerClient, combos: List[Tuple[str, str, int]]) -> List[str]:
+    """Скачать на Docker хост образы популярных редакций, которых там ещё нет"""
+    images = sorted({image_for(edition) for edition, _, _ in combos})
+
+    async def pull_missing() -> List[str]:
+        exists = await client.gather(client.image_exists(f'{image}:{IMAGE_TAG}') for image in images)
+        missing = [image for image, found in zip(images, exists) if found is False]
+        results = await client.gather(
+            client.pull_image(image, IMAGE_TAG, timeout=IMAGE_PULL_TIMEOUT) for image in missing
+        )
+        return [image for image, result in zip(missing, results) if not isinstance(result, Exception)]
+
+    return run(pull_missing())
+
+
+def fill_warm_pool(conn, client: DockerClient, host: Dict[str, Any],
+                   combos: List[Tuple[str, str, int]], pool_size: int) -> Dict[str, Any]:
+    """
+    Держать на хосте pool_size остановленных контейнеров на каждую популярную пару;
+    контейнеры для пар, выпавших из списка, и Java-контейнеры без RCON удаляются.
+    """
+    wanted = {(edition, version): pool_size for edition, version, _ in combos}
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT id, edition, version, container_id, container_name, port, rcon_port FROM warm_containers "
+            "WHERE docker_host_id = %s ORDER BY id",
+            (host['id'],)
+        )
+        existing = cur.fetchall()
+    conn.commit()
+
+    have: Dict[Tuple[str, str], int] = {}
+    excess = []
+    for row in existing:
+        key = (row['edition'], row['version'])
+        if have.get(key, 0) >= wanted.get(key, 0) or (row['edition'] == 'java' and row['rcon_port'] is None):
+            excess.append(row)
+        else:
+            have[key] = have.get(key, 0) + 1
+
+    # Порты резервируются и фиксируются до создания контейнеров, чтобы их не выдали серверам
+    to_create = []
+    with conn.cursor() as cur:
+        try:
+            for key, size in wanted.items():
+                for _ in range(size - have.get(key, 0)):
+                    port = allocate_port(cur, 'game', docker_host=host['name'])
+                    rcon_port = rcon_password = None
+                    if key[0] == 'java':
+                        try:
+                            rcon_port = allocate_port(cur, 'rcon', docker_host=host['name'])
+                        except PortsExhausted:
+                            release_ports(cur, [port], host['name'])
+                            raise
+                        rcon_password = generate_rcon_password()
+                    name = f'{WARM_CONTAINER_PREFIX}{key[0]}-{uuid.uuid4().hex[:8]}'
+                    to_create.append((key[0], key[1], name, port, rcon_port, rcon_password))
+        except PortsExhausted:
+            pass
+        conn.commit()
+
+    async def apply() -> Tuple[List[Any], List[Any]]:
+        created = await client.gather(
+            client.create_container(
+                name,
+                build_template_config(edition, version, port, rcon_port=rcon_port, rcon_password=rcon_password,
+                                      data_volume=warm_data_volume(name)),
+                timeout=30
+            )
+            for edition, version, name, port, rcon_port, rcon_password in to_create
+        )
+        removed = await client.gather(
+            client.remove_container(row['container_id'], force=True)
+            for row in excess
+        )
+        # Тома удалённых контейнеров: пустые, мир в них ещё не создавался
+        await client.gather(
+            client.remove_volume(warm_data_volume(row['container_name']))
+            for row, result in zip(excess, removed) if not isinstance(result, Exception)
+        )
+        return created, removed
+
+    created, removed = run(apply())
+
+    created_count = 0
+    with conn.cursor() as cur:
+        for (edition, version, name, port, rcon_port, rcon_password), result in zip(to_create, created):
+            if isinstance(result, Exception):
+                release_ports(cur, [p for p in (port, rcon_port) if p], host['name'])
+                continue
+            cur.execute(
+                "INSERT INTO warm_containers "
+                "(docker_host_id, edition, version, container_id, container_name, port, rcon_port, rcon_password) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                (host['id'], edition, version, result['Id'], name, port, rcon_port, rcon_password)
+            )
+            created_count += 1
+        removed_rows = [row for row, result in zip(excess, removed) if not isinstance(result, Exception)]
+        if removed_rows:
+            cur.execute("DELETE FROM warm_containers WHERE id = ANY(%s)", ([row['id'] for row in removed_rows],))
+            release_ports(cur, [p for row in removed_rows for p in (row['port'], row['rcon_port']) if p], host['name'])
+        conn.commit()
+
+    return {'created': created_count, 'removed': len(removed_rows), 'failed': len(to_create) - created_count}
+
+
+def claim_warm_container(conn, client: DockerClient, server: Dict[str, Any]) -> Optional[Tuple[str, int]]:
+    """
+    Забрать готовый контейнер под сервер: переименовать, выставить лимиты профиля, положить
+    server.properties и перенести порты и пароль RCON контейнера на сервер. Берутся только контейнеры
+    с хоста сервера; env созданного контейнера не меняется, поэтому серверу с другой кучей или GC
+    пул не подходит. Возвращает (container_id, port) или None.
+    """
+    if not matches_template(server):
+        return None
+    docker_host = server.get('docker_host') or DEFAULT_DOCKER_HOST
+
+    # Строка забирается отдельной транзакцией: вызовы Docker идут без открытой транзакции
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "DELETE FROM warm_containers WHERE id = ("
+            "  SELECT id FROM warm_containers "
+            "  WHERE docker_host_id = (SELECT id FROM docker_hosts WHERE name = %s) "
+            "    AND edition = %s AND version = %s "
+            "  ORDER BY id FOR UPDATE SKIP LOCKED LIMIT 1"
+            ") RETURNING " + WARM_COLUMNS,
+            (docker_host, server['edition'], server['version'])
+        )
+        warm = cur.fetchone()
+    conn.commit()
+    if warm is None:
+        return None
+
+    renamed = False
+    try:
+        run(client.rename_container(warm['container_id'], container_name(server['id'])))
+        renamed = True
+        run(client.update_container(warm['container_id'], resource_limits(server)))
+        run(client.put_archive(warm['container_id'], '/data', build_server_properties_archive(server)))
+    except Exception:
+        # Контейнер цел: возвращаем ему прежнее имя, а строку — в пул
+        if renamed:
+            try:
+                run(client.rename_container(warm['container_id'], warm['container_name']))
+            except Exception:
+                pass
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO warm_containers (" + WARM_COLUMNS + ") VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                tuple(warm[column] for column in WARM_COLUMNS.split(', '))
+            )
+        conn.commit()
+        return None
+
+    with conn.cursor() as cur:
+        # Сервер забирает порты контейнера, а свои ранее выделенные освобождает
+        adopted = [warm['port']] + ([warm['rcon_port']] if warm['rcon_port'] else [])
+        previous = [server.get('port')] + ([server.get('rcon_port')] if warm['rcon_port'] else [])
+        stale = [p for p in previous if p is not None and p not in adopted]
+        if stale:
+            release_ports(cur, stale, docker_host)
+        assign_ports(cur, adopted, server['id'], docker_host)
+        # Мир сервера живёт в томе тёплого контейнера: пересоздание должно монтировать его же
+        volume = warm_data_volume(warm['container_name'])
+        if warm['rcon_port']:
+            cur.execute(
+                "UPDATE servers SET port = %s, rcon_port = %s, rcon_password = %s, data_volume = %s WHERE id = %s",
+                (warm['port'], warm['rcon_port'], warm['rcon_password'], volume, server['id'])
+            )
+        else:
+            cur.execute("UPDATE servers SET port = %s, data_volume = %s WHERE id = %s",
+                        (warm['port'], volume, server['id']))
+        server['data_volume'] = volume
+    conn.commit()
+
+    return warm['container_id'][:12], warm['port']
+
+
+def generate_rcon_password() -> str:
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(secrets.choice(alphabet) for _ in range(16))
+
+
+def enabled_hosts(conn) -> List[Dict[str, Any]]:
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT id, name, url FROM docker_hosts WHERE enabled ORDER BY id")
+        hosts = cur.fetchall()
+    conn.commit()
+    return hosts
+
+
+def run_prewarm(conn, client: DockerClient, top: int = PREWARM_TOP_COMBOS, pool_size: int = WARM_POOL_SIZE) -> Dict[str, Any]:
+    """Прогреть каждый включённый хост; client — клиент хоста без своего url (DOCKER_HOST_URL)"""
+    combos = popular_combos(conn, top)
+    hosts = []
+    for host in enabled_hosts(conn):
+        host_client = get_client(host['url']) if host['url'] else client
+        hosts.append({
+            'host': host['name'],
+            'pulled': prewarm_images(host_client, combos),
+            'pool': fill_warm_pool(conn, host_client, host, combos, pool_size)
+        })
+    return {
+        'combos': [{'edition': e, 'version': v, 'servers': n} for e, v, n in combos],
+        'hosts': hosts
+    }
@@ -0,0 +1,113 @@
+import asyncio
+import itertools
+import os
+import struct
+from typing import Optional, Tuple
+
+RCON_TIMEOUT = float(os.environ.get('RCON_TIMEOUT', '3'))
+
+PACKET_RESPONSE = 0
+PACKET_COMMAND = 2
+PACKET_AUTH = 3
+MAX_PACKET_SIZE = 4096 + 14
+
+
+class RconError(Exception):
+    """Ошибка протокола RCON или неверный пароль"""
+
+
+class RconConnection:
+    """
+    Одно соединение RCON (протокол Source RCON, как в Minecraft Java).
+    Ответ длиннее 4096 байт сервер режет на несколько пакетов, поэтому после команды
+    отправляется пустой пакет-маркер: всё, что пришло до ответа на него, — ответ на команду.
+    """
+
+    def __init__(self, host: str, port: int, password: str, timeout: float = RCON_TIMEOUT) -> None:
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._ids = itertools.count(1)
+
+    @property
+    def closed(self) -> bool:
+        return self._writer is None or self._writer.is_closing()
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        try:
+            request_id = next(self._ids)
+            self._send(request_id, PACKET_AUTH, self.password)
+            await self._writer.drain()
+            # Некоторые серверы перед ответом на авторизацию шлют пустой RESPONSE_VALUE
+            while True:
+                response_id, packet_type, _ = await asyncio.wait_for(self._read_packet(), self.timeout)
+                if packet_type == PACKET_COMMAND:
+                    break
+            if response_id != request_id:
+                raise RconError('RCON authentication failed')
+        except BaseException:
+            self.close()
+            raise
+
+    async def command(self, command: str, timeout: Optional[float] = None) -> str:
+        """Выполнить команду и вернуть текст ответа"""
+        if self.closed:
+            raise RconError('RCON connection is closed')
+        try:
+            return await asyncio.wait_for(self._command(command), timeout or self.timeout)
+        except BaseException:
+            # После таймаута или обрыва в потоке могут остаться чужие ответы — соединение не переиспользуется
+            self.close()
+            raise
+
+    async def _command(self, command: str) -> str:
+        request_id = next(self._ids)
+        marker_id = next(self._ids)
+        self._send(request_id, PACKET_COMMAND, command)
+        self._send(marker_id, PACKET_RESPONSE, '')
+        await self._writer.drain()
+
+        parts = []
+        while True:
+            response_id, _, payload = await self._read_packet()
+            if response_id == marker_id:
+                return ''.join(parts)
+            if response_id == request_id:
+                parts.append(payload)
+            elif response_id == -1:
+                raise RconError('RCON session is not authenticated')
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+        self._reader = None
+
+    def _send(self, request_id: int, packet_type: int, payload: str) -> None:
+        body = struct.pack('<ii', request_id, packet_type) + payload.encode('utf-8') + b'\x00\x00'
+        self._writer.write(struct.pack('<i', len(body)) + body)
+
+    async def _read_packet(self) -> Tuple[int, int, str]:
+        (length,) = struct.unpack('<i', await self._reader.readexactly(4))
+        if length < 10 or length > MAX_PACKET_SIZE:
+            raise RconError(f'Bad RCON packet length {length}')
+        data = await self._reader.readexactly(length)
+        response_id, packet_type = struct.unpack_from('<ii', data)
+        return response_id, packet_type, data[8:-2].decode('utf-8', errors='replace')
+
+
+async def rcon_command(host: str, port: int, password: str, command: str,
+                       timeout: float = RCON_TIMEOUT) -> str:
+    """Одна команда на новом соединении"""
+    connection = RconConnection(host, port, password, timeout)
+    await connection.connect()
+    try:
+        return await connection.command(command)
+    finally:
+        connection.close()
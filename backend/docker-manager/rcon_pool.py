@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from rcon import RCON_TIMEOUT, RconConnection
+
+RCON_POOL_SIZE = int(os.environ.get('RCON_POOL_SIZE', '2'))
+RCON_IDLE_SECONDS = float(os.environ.get('RCON_IDLE_SECONDS', '60'))
+
+PoolKey = Tuple[str, int, str]
+
+
+class RconPool:
+    """
+    Авторизованные соединения RCON по серверам, переживающие тёплые вызовы.
+    На сервер не больше max_per_server соединений: команды сверх этого ждут свободное,
+    а не открывают новые — Minecraft обслуживает RCON в одном потоке на соединение.
+    """
+
+    def __init__(self, max_per_server: int = RCON_POOL_SIZE, idle_seconds: float = RCON_IDLE_SECONDS) -> None:
+        self.max_per_server = max(1, max_per_server)
+        self.idle_seconds = idle_seconds
+        self._idle: Dict[PoolKey, List[Tuple[RconConnection, float]]] = {}
+        self._slots: Dict[PoolKey, asyncio.Semaphore] = {}
+        self._pruned_at = time.monotonic()
+        self.connects = 0
+        self.reuses = 0
+
+    async def command(self, host: str, port: int, password: str, command: str,
+                      timeout: float = RCON_TIMEOUT) -> str:
+        key = (host, port, password)
+        self._prune_expired()
+        slots = self._slots.get(key)
+        if slots is None:
+            slots = self._slots[key] = asyncio.Semaphore(self.max_per_server)
+
+        async with slots:
+            connection = self._take_idle(key)
+            if connection is not None:
+                try:
+                    output = await connection.command(command, timeout)
+                    self._put_idle(key, connection)
+                    return output
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # Сервер закрыл простаивавшее соединение (перезапуск) — повторяем на новом
+                    pass
+
+            connection = RconConnection(host, port, password, timeout)
+            await connection.connect()
+            self.connects += 1
+            output = await connection.command(command, timeout)
+            self._put_idle(key, connection)
+            return output
+
+    def _take_idle(self, key: PoolKey) -> Optional[RconConnection]:
+        idle = self._idle.get(key) or []
+        now = time.monotonic()
+        while idle:
+            connection, released_at = idle.pop()
+            if connection.closed or now - released_at > self.idle_seconds:
+                connection.close()
+                continue
+            self.reuses += 1
+            return connection
+        return None
+
+    def _prune_expired(self) -> None:
+        """Закрыть простаивающие соединения серверов, к которым давно не обращались"""
+        now = time.monotonic()
+        if now - self._pruned_at < self.idle_seconds / 2:
+            return
+        self._pruned_at = now
+        for key in list(self._idle):
+            fresh = []
+            for connection, released_at in self._idle[key]:
+                if connection.closed or now - released_at > self.idle_seconds:
+                    connection.close()
+                else:
+                    fresh.append((connection, released_at))
+            if fresh:
+                self._idle[key] = fresh
+            else:
+                del self._idle[key]
+
+    def _put_idle(self, key: PoolKey, connection: RconConnection) -> None:
+        if not connection.closed:
+            self._idle.setdefault(key, []).append((connection, time.monotonic()))
+
+    def close_all(self) -> None:
+        for idle in self._idle.values():
+            for connection, _ in idle:
+                connection.close()
+        self._idle.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'servers': len(self._slots),
+            'idle': sum(len(idle) for idle in self._idle.values()),
+            'connects': self.connects,
+            'reuses': self.reuses
+        }
+
+
+_pool: Optional[RconPool] = None
+
+
+def get_rcon_pool() -> RconPool:
+    """Пул на уровне модуля; работает на общем цикле событий docker_client.run"""
+    global _pool
+    if _pool is None:
+        _pool = RconPool()
+    return _pool
+
+
+async def broadcast(pool: RconPool, targets: List[Tuple[int, str, int, str]], command: str,
+                    parallelism: int, timeout: float = RCON_TIMEOUT) -> List[Any]:
+    """Отправить команду на серверы (server_id, host, port, password); результат — ответ или исключение"""
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+
+    async def one(host: str, port: int, password: str) -> Any:
+        async with semaphore:
+            try:
+                return await pool.command(host, port, password, command, timeout)
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(one(host, port, password) for _, host, port, password in targets))
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from container_config import CONTAINER_PREFIX
+from docker_client import DockerClient, get_client, run
+from jobs import CONTAINER_JOB_KINDS
+
+RECONCILE_GRACE_SECONDS = int(os.environ.get('RECONCILE_GRACE_SECONDS', '60'))
+RECONCILE_MAX_CORRECTIONS = int(os.environ.get('RECONCILE_MAX_CORRECTIONS', '5000'))
+
+# Состояние из листинга /containers/json -> статус в servers; None — состояние переходное, не трогаем
+CONTAINER_STATES = {
+    'running': 'online',
+    'restarting': 'starting',
+    'created': 'offline',
+    'exited': 'offline',
+    'dead': 'offline',
+    'paused': 'offline',
+    'removing': None
+}
+
+
+def list_minecraft_containers(docker_host: str) -> Dict[str, Dict[str, Any]]:
+    """Все контейнеры minecraft-* одним запросом /containers/json, ключ — id сервера"""
+    return run(fetch_minecraft_containers(get_client(docker_host)))
+
+
+async def fetch_minecraft_containers(client: DockerClient) -> Dict[str, Dict[str, Any]]:
+    containers = await client.list_containers(all=True, filters={'name': [CONTAINER_PREFIX]})
+
+    # Фильтр name в Docker ищет подстроку, поэтому имя проверяется точно
+    result = {}
+    for container in containers:
+        for name in container.get('Names') or []:
+            name = name.lstrip('/')
+            server_id = name[len(CONTAINER_PREFIX):]
+            if name.startswith(CONTAINER_PREFIX) and server_id.isdigit():
+                result[server_id] = container
+    return result
+
+
+def list_containers_on_hosts(docker_hosts: List[str]) -> Dict[str, Optional[Dict[str, Dict[str, Any]]]]:
+    """Листинги нескольких Docker хостов параллельно; None — хост недоступен"""
+    async def fetch_all() -> List[Any]:
+        return await asyncio.gather(
+            *(fetch_minecraft_containers(get_client(url)) for url in docker_hosts),
+            return_exceptions=True
+        )
+
+    listings = run(fetch_all())
+    return {
+        url: None if isinstance(listing, Exception) else listing
+        for url, listing in zip(docker_hosts, listings)
+    }
+
+
+def container_status(container: Dict[str, Any]) -> Optional[str]:
+    """
+    Статус сервера по строке листинга. Образы itzg объявляют HEALTHCHECK: пока проверка
+    не прошла, Status содержит «health: starting», и сервер ещё не принимает игроков.
+    """
+    status = CONTAINER_STATES.get(container.get('State', ''))
+    if status == 'online' and '(health: starting)' in (container.get('Status') or ''):
+        return 'starting'
+    return status
+
+
+def reconcile_targets(conn, docker_host: str) -> List[Dict[str, Any]]:
+    """Все серверы одним запросом: статус, хост и признаки, при которых сверку надо пропустить"""
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT s.id, s.status, s.updated_at, COALESCE(h.url, %s) AS docker_url, "
+            "s.updated_at > CURRENT_TIMESTAMP - make_interval(secs => %s) AS recent, "
+            "EXISTS (SELECT 1 FROM container_jobs j WHERE j.server_id = s.id AND j.kind = ANY(%s) "
+            "        AND j.status IN ('queued', 'running')) AS pending_job "
+            "FROM servers s LEFT JOIN docker_hosts h ON h.id = s.docker_host_id "
+            "ORDER BY s.id",
+            (docker_host, RECONCILE_GRACE_SECONDS, list(CONTAINER_JOB_KINDS))
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def plan_corrections(rows: List[Dict[str, Any]],
+                     listings: Dict[str, Optional[Dict[str, Dict[str, Any]]]]) -> Tuple[List[Tuple[Any, ...]], Dict[str, int]]:
+    """
+    Сравнить статусы с листингами. Возвращает поправки (id, прежний статус, новый, updated_at, причина)
+    и счётчики пропусков: хост недоступен, недавнее действие, контейнер ещё создаётся.
+    """
+    corrections = []
+    skipped = {'hostUnavailable': 0, 'recent': 0, 'pendingJob': 0, 'transitional': 0}
+    for row in rows:
+        listing = listings.get(row['docker_url'])
+        if listing is None:
+            skipped['hostUnavailable'] += 1
+            continue
+
+        container = listing.get(str(row['id']))
+        if container is None:
+            if row['pending_job']:
+                skipped['pendingJob'] += 1
+                continue
+            actual, reason = 'offline', 'no container'
+        else:
+            actual = container_status(container)
+            if actual is None:
+                skipped['transitional'] += 1
+                continue
+            # Остановленный или замороженный контейнер спящего сервера — ожидаемое состояние
+            if row['status'] == 'sleeping' and actual == 'offline':
+                continue
+            reason = f"container {container.get('State')}"
+
+        if actual == row['status']:
+            continue
+        if row['recent']:
+            skipped['recent'] += 1
+            continue
+        corrections.append((row['id'], row['status'], actual, row['updated_at'], reason))
+    return corrections, skipped
+
+
+def apply_corrections(conn, corrections: List[Tuple[Any, ...]]) -> List[Tuple[int, str, str]]:
+    """
+    Один UPDATE на все поправки и один INSERT логов. Строка обновляется, только если статус
+    и updated_at не изменились с момента чтения: параллельный start/stop не перезаписывается.
+    """
+    if not corrections:
+        return []
+    reasons = {server_id: (old, new, reason) for server_id, old, new, _, reason in corrections}
+    with conn.cursor() as cur:
+        updated = execute_values(
+            cur,
+            "UPDATE servers AS s SET status = v.new_status, updated_at = CURRENT_TIMESTAMP "
+            "FROM (VALUES %s) AS v(id, old_status, new_status, seen_at) "
+            "WHERE s.id = v.id AND s.status = v.old_status AND s.updated_at IS NOT DISTINCT FROM v.seen_at "
+            "RETURNING s.id",
+            [(server_id, old, new, seen_at) for server_id, old, new, seen_at, _ in corrections],
+            template="(%s::integer, %s::varchar, %s::varchar, %s::timestamp)",
+            page_size=len(corrections),
+            fetch=True
+        )
+        applied = sorted(row[0] for row in updated)
+        if applied:
+            execute_values(
+                cur,
+                "INSERT INTO server_logs (server_id, log_type, message) VALUES %s",
+                [
+                    (server_id, 'INFO', f'Status reconciled: {reasons[server_id][0]} -> {reasons[server_id][1]} '
+                                        f'({reasons[server_id][2]})')
+                    for server_id in applied
+                ],
+                page_size=len(applied)
+            )
+    conn.commit()
+    return [(server_id, reasons[server_id][0], reasons[server_id][1]) for server_id in applied]
+
+
+def run_reconcile(conn, docker_host: str, max_corrections: int = RECONCILE_MAX_CORRECTIONS) -> Dict[str, Any]:
+    """
+    Один цикл сверки: запрос в БД, по одному листингу на Docker хост и одна запись поправок.
+    Если поправок больше max_corrections, цикл ничего не пишет: это скорее сбой листинга, чем дрейф.
+    """
+    started = time.monotonic()
+    rows = reconcile_targets(conn, docker_host)
+    hosts = sorted({row['docker_url'] for row in rows})
+    listings = list_containers_on_hosts(hosts)
+    corrections, skipped = plan_corrections(rows, listings)
+
+    if len(corrections) > max_corrections:
+        applied = []
+        aborted = True
+    else:
+        applied = apply_corrections(conn, corrections)
+        aborted = False
+
+    transitions: Dict[str, int] = {}
+    for _, old, new in applied:
+        key = f'{old}->{new}'
+        transitions[key] = transitions.get(key, 0) + 1
+
+    return {
+        'checked': len(rows),
+        'hosts': len(hosts),
+        'unavailableHosts': sorted(url for url, listing in listings.items() if listing is None),
+        'planned': len(corrections),
+        'corrected': len(applied),
+        'conflicts': len(corrections) - len(applied) if not aborted else 0,
+        'aborted': aborted,
+        'transitions': transitions,
+        'skipped': skipped,
+        'elapsedMs': round((time.monotonic() - started) * 1000)
+    }
@@ -0,0 +1,46 @@
+"""
+Сверка статусов серверов в БД с фактическим состоянием контейнеров:
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 python reconciler.py [--once]
+
+Исправляет дрейф после режима симуляции и переводит starting в online, когда контейнер прошёл healthcheck.
+"""
+import os
+import sys
+import time
+
+from db_pool import get_pool
+from reconcile import run_reconcile
+
+RECONCILE_INTERVAL = float(os.environ.get('RECONCILE_INTERVAL', '30'))
+
+
+def main() -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    once = '--once' in sys.argv
+
+    pool = get_pool(database_url)
+
+    while True:
+        started = time.monotonic()
+        conn = pool.acquire()
+        try:
+            summary = run_reconcile(conn, docker_host)
+        finally:
+            pool.release(conn)
+
+        transitions = ', '.join(f'{key}: {count}' for key, count in sorted(summary['transitions'].items()))
+        print(f"checked {summary['checked']} server(s) on {summary['hosts']} host(s), "
+              f"corrected {summary['corrected']}{f' ({transitions})' if transitions else ''}, "
+              f"{summary['conflicts']} conflict(s), {len(summary['unavailableHosts'])} host(s) unavailable "
+              f"in {summary['elapsedMs']} ms", flush=True)
+        if summary['aborted']:
+            print(f"skipped writing {summary['planned']} correction(s): above RECONCILE_MAX_CORRECTIONS", flush=True)
+        if once:
+            return
+        time.sleep(max(0.0, RECONCILE_INTERVAL - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import re
+from typing import Dict, Any, List, Optional
+
+from container_config import (
+    build_container_config, build_server_properties_archive, container_name, resource_env, resource_limits
+)
+from docker_client import DockerClient
+from profiles import memory_limit_mb
+
+# Переменные env, которые задаёт профиль; остальной env контейнера профиль не трогает
+RESOURCE_ENV_KEYS = ('MEMORY=', 'USE_AIKAR_FLAGS=')
+DATA_PATH = '/data'
+
+
+def heap_from_env(env: List[str]) -> Optional[int]:
+    """Куча из MEMORY=2G / MEMORY=1536M в env контейнера, МБ"""
+    for item in env:
+        match = re.fullmatch(r'MEMORY=(\d+)([GgMm])', item)
+        if match:
+            return int(match.group(1)) * (1024 if match.group(2) in 'Gg' else 1)
+    return None
+
+
+def has_data_volume(info: Dict[str, Any]) -> bool:
+    """
+    Мир лежит в именованном томе или bind-монтировании /data и переживёт пересоздание контейнера.
+    Анонимный том из VOLUME образа itzg не в счёт: новый контейнер получил бы пустой.
+    """
+    host_config = info.get('HostConfig') or {}
+    return (
+        any(bind.split(':')[1:2] == [DATA_PATH] for bind in host_config.get('Binds') or [])
+        or any(mount.get('Target') == DATA_PATH for mount in host_config.get('Mounts') or [])
+    )
+
+
+async def start_with_profile(client: DockerClient, server: Dict[str, Any], restart: bool = False) -> Dict[str, Any]:
+    """
+    start/restart с применением профиля: лимиты cgroup меняются через update, server.properties
+    кладётся архивом, и только смена кучи или GC требует пересоздания. Пересоздаётся лишь контейнер
+    с миром в томе /data, иначе новая куча ждёт (profilePending), а лимит не опускается ниже нужного
+    текущей куче. Уже запущенный контейнер при start не трогается.
+    """
+    name = container_name(server['id'])
+    info = await client.inspect_container(name, timeout=10)
+    running = (info.get('State') or {}).get('Running', False)
+    if running and not restart:
+        await client.container_action(name, 'start', timeout=30)
+        return {'applied': False, 'recreated': False, 'profilePending': False}
+    if running:
+        await client.container_action(name, 'stop', timeout=60)
+
+    env = (info.get('Config') or {}).get('Env') or []
+    current = sorted(item for item in env if item.startswith(RESOURCE_ENV_KEYS))
+    wanted = sorted(resource_env(server['edition'], server))
+    changed = current != wanted
+
+    ref = info['Id']
+    recreated = pending = False
+    if changed and has_data_volume(info):
+        config = build_container_config(server)
+        # Тома и bind-монтирования переносятся как есть: в них мир сервера
+        for key in ('Binds', 'Mounts'):
+            if (info.get('HostConfig') or {}).get(key):
+                config['HostConfig'][key] = info['HostConfig'][key]
+        await client.remove_container(ref, timeout=30)
+        ref = (await client.create_container(name, config, timeout=30))['Id']
+        recreated = True
+    else:
+        pending = changed
+        running_heap = heap_from_env(env) if pending else None
+        floor = memory_limit_mb(running_heap) if running_heap else 0
+        await client.update_container(ref, resource_limits(server, floor), timeout=30)
+
+    await client.put_archive(ref, DATA_PATH, build_server_properties_archive(server), timeout=30)
+    await client.container_action(ref, 'start', timeout=30)
+    return {'applied': True, 'recreated': recreated, 'profilePending': pending}
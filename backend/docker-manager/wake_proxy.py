@@ -0,0 +1,263 @@
+"""
+Прокси пробуждения на портах спящих серверов: запускается на Docker хосте рядом с контейнерами.
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 [WAKE_PROXY_HOST=node-1] python wake_proxy.py
+
+Остановленный контейнер освобождает порт хоста, и прокси занимает его: отвечает на пинг списка
+серверов (Java Server List Ping, Bedrock Unconnected Ping), а на попытку входа будит сервер
+и просит игрока зайти снова. Замороженные (pause) контейнеры держат порт, их будит только API.
+"""
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from db_pool import get_pool
+from hibernate import WakeError, wake_server
+from player_query import (
+    RAKNET_MAGIC, RAKNET_UNCONNECTED_PING, RAKNET_UNCONNECTED_PONG, QueryError,
+    decode_varint, pack_packet, pack_string, read_varint
+)
+from ports import DEFAULT_DOCKER_HOST
+
+WAKE_PROXY_BIND = os.environ.get('WAKE_PROXY_BIND', '0.0.0.0')
+WAKE_PROXY_HOST = os.environ.get('WAKE_PROXY_HOST', DEFAULT_DOCKER_HOST)
+WAKE_PROXY_REFRESH = float(os.environ.get('WAKE_PROXY_REFRESH', '2'))
+WAKE_PROXY_MOTD = os.environ.get('WAKE_PROXY_MOTD', 'Сервер спит — зайдите, чтобы разбудить')
+WAKE_PROXY_KICK_MESSAGE = os.environ.get('WAKE_PROXY_KICK_MESSAGE', 'Сервер просыпается, зайдите снова через минуту')
+WAKE_PROXY_BEDROCK_PROTOCOL = int(os.environ.get('WAKE_PROXY_BEDROCK_PROTOCOL', '0'))
+
+HANDSHAKE_TIMEOUT = 5.0
+MAX_HANDSHAKE_LENGTH = 1024
+RAKNET_UNCONNECTED_PING_OPEN = 0x02
+RAKNET_OPEN_CONNECTION_REQUEST_1 = 0x05
+RAKNET_SERVER_GUID = 0x57414b4550524f58
+
+
+class PostgresWakeStore:
+    """Спящие серверы Docker хоста WAKE_PROXY_HOST (по умолчанию 'default') и их пробуждение"""
+
+    def __init__(self, pool, docker_host: str, host_name: str = WAKE_PROXY_HOST) -> None:
+        self.pool = pool
+        self.docker_host = docker_host
+        self.host_name = host_name
+
+    def sleeping(self) -> Dict[int, Dict[str, Any]]:
+        conn = self.pool.acquire()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    "SELECT s.id, s.name, s.edition, s.version, s.port, s.max_players FROM servers s "
+                    "LEFT JOIN docker_hosts h ON h.id = s.docker_host_id "
+                    "WHERE s.status = 'sleeping' AND s.hibernation_mode = 'stop' AND s.port IS NOT NULL "
+                    "AND COALESCE(h.name, %s) = %s",
+                    (DEFAULT_DOCKER_HOST, self.host_name)
+                )
+                rows = cur.fetchall()
+            conn.commit()
+            return {row['id']: dict(row) for row in rows}
+        finally:
+            self.pool.release(conn)
+
+    def wake(self, server_id: int, reason: str) -> str:
+        conn = self.pool.acquire()
+        try:
+            return wake_server(conn, server_id, self.docker_host, reason)
+        finally:
+            self.pool.release(conn)
+
+
+class _BedrockProtocol(asyncio.DatagramProtocol):
+    def __init__(self, proxy: 'WakeProxy', server: Dict[str, Any]) -> None:
+        self.proxy = proxy
+        self.server = server
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport  # type: ignore[assignment]
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        if not data or self.transport is None:
+            return
+        if data[0] in (RAKNET_UNCONNECTED_PING, RAKNET_UNCONNECTED_PING_OPEN) and len(data) >= 9:
+            (ping_time,) = struct.unpack_from('>Q', data, 1)
+            self.transport.sendto(bedrock_pong(self.server, ping_time), addr)
+            self.proxy.pings += 1
+        elif data[0] == RAKNET_OPEN_CONNECTION_REQUEST_1 and data[1:17] == RAKNET_MAGIC:
+            self.proxy.logins += 1
+            self.proxy.request_wake(self.server['id'], f'Bedrock connection from {addr[0]}')
+
+
+def java_status(server: Dict[str, Any], protocol: int) -> Dict[str, Any]:
+    """Ответ Server List Ping спящего сервера; протокол клиента возвращается, чтобы сервер не выглядел устаревшим"""
+    return {
+        'version': {'name': server['version'], 'protocol': protocol},
+        'players': {'max': server['max_players'], 'online': 0, 'sample': []},
+        'description': {'text': WAKE_PROXY_MOTD}
+    }
+
+
+def bedrock_pong(server: Dict[str, Any], ping_time: int) -> bytes:
+    motd = WAKE_PROXY_MOTD.replace(';', ',')
+    name = (server.get('name') or '').replace(';', ',')
+    server_id = (
+        f"MCPE;{motd};{WAKE_PROXY_BEDROCK_PROTOCOL};{server['version']};0;{server['max_players']};"
+        f"{RAKNET_SERVER_GUID};{name};Survival;1;{server['port']};{server['port']};"
+    ).encode('utf-8')
+    return (
+        struct.pack('>BQQ', RAKNET_UNCONNECTED_PONG, ping_time, RAKNET_SERVER_GUID)
+        + RAKNET_MAGIC + struct.pack('>H', len(server_id)) + server_id
+    )
+
+
+def parse_handshake(data: bytes) -> Tuple[int, int]:
+    """Handshake Java: (версия протокола клиента, следующее состояние — 1 статус, 2 вход, 3 перенос)"""
+    packet_id, offset = decode_varint(data)
+    if packet_id != 0x00:
+        raise QueryError(f'Unexpected packet 0x{packet_id:02x}')
+    protocol, offset = decode_varint(data, offset)
+    address_length, offset = decode_varint(data, offset)
+    offset += address_length + 2
+    next_state, _ = decode_varint(data, offset)
+    return protocol, next_state
+
+
+class WakeProxy:
+    """
+    Слушатели на портах спящих серверов. Каждые refresh секунд список сверяется с БД:
+    порт занимается, когда сервер уснул, и освобождается, когда его разбудили (в том числе через API).
+    """
+
+    def __init__(self, store: Any, bind: str = WAKE_PROXY_BIND, refresh: float = WAKE_PROXY_REFRESH) -> None:
+        self.store = store
+        self.bind = bind
+        self.refresh_interval = refresh
+        self.listeners: Dict[int, Tuple[Dict[str, Any], Callable[[], Any]]] = {}
+        self.waking: Dict[int, asyncio.Task] = {}
+        self.pings = 0
+        self.logins = 0
+        self.wakes = 0
+        self.wake_failures = 0
+        self.bind_failures = 0
+
+    async def run(self, once: bool = False) -> None:
+        try:
+            while True:
+                started = time.monotonic()
+                await self.refresh()
+                if once:
+                    return
+                await asyncio.sleep(max(0.0, self.refresh_interval - (time.monotonic() - started)))
+        finally:
+            await self.close_all()
+
+    async def refresh(self) -> None:
+        sleeping = await asyncio.to_thread(self.store.sleeping)
+        for server_id in list(self.listeners):
+            if server_id not in sleeping or sleeping[server_id]['port'] != self.listeners[server_id][0]['port']:
+                await self._unlisten(server_id)
+        for server_id, server in sleeping.items():
+            if server_id not in self.listeners and server_id not in self.waking:
+                await self._listen(server)
+
+    async def _listen(self, server: Dict[str, Any]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            if server['edition'] == 'bedrock':
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _BedrockProtocol(self, server), local_addr=(self.bind, server['port'])
+                )
+                self.listeners[server['id']] = (server, transport.close)
+            else:
+                listener = await asyncio.start_server(
+                    lambda reader, writer: self._handle_java(server, reader, writer), self.bind, server['port']
+                )
+                self.listeners[server['id']] = (server, listener.close)
+        except OSError:
+            # Порт ещё держит контейнер или docker-proxy; следующая сверка попробует снова
+            self.bind_failures += 1
+
+    async def _unlisten(self, server_id: int) -> None:
+        entry = self.listeners.pop(server_id, None)
+        if entry is not None:
+            entry[1]()
+            # Дать циклу закрыть сокет, прежде чем порт займёт контейнер
+            await asyncio.sleep(0)
+
+    async def _handle_java(self, server: Dict[str, Any], reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> None:
+        try:
+            async def read_packet() -> bytes:
+                length = await read_varint(reader)
+                if length <= 0 or length > MAX_HANDSHAKE_LENGTH:
+                    raise QueryError(f'Bad packet length {length}')
+                return await reader.readexactly(length)
+
+            protocol, next_state = parse_handshake(await asyncio.wait_for(read_packet(), HANDSHAKE_TIMEOUT))
+            if next_state == 1:
+                await asyncio.wait_for(read_packet(), HANDSHAKE_TIMEOUT)
+                writer.write(pack_packet(0x00, pack_string(json.dumps(java_status(server, protocol)))))
+                await writer.drain()
+                self.pings += 1
+                ping = await asyncio.wait_for(read_packet(), HANDSHAKE_TIMEOUT)
+                writer.write(pack_packet(0x01, ping[1:9]))
+                await writer.drain()
+            elif next_state in (2, 3):
+                # Login Disconnect: клиент покажет сообщение вместо «соединение отклонено»
+                writer.write(pack_packet(0x00, pack_string(json.dumps({'text': WAKE_PROXY_KICK_MESSAGE}))))
+                await writer.drain()
+                self.logins += 1
+                peer = writer.get_extra_info('peername')
+                self.request_wake(server['id'], f"Java login from {peer[0] if peer else 'unknown'}")
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, QueryError):
+            pass
+        finally:
+            writer.close()
+
+    def request_wake(self, server_id: int, reason: str) -> None:
+        if server_id not in self.waking:
+            self.waking[server_id] = asyncio.get_running_loop().create_task(self._wake(server_id, reason))
+
+    async def _wake(self, server_id: int, reason: str) -> None:
+        try:
+            await self._unlisten(server_id)
+            await asyncio.to_thread(self.store.wake, server_id, reason)
+            self.wakes += 1
+        except WakeError as e:
+            self.wake_failures += 1
+            print(f'wake of server {server_id} failed: {e}', flush=True)
+        finally:
+            self.waking.pop(server_id, None)
+
+    async def close_all(self) -> None:
+        for server_id in list(self.listeners):
+            await self._unlisten(server_id)
+        if self.waking:
+            await asyncio.gather(*self.waking.values(), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'listening': sorted(self.listeners),
+            'pings': self.pings,
+            'logins': self.logins,
+            'wakes': self.wakes,
+            'wakeFailures': self.wake_failures,
+            'bindFailures': self.bind_failures
+        }
+
+
+def main(argv: List[str]) -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    proxy = WakeProxy(PostgresWakeStore(get_pool(database_url), docker_host))
+    print(f"wake proxy for host {WAKE_PROXY_HOST} on {WAKE_PROXY_BIND}", flush=True)
+    asyncio.run(proxy.run(once='--once' in argv))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
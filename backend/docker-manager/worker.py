@@ -0,0 +1,43 @@
+"""
+Воркер очереди container_jobs. Запускается рядом с Docker хостом или локально:
+
+    DATABASE_URL=... DOCKER_HOST_URL=http://127.0.0.1:2375 python worker.py [--once]
+
+Несколько воркеров можно запускать параллельно — задачи разбираются через SKIP LOCKED.
+"""
+import os
+import sys
+import time
+
+from db_pool import get_pool
+from docker_client import get_client
+from jobs import run_pending_jobs
+
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '2'))
+
+
+def main() -> None:
+    database_url = os.environ['DATABASE_URL']
+    docker_host = os.environ.get('DOCKER_HOST_URL', 'http://localhost:2375')
+    once = '--once' in sys.argv
+
+    pool = get_pool(database_url)
+    client = get_client(docker_host)
+
+    while True:
+        conn = pool.acquire()
+        try:
+            processed = run_pending_jobs(conn, client, budget_seconds=60, docker_host=docker_host)
+        finally:
+            pool.release(conn)
+
+        if processed:
+            print(f'processed {processed} job(s)', flush=True)
+        elif once:
+            return
+        else:
+            time.sleep(JOB_POLL_INTERVAL)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import json
+import os
+import select
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+EVENTS_CHANNEL = 'server_events'
+EVENTS_MAX_WAIT = float(os.environ.get('EVENTS_MAX_WAIT', '25'))
+EVENTS_COALESCE_SECONDS = float(os.environ.get('EVENTS_COALESCE_MS', '250')) / 1000
+EVENTS_RETENTION_MINUTES = int(os.environ.get('EVENTS_RETENTION_MINUTES', '60'))
+EVENTS_PAGE_SIZE = 500
+EVENTS_RETRY_MS = 1000
+LISTEN_HEARTBEAT_SECONDS = 30
+
+
+class EventHub:
+    """
+    Одно соединение LISTEN на процесс. Уведомление несёт user_id, поэтому просыпаются только
+    запросы этого пользователя (у каждого свой Condition на общей блокировке);
+    '*' и переподключение будят всех — уведомления могли потеряться.
+    """
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self.notifications = 0
+        self.reconnects = 0
+        self._epoch = 0
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._waiting: Dict[str, Tuple[threading.Condition, int]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def snapshot(self, user_id: str) -> Tuple[int, int]:
+        self._ensure_started()
+        with self._lock:
+            return self._epoch, self._versions.get(user_id, 0)
+
+    def wait(self, user_id: str, seen: Tuple[int, int], timeout: float) -> Tuple[int, int]:
+        """Ждать, пока для пользователя не придёт уведомление новее seen; возвращает новый снимок"""
+        self._ensure_started()
+        with self._lock:
+            cond, count = self._waiting.get(user_id) or (threading.Condition(self._lock), 0)
+            self._waiting[user_id] = (cond, count + 1)
+            try:
+                cond.wait_for(lambda: (self._epoch, self._versions.get(user_id, 0)) != seen, timeout)
+                return self._epoch, self._versions.get(user_id, 0)
+            finally:
+                cond, count = self._waiting[user_id]
+                if count > 1:
+                    self._waiting[user_id] = (cond, count - 1)
+                else:
+                    del self._waiting[user_id]
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._listen_forever, daemon=True)
+                self._thread.start()
+
+    def _wake(self, payloads: List[str]) -> None:
+        with self._lock:
+            woken = set()
+            for payload in payloads:
+                if payload == '*':
+                    self._epoch += 1
+                    woken.update(self._waiting)
+                    continue
+                for user_id in payload.split(','):
+                    self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                    woken.add(user_id)
+            self.notifications += len(payloads)
+            for user_id in woken:
+                if user_id in self._waiting:
+                    self._waiting[user_id][0].notify_all()
+
+    def _listen_forever(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {EVENTS_CHANNEL}')
+                self.reconnects += 1
+                self._wake(['*'])
+                while True:
+                    readable, _, _ = select.select([conn], [], [], LISTEN_HEARTBEAT_SECONDS)
+                    if not readable:
+                        # Соединение могло умереть, пока экземпляр функции был заморожен
+                        with conn.cursor() as cur:
+                            cur.execute('SELECT 1')
+                    conn.poll()
+                    if conn.notifies:
+                        payloads = [notify.payload for notify in conn.notifies]
+                        conn.notifies.clear()
+                        self._wake(payloads)
+            except Exception:
+                time.sleep(1)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+_hub: Optional[EventHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_hub(dsn: str) -> EventHub:
+    global _hub
+    with _hub_lock:
+        if _hub is None or _hub.dsn != dsn:
+            _hub = EventHub(dsn)
+        return _hub
+
+
+# Строка видна всем будущим читателям в порядке id, только если её транзакция старше любой
+# незавершённой: id из последовательности выдаётся при вставке, а виден с коммита, и курсор
+# не должен перескочить через id, который ещё может закоммитить длинная транзакция (COPY логов).
+# age() сравнивает xid с учётом переполнения счётчика; замороженные строки считаются старыми.
+SETTLED = "age(xmin) > age(pg_snapshot_xmin(pg_current_snapshot())::xid)"
+
+
+def settled_prefix(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Строки по возрастанию id до первой неосевшей (колонка settled) и признак, что часть придержана"""
+    for index, row in enumerate(rows):
+        if not row.pop('settled'):
+            for rest in rows[index + 1:]:
+                rest.pop('settled')
+            return rows[:index], True
+    return rows, False
+
+
+def latest_event_id(conn, user_id: str) -> int:
+    """
+    Курсор «с текущего момента»: последнее осевшее событие (любого пользователя — незакоммиченные
+    события этого пользователя не видны, но их id больше) и не выше первого неосевшего события пользователя
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT LEAST(COALESCE((SELECT id FROM server_events WHERE {SETTLED} ORDER BY id DESC LIMIT 1), 0), "
+            f"(SELECT MIN(id) - 1 FROM server_events WHERE user_id = %s AND NOT {SETTLED}))",
+            (user_id,)
+        )
+        latest = cur.fetchone()[0]
+    conn.commit()
+    return latest
+
+
+def fetch_events(conn, user_id: str, after_id: int, server_id: Optional[int] = None,
+                 limit: int = EVENTS_PAGE_SIZE) -> Tuple[List[Dict[str, Any]], bool, bool]:
+    """
+    События пользователя после курсора, признак того, что часть их уже удалена по сроку хранения,
+    и признак, что более новые события придержаны до завершения старших транзакций (SETTLED)
+    """
+    scope = " WHERE user_id = %s AND id > %s"
+    args: Tuple[Any, ...] = (user_id, after_id)
+    if server_id is not None:
+        scope += " AND server_id = %s"
+        args += (server_id,)
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            f"SELECT id, server_id, kind, payload, created_at, {SETTLED} AS settled FROM server_events" + scope +
+            " ORDER BY id LIMIT %s",
+            args + (limit,)
+        )
+        rows, held = settled_prefix(cur.fetchall())
+        cur.execute("SELECT MIN(id) AS oldest FROM server_events")
+        oldest = cur.fetchone()['oldest']
+    conn.commit()
+    return rows, after_id > 0 and oldest is not None and oldest > after_id + 1, held
+
+
+def coalesce(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Схлопнуть всплеск: по серверу остаётся последний статус и одно событие логов
+    с последним id и суммой строк. Порядок — по id последнего вошедшего события.
+    """
+    merged: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    for row in rows:
+        key = (row['server_id'], row['kind'])
+        previous = merged.pop(key, None)
+        data = dict(row['payload'])
+        if previous is not None and row['kind'] == 'logs':
+            data['lines'] = previous['data'].get('lines', 0) + data.get('lines', 0)
+        elif previous is not None and row['kind'] == 'status':
+            data['previous'] = previous['data'].get('previous')
+        merged[key] = {
+            'id': row['id'],
+            'serverId': row['server_id'],
+            'type': row['kind'],
+            'data': data,
+            'timestamp': row['created_at'].isoformat()
+        }
+    return list(merged.values())
+
+
+def prune_events(conn, minutes: int = EVENTS_RETENTION_MINUTES) -> int:
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM server_events WHERE created_at < CURRENT_TIMESTAMP - make_interval(mins => %s)",
+            (minutes,)
+        )
+        deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def format_sse(events: List[Dict[str, Any]], cursor: int, reset: bool) -> str:
+    """
+    Тело text/event-stream. Ответ конечный: EventSource переподключается через retry
+    и присылает Last-Event-ID — получается long-poll в формате SSE.
+    """
+    parts = [f'retry: {EVENTS_RETRY_MS}\n\n']
+    if reset:
+        parts.append('event: reset\ndata: {}\n\n')
+    for event in events:
+        parts.append(f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n")
+    if not events or events[-1]['id'] != cursor:
+        parts.append(f'id: {cursor}\n\n')
+    return ''.join(parts)
@@ -1,75 +1,398 @@
 import json
 import os
-import psycopg2
+import hashlib
+import time
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from db_pool import get_pool
+from retention import DEFAULT_RETENTION_DAYS, run_maintenance
+from events import (
+    EVENTS_COALESCE_SECONDS, EVENTS_MAX_WAIT, SETTLED, coalesce, fetch_events, format_sse, get_hub,
+    latest_event_id, prune_events
+)
+from tracing import json_dumps, traced
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+@traced('server-logs')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
-    Business: Получение логов сервера
-    Args: event с httpMethod, queryStringParameters (serverId)
-    Returns: HTTP response с логами сервера
+    Business: Получение логов сервера с курсорной пагинацией (afterId / beforeId) и ETag,
+              суточные сводки, обслуживание партиций (хранение, архив, удаление)
+              и long-poll / SSE события об изменении статуса и новых логах (view=events)
+    Args: event с httpMethod, queryStringParameters (serverId, afterId, beforeId, limit, logType, view, cursor, wait),
+          body (action: maintain | set-retention)
+    Returns: HTTP response с логами сервера или 304, если новых записей нет
     """
     method: str = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
         return {
             'statusCode': 200,
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, If-None-Match, X-Maintenance-Token, Last-Event-ID, X-Trace',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
             'isBase64Encoded': False
         }
-    
-    if method != 'GET':
+
+    if method not in ('GET', 'POST'):
         return {
             'statusCode': 405,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
+            'body': json_dumps({'error': 'Method not allowed'}),
             'isBase64Encoded': False
         }
-    
+
+    if method == 'POST':
+        body_data = json.loads(event.get('body') or '{}')
+        action = body_data.get('action')
+        if action not in ('maintain', 'set-retention'):
+            return {
+                'statusCode': 400,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json_dumps({'error': 'Invalid action'}),
+                'isBase64Encoded': False
+            }
+
+        maintenance_token = os.environ.get('MAINTENANCE_TOKEN')
+        if action == 'maintain' and maintenance_token and get_header(event, 'X-Maintenance-Token') != maintenance_token:
+            return {
+                'statusCode': 403,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json_dumps({'error': 'Forbidden'}),
+                'isBase64Encoded': False
+            }
+
     params = event.get('queryStringParameters', {}) or {}
+
+    database_url = os.environ.get('DATABASE_URL')
+    pool = get_pool(database_url)
+
+    # Ожидание событий не держит соединение пула: оно берётся только на запросы
+    if method == 'GET' and params.get('view') == 'events':
+        return get_events(event, params, pool, database_url)
+
+    conn = pool.acquire()
+
+    try:
+        if method == 'POST':
+            if action == 'maintain':
+                return maintain_partitions(conn)
+            return set_retention(event, body_data, conn)
+        if params.get('view') == 'rollup':
+            return get_rollups(params, conn)
+        return get_logs(event, params, conn)
+    finally:
+        pool.release(conn)
+
+def get_logs(event: Dict[str, Any], params: Dict[str, Any], conn) -> Dict[str, Any]:
+    """Страница логов по курсору; записи старше срока хранения сервера не отдаются"""
     server_id = params.get('serverId')
-    
+
     if not server_id:
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Server ID is required'}),
+            'body': json_dumps({'error': 'Server ID is required'}),
             'isBase64Encoded': False
         }
-    
-    database_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(database_url)
-    
+
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        after_id = parse_optional_int(params.get('afterId'))
+        before_id = parse_optional_int(params.get('beforeId'))
+        limit = parse_optional_int(params.get('limit')) or DEFAULT_PAGE_SIZE
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'afterId, beforeId and limit must be integers'}),
+            'isBase64Encoded': False
+        }
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    log_type = params.get('logType') or None
+
+    # Граница по created_at позволяет планировщику отсечь устаревшие партиции
+    scope = (
+        " WHERE server_id = %s AND created_at >= CURRENT_TIMESTAMP - make_interval(days => "
+        "COALESCE((SELECT log_retention_days FROM servers WHERE id = %s), %s))"
+    )
+    scope_args = (server_id, server_id, DEFAULT_RETENTION_DAYS)
+    if log_type:
+        scope += " AND log_type = %s"
+        scope_args += (log_type,)
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Граница страниц — последняя осевшая запись (см. events.SETTLED): пока идёт пачка COPY
+        # с меньшими id, более поздние строки не отдаются и lastId через них не перескакивает
+        cur.execute(
+            "SELECT id FROM server_logs" + scope + " AND " + SETTLED + " ORDER BY id DESC LIMIT 1",
+            scope_args
+        )
+        newest = cur.fetchone()
+        newest_id = newest['id'] if newest else 0
+
+        etag = build_etag(server_id, log_type, after_id, before_id, limit, newest_id)
+        if etag_matches(event, etag):
+            return {
+                'statusCode': 304,
+                'headers': {
+                    'ETag': etag,
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Expose-Headers': 'ETag'
+                },
+                'body': '',
+                'isBase64Encoded': False
+            }
+
+        before_filter = " AND id < %s" if before_id is not None else ""
+        before_args = (before_id,) if before_id is not None else ()
+
+        if after_id is not None and newest_id <= after_id:
+            logs = []
+            has_more = False
+        elif after_id is not None:
+            # Новые записи читаются от старых к новым, чтобы клиент мог дочитать хвост страницами
             cur.execute(
-                "SELECT log_type, message, created_at "
-                "FROM server_logs WHERE server_id = %s "
-                "ORDER BY created_at DESC LIMIT 100",
-                (server_id,)
+                "SELECT id, log_type, message, created_at FROM server_logs" + scope +
+                " AND id > %s AND id <= %s" + before_filter + " ORDER BY id ASC LIMIT %s",
+                scope_args + (after_id, newest_id) + before_args + (limit + 1,)
             )
             logs = cur.fetchall()
-            
-            result = []
-            for log in logs:
-                result.append({
-                    'type': log['log_type'],
-                    'message': log['message'],
-                    'timestamp': log['created_at'].isoformat()
-                })
-        
+            has_more = len(logs) > limit
+            logs = list(reversed(logs[:limit]))
+        else:
+            cur.execute(
+                "SELECT id, log_type, message, created_at FROM server_logs" + scope +
+                " AND id <= %s" + before_filter + " ORDER BY id DESC LIMIT %s",
+                scope_args + (newest_id,) + before_args + (limit + 1,)
+            )
+            logs = cur.fetchall()
+            has_more = len(logs) > limit
+            logs = logs[:limit]
+
+        result = []
+        for log in logs:
+            result.append({
+                'id': log['id'],
+                'type': log['log_type'],
+                'message': log['message'],
+                'timestamp': log['created_at'].isoformat()
+            })
+
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'ETag': etag,
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag'
+        },
+        'body': json_dumps({
+            'logs': result,
+            'lastId': result[0]['id'] if result else (after_id or newest_id),
+            'firstId': result[-1]['id'] if result else before_id,
+            'hasMore': has_more
+        }),
+        'isBase64Encoded': False
+    }
+
+def get_events(event: Dict[str, Any], params: Dict[str, Any], pool, database_url: str) -> Dict[str, Any]:
+    """
+    События пользователя после cursor (или Last-Event-ID). Если их нет, запрос ждёт до wait секунд
+    уведомления LISTEN/NOTIFY; после пробуждения выжидает окно, чтобы всплеск ушёл одним ответом.
+    Без курсора сразу возвращается текущий курсор — история не отдаётся.
+    """
+    user_id = get_header(event, 'X-User-Id') or params.get('userId') or 'demo-user'
+    stream = 'text/event-stream' in (get_header(event, 'Accept') or '')
+
+    try:
+        cursor = parse_optional_int(params.get('cursor') or get_header(event, 'Last-Event-ID'))
+        server_id = parse_optional_int(params.get('serverId'))
+        wait = float(params.get('wait') or EVENTS_MAX_WAIT)
+    except ValueError:
         return {
-            'statusCode': 200,
+            'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'logs': result}),
+            'body': json_dumps({'error': 'cursor, serverId and wait must be numbers'}),
             'isBase64Encoded': False
         }
+
+    wait = max(0.0, min(wait, EVENTS_MAX_WAIT))
+    hub = get_hub(database_url)
+    seen = hub.snapshot(user_id)
+    has_cursor = cursor is not None
+
+    conn = pool.acquire()
+    try:
+        if not has_cursor:
+            events, reset, held, cursor = [], False, False, latest_event_id(conn, user_id)
+        else:
+            rows, reset, held = fetch_events(conn, user_id, cursor, server_id)
+            events = coalesce(rows)
     finally:
-        conn.close()
+        pool.release(conn)
+
+    deadline = time.monotonic() + (wait if has_cursor else 0.0)
+    while not events and not reset:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not held:
+            current = hub.wait(user_id, seen, remaining)
+            if current == seen:
+                break
+            seen = current
+        # Придержанные события уже закоммичены, уведомления о них не будет — перечитываем сами
+        time.sleep(min(EVENTS_COALESCE_SECONDS, max(0.0, deadline - time.monotonic())))
+        conn = pool.acquire()
+        try:
+            rows, reset, held = fetch_events(conn, user_id, cursor, server_id)
+        finally:
+            pool.release(conn)
+        events = coalesce(rows)
+
+    if events:
+        cursor = events[-1]['id']
+
+    if stream:
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': format_sse(events, cursor, reset),
+            'isBase64Encoded': False
+        }
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Cache-Control': 'no-cache', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'events': events, 'cursor': cursor, 'reset': reset}),
+        'isBase64Encoded': False
+    }
+
+def get_rollups(params: Dict[str, Any], conn) -> Dict[str, Any]:
+    """Суточные счётчики логов, сохранённые при удалении старых партиций"""
+    server_id = params.get('serverId')
+
+    if not server_id:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'Server ID is required'}),
+            'isBase64Encoded': False
+        }
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(
+            "SELECT day, log_type, lines, first_at, last_at FROM server_log_rollups "
+            "WHERE server_id = %s ORDER BY day DESC, log_type",
+            (server_id,)
+        )
+        rollups = cur.fetchall()
+
+        result = []
+        for rollup in rollups:
+            result.append({
+                'day': rollup['day'].isoformat(),
+                'type': rollup['log_type'],
+                'lines': rollup['lines'],
+                'firstAt': rollup['first_at'].isoformat(),
+                'lastAt': rollup['last_at'].isoformat()
+            })
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'rollups': result}),
+        'isBase64Encoded': False
+    }
+
+def maintain_partitions(conn) -> Dict[str, Any]:
+    """Создать партиции наперёд, удалить устаревшие партиции и события (запускается по расписанию)"""
+    summary = run_maintenance(conn)
+    summary['eventsPruned'] = prune_events(conn)
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps(summary),
+        'isBase64Encoded': False
+    }
+
+def set_retention(event: Dict[str, Any], body_data: Dict[str, Any], conn) -> Dict[str, Any]:
+    """Задать срок хранения логов для сервера пользователя (null — значение по умолчанию)"""
+    headers = event.get('headers', {})
+    user_id = headers.get('X-User-Id', 'demo-user')
+    server_id = body_data.get('serverId')
+    days = body_data.get('days')
+
+    if not server_id or (days is not None and (not isinstance(days, int) or days <= 0)):
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'serverId and positive integer days required'}),
+            'isBase64Encoded': False
+        }
+
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE servers SET log_retention_days = %s, updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = %s AND user_id = %s",
+            (days, server_id, user_id)
+        )
+        updated = cur.rowcount
+        conn.commit()
+
+    if not updated:
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': 'Server not found'}),
+            'isBase64Encoded': False
+        }
+
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json_dumps({'serverId': server_id, 'retentionDays': days or DEFAULT_RETENTION_DAYS}),
+        'isBase64Encoded': False
+    }
+
+def parse_optional_int(value: Optional[str]) -> Optional[int]:
+    """Разобрать необязательный целочисленный параметр запроса"""
+    if value is None or value == '':
+        return None
+    return int(value)
+
+def build_etag(server_id: str, log_type: Optional[str], after_id: Optional[int],
+               before_id: Optional[int], limit: int, newest_id: int) -> str:
+    """ETag зависит от параметров запроса и id самой свежей записи"""
+    key = f'{server_id}|{log_type or ""}|{after_id}|{before_id}|{limit}|{newest_id}'
+    return '"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '"'
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Значение заголовка без учёта регистра имени"""
+    headers = event.get('headers', {}) or {}
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    """Проверить заголовок If-None-Match"""
+    value = get_header(event, 'If-None-Match')
+    if not value:
+        return False
+    candidates = [v.strip() for v in value.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates or '*' in candidates
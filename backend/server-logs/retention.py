@@ -0,0 +1,162 @@
+import gzip
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from psycopg2 import sql
+
+DEFAULT_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', '30'))
+PARTITIONS_AHEAD_DAYS = int(os.environ.get('LOG_PARTITIONS_AHEAD_DAYS', '7'))
+ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR', '/tmp/server-logs-archive')
+# Выгрузка партиций перед удалением; задаётся только конфигурацией, не телом запроса
+ARCHIVE_ENABLED = os.environ.get('LOG_ARCHIVE', '1') not in ('0', 'false', 'off')
+
+PARTITION_PREFIX = 'server_logs_p'
+PARTITION_NAME_RE = re.compile(r'^server_logs_p(\d{8})$')
+
+
+def partition_name(day: date) -> str:
+    """Имя суточной партиции server_logs"""
+    return f"{PARTITION_PREFIX}{day.strftime('%Y%m%d')}"
+
+
+def list_partitions(conn) -> List[Tuple[str, date]]:
+    """Суточные партиции server_logs, отсортированные по дате"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'server_logs'"
+        )
+        names = [row[0] for row in cur.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((name, datetime.strptime(match.group(1), '%Y%m%d').date()))
+    partitions.sort(key=lambda item: item[1])
+    return partitions
+
+
+def ensure_partitions(conn, start: date, days: int) -> List[str]:
+    """
+    Создать недостающие суточные партиции на [start, start + days].
+    Строки, успевшие попасть в server_logs_default за этот день, переносятся в новую партицию.
+    """
+    existing = {name for name, _ in list_partitions(conn)}
+    created = []
+
+    with conn.cursor() as cur:
+        for offset in range(days + 1):
+            day = start + timedelta(days=offset)
+            name = partition_name(day)
+            if name in existing:
+                continue
+
+            cur.execute(
+                "SELECT 1 FROM server_logs_default WHERE created_at >= %s AND created_at < %s LIMIT 1",
+                (day, day + timedelta(days=1))
+            )
+            if cur.fetchone():
+                cur.execute(sql.SQL(
+                    "CREATE TABLE {} (LIKE server_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+                ).format(sql.Identifier(name)))
+                cur.execute(sql.SQL(
+                    "WITH moved AS ("
+                    "DELETE FROM server_logs_default WHERE created_at >= %s AND created_at < %s RETURNING *"
+                    ") INSERT INTO {} SELECT * FROM moved"
+                ).format(sql.Identifier(name)), (day, day + timedelta(days=1)))
+                cur.execute(sql.SQL(
+                    "ALTER TABLE server_logs ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)"
+                ).format(sql.Identifier(name)), (day, day + timedelta(days=1)))
+            else:
+                cur.execute(sql.SQL(
+                    "CREATE TABLE IF NOT EXISTS {} PARTITION OF server_logs FOR VALUES FROM (%s) TO (%s)"
+                ).format(sql.Identifier(name)), (day, day + timedelta(days=1)))
+            created.append(name)
+
+    conn.commit()
+    return created
+
+
+def longest_retention_days(conn) -> int:
+    """Партиция удаляется только когда она устарела для сервера с самым длинным сроком хранения"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT MAX(log_retention_days) FROM servers")
+        row = cur.fetchone()
+    configured = row[0] if row and row[0] else 0
+    return max(configured, DEFAULT_RETENTION_DAYS)
+
+
+def rollup_partition(conn, name: str) -> int:
+    """Свести партицию в суточные счётчики server_log_rollups перед удалением"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL(
+            "INSERT INTO server_log_rollups (server_id, day, log_type, lines, first_at, last_at) "
+            "SELECT server_id, created_at::date, log_type, COUNT(*), MIN(created_at), MAX(created_at) "
+            "FROM {} GROUP BY server_id, created_at::date, log_type "
+            "ON CONFLICT (server_id, day, log_type) DO UPDATE SET "
+            "lines = EXCLUDED.lines, first_at = EXCLUDED.first_at, last_at = EXCLUDED.last_at"
+        ).format(sql.Identifier(name)))
+        return cur.rowcount
+
+
+def archive_partition(conn, name: str, archive_dir: str = ARCHIVE_DIR) -> str:
+    """Выгрузить партицию потоком COPY в сжатый CSV-файл"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'{name}.csv.gz')
+    tmp_path = path + '.part'
+
+    with conn.cursor() as cur, gzip.open(tmp_path, 'wb', compresslevel=6) as archive:
+        cur.copy_expert(
+            sql.SQL(
+                "COPY (SELECT id, server_id, log_type, message, created_at FROM {} ORDER BY id) "
+                "TO STDOUT WITH (FORMAT csv, HEADER true)"
+            ).format(sql.Identifier(name)).as_string(conn),
+            archive
+        )
+    os.replace(tmp_path, path)
+    return path
+
+
+def drop_partition(conn, name: str) -> None:
+    """Отсоединить и удалить партицию целиком вместо построчного DELETE"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("ALTER TABLE server_logs DETACH PARTITION {}").format(sql.Identifier(name)))
+        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+
+
+def run_maintenance(conn, today: Optional[date] = None, archive: bool = ARCHIVE_ENABLED) -> Dict[str, Any]:
+    """Создать партиции наперёд, свести, заархивировать и удалить устаревшие"""
+    today = today or date.today()
+    created = ensure_partitions(conn, today, PARTITIONS_AHEAD_DAYS)
+
+    retention_days = longest_retention_days(conn)
+    cutoff = today - timedelta(days=retention_days)
+
+    dropped = []
+    archives = []
+    for name, day in list_partitions(conn):
+        if day >= cutoff:
+            break
+        # Каждый шаг — своя короткая транзакция: долгая запись держала бы курсоры событий и логов
+        # (SETTLED). Свёртка идемпотентна, поэтому сбой после неё безопасно повторить.
+        rollup_partition(conn, name)
+        conn.commit()
+        if archive:
+            archives.append(archive_partition(conn, name))
+            conn.commit()
+        drop_partition(conn, name)
+        conn.commit()
+        dropped.append(name)
+
+    return {
+        'created': created,
+        'dropped': dropped,
+        'archives': archives,
+        'retentionDays': retention_days,
+        'cutoff': cutoff.isoformat()
+    }
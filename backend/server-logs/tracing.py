@@ -0,0 +1,357 @@
+import bisect
+import contextvars
+import functools
+import itertools
+import json
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg2.extensions
+
+TRACE_LOG = os.environ.get('TRACE_LOG', '1') not in ('0', 'false', 'off')
+TRACE_LOG_MIN_MS = float(os.environ.get('TRACE_LOG_MIN_MS', '0'))
+TRACE_LOG_SPANS = int(os.environ.get('TRACE_LOG_SPANS', '10'))
+# Server-Timing в каждом ответе; без этого — только по заголовку запроса X-Trace: 1
+TRACE_HEADER = os.environ.get('TRACE_HEADER', '0') in ('1', 'true', 'on')
+TRACE_MAX_SPANS = 1000
+
+# Фазы, число вызовов которых на запрос пишется в гистограмму: рост выдаёт N+1 запросов
+COUNTED_PHASES = ('sql', 'docker')
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CALLS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+MAX_ROUTES = 100
+MAX_OPERATIONS = 500
+
+INSTANCE = f'{socket.gethostname()}:{os.getpid()}'
+# id трассы: случайный префикс экземпляра и счётчик — дешевле uuid4 на каждый вызов
+_TRACE_PREFIX = uuid.uuid4().hex[:8]
+_trace_numbers = itertools.count(1)
+
+# Сторонние счётчики для view=prometheus: (метрика, тип, описание, метки, значение)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+_current: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """Фазы одного вызова handler: число и суммарное время на фазу и отдельные отрезки для лога"""
+
+    __slots__ = ('id', 'function', 'route', 'started', 'phases', 'spans')
+
+    def __init__(self, function: str, route: str) -> None:
+        self.id = f'{_TRACE_PREFIX}{next(_trace_numbers):08x}'
+        self.function = function
+        self.route = route
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+        self.spans: List[Tuple[str, str, float]] = []
+
+    def add(self, phase: str, operation: str, seconds: float) -> None:
+        totals = self.phases.setdefault(phase, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+        if len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append((phase, operation, seconds))
+        _registry.observe_span(self.function, phase, operation, seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Заголовок Server-Timing: время фаз в мс (параллельные вызовы Docker суммируются) и всего"""
+        parts = [
+            f'{phase};dur={totals[1] * 1000:.2f};desc="{int(totals[0])} calls"'
+            for phase, totals in self.phases.items()
+        ]
+        parts.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(parts)
+
+    def finish(self, status: int) -> None:
+        elapsed = self.elapsed()
+        _registry.observe_request(self, status, elapsed)
+        if TRACE_LOG and elapsed * 1000 >= TRACE_LOG_MIN_MS:
+            slowest = sorted(self.spans, key=lambda span: span[2], reverse=True)[:TRACE_LOG_SPANS]
+            print(json.dumps({
+                'trace': self.id,
+                'function': self.function,
+                'route': self.route,
+                'status': status,
+                'ms': round(elapsed * 1000, 2),
+                'phases': {
+                    phase: {'calls': int(totals[0]), 'ms': round(totals[1] * 1000, 2)}
+                    for phase, totals in self.phases.items()
+                },
+                'slowest': [
+                    {'phase': phase, 'op': operation, 'ms': round(seconds * 1000, 2)}
+                    for phase, operation, seconds in slowest
+                ]
+            }, ensure_ascii=False), flush=True)
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Registry:
+    """
+    Гистограммы экземпляра функции, живут между тёплыми вызовами. Метки ограничены: маршруты
+    и операции сверх MAX_ROUTES / MAX_OPERATIONS сводятся в other.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, ...], _Histogram] = {}
+        self._spans: Dict[Tuple[str, ...], _Histogram] = {}
+        self._calls: Dict[Tuple[str, ...], _Histogram] = {}
+
+    def observe_span(self, function: str, phase: str, operation: str, seconds: float) -> None:
+        with self._lock:
+            key = (function, phase, operation)
+            if key not in self._spans and len(self._spans) >= MAX_OPERATIONS:
+                key = (function, phase, 'other')
+            _get(self._spans, key, DURATION_BUCKETS).observe(seconds)
+
+    def observe_request(self, trace: Trace, status: int, seconds: float) -> None:
+        with self._lock:
+            _get(self._requests, (trace.function, trace.route, f'{status // 100}xx'), DURATION_BUCKETS).observe(seconds)
+            for phase in COUNTED_PHASES:
+                calls = trace.phases.get(phase, (0, 0.0))[0]
+                _get(self._calls, (trace.function, trace.route, phase), CALLS_BUCKETS).observe(calls)
+
+    def known_route(self, function: str, route: str) -> bool:
+        with self._lock:
+            return len(self._requests) < MAX_ROUTES or any(
+                key[0] == function and key[1] == route for key in self._requests
+            )
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        lines: List[str] = []
+        with self._lock:
+            _render(lines, 'handler_request_duration_seconds', 'Handler latency by route and status class',
+                    ('function', 'route', 'status'), self._requests)
+            _render(lines, 'handler_phase_duration_seconds', 'Duration of each SQL statement, Docker call, '
+                    'connect and JSON serialization', ('function', 'phase', 'operation'), self._spans)
+            _render(lines, 'handler_phase_calls', 'SQL statements and Docker calls per request',
+                    ('function', 'route', 'phase'), self._calls)
+        _render_samples(lines, [sample for collect in _collectors for sample in collect()])
+        return '\n'.join(lines) + '\n'
+
+
+def _get(histograms: Dict[Tuple[str, ...], _Histogram], key: Tuple[str, ...], buckets: Tuple[float, ...]) -> _Histogram:
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = _Histogram(buckets)
+    return histogram
+
+
+def _render(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+            histograms: Dict[Tuple[str, ...], _Histogram]) -> None:
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for key, histogram in sorted(histograms.items()):
+        labels = ','.join(f'{label}="{_escape(value)}"' for label, value in zip(label_names, key))
+        labels += f',instance="{_escape(INSTANCE)}"'
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.9g}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+def _render_samples(lines: List[str], samples: List[Sample]) -> None:
+    described = set()
+    for name, kind, help_text, labels, value in sorted(samples, key=lambda sample: sample[0]):
+        if name not in described:
+            described.add(name)
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+        rendered = ''.join(f'{label}="{_escape(text)}",' for label, text in labels.items())
+        lines.append(f'{name}{{{rendered}instance="{_escape(INSTANCE)}"}} {value:.9g}')
+
+
+def register_collector(collect: Callable[[], Iterable[Sample]]) -> None:
+    """Добавить к view=prometheus счётчики модуля (пул БД и т. п.); collect вызывается на каждый сбор"""
+    _collectors.append(collect)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_registry = _Registry()
+
+
+@contextmanager
+def span(phase: str, operation: str) -> Iterator[None]:
+    """Засечь отрезок текущего вызова; вне handler (воркеры, демоны) ничего не делает"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(phase, operation, time.perf_counter() - started)
+
+
+def record(phase: str, operation: str, seconds: float) -> None:
+    """Отрезок, измеренный снаружи (например, ожидание соединения пула)"""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(phase, operation, seconds)
+
+
+def json_dumps(obj: Any, **kwargs: Any) -> str:
+    with span('json', 'dumps'):
+        return json.dumps(obj, **kwargs)
+
+
+_SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+([A-Za-z_][\w.]*)', re.IGNORECASE)
+_sql_operations: Dict[str, str] = {}
+
+
+def sql_operation(query: Any, conn: Any = None) -> str:
+    """Метка запроса для гистограммы: глагол и первая таблица — «SELECT servers», «UPDATE container_jobs»"""
+    if not isinstance(query, str):
+        try:
+            query = query.as_string(conn) if hasattr(query, 'as_string') else query.decode('utf-8')
+        except Exception:
+            return 'composed'
+    operation = _sql_operations.get(query)
+    if operation is None:
+        words = query.split(None, 1)
+        verb = words[0].upper() if words else '?'
+        table = _SQL_TABLE.search(query)
+        operation = f'{verb} {table.group(1)}' if table else verb
+        if len(_sql_operations) < MAX_OPERATIONS:
+            _sql_operations[query] = operation
+    return operation
+
+
+_traced_cursors: Dict[type, type] = {}
+
+
+def _traced_cursor(base: type) -> type:
+    """Подкласс курсора (обычного или RealDictCursor), засекающий каждый execute"""
+    cursor_class = _traced_cursors.get(base)
+    if cursor_class is None:
+        def execute(self, query, vars=None):
+            with span('sql', sql_operation(query, self.connection)):
+                return base.execute(self, query, vars)
+
+        def executemany(self, query, vars_list):
+            with span('sql', sql_operation(query, self.connection)):
+                return base.executemany(self, query, vars_list)
+
+        cursor_class = type('Traced' + base.__name__, (base,), {'execute': execute, 'executemany': executemany})
+        _traced_cursors[base] = cursor_class
+    return cursor_class
+
+
+class TracedConnection(psycopg2.extensions.connection):
+    """Соединение, курсоры которого пишут каждый запрос в фазу sql текущего вызова"""
+
+    def cursor(self, *args: Any, **kwargs: Any):
+        kwargs['cursor_factory'] = _traced_cursor(
+            kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        )
+        return super().cursor(*args, **kwargs)
+
+
+_ROUTE_NAME = re.compile(r'[a-z][a-z0-9-]{0,31}')
+
+
+def route_of(function: str, event: Dict[str, Any]) -> str:
+    """Метка маршрута: метод и view или action; произвольные значения не раздувают метрики"""
+    method = event.get('httpMethod') or 'GET'
+    params = event.get('queryStringParameters') or {}
+    name = params.get('view') or ''
+    if method == 'POST' and not name:
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except (TypeError, ValueError):
+            body = None
+        if isinstance(body, dict):
+            name = body.get('action') or ''
+            if 'serverIds' in body:
+                name = f'bulk-{name}'
+        else:
+            name = 'invalid'
+    if name and (not isinstance(name, str) or not _ROUTE_NAME.fullmatch(name)):
+        name = 'other'
+    route = f'{method} {name}'.strip()
+    return route if _registry.known_route(function, route) else f'{method} other'
+
+
+def _header(event: Dict[str, Any], name: str) -> Optional[str]:
+    lowered = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+
+def metrics_response() -> Dict[str, Any]:
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8', 'Access-Control-Allow-Origin': '*'},
+        'body': _registry.render(),
+        'isBase64Encoded': False
+    }
+
+
+def traced(function: str) -> Callable:
+    """
+    Обёртка handler: трасса вызова в contextvar (её видят пул БД, курсоры и клиент Docker),
+    гистограммы, структурный лог и Server-Timing. GET ?view=prometheus отдаёт метрики экземпляра.
+    """
+    def decorate(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]]) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            params = event.get('queryStringParameters') or {}
+            if event.get('httpMethod') == 'GET' and params.get('view') == 'prometheus':
+                return metrics_response()
+
+            trace = Trace(function, route_of(function, event))
+            token = _current.set(trace)
+            status = 500
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode', 200)
+                if TRACE_HEADER or _header(event, 'X-Trace') == '1':
+                    response['headers'] = {
+                        **(response.get('headers') or {}),
+                        'Server-Timing': trace.server_timing(),
+                        'Timing-Allow-Origin': '*',
+                        'X-Trace-Id': trace.id
+                    }
+                return response
+            finally:
+                _current.reset(token)
+                trace.finish(status)
+        return wrapper
+    return decorate
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional
+
+SERVERS_CACHE_TTL = float(os.environ.get('SERVERS_CACHE_TTL', '10'))
+SERVERS_CACHE_SIZE = int(os.environ.get('SERVERS_CACHE_SIZE', '1024'))
+SERVERS_CACHE_BACKEND = os.environ.get('SERVERS_CACHE_BACKEND', '')
+
+
+class CacheBackend(ABC):
+    """Общий кэш между экземплярами функции (Redis, Memcached): строковые ключи и значения с TTL"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """Замена общего кэша в памяти процесса — для локального запуска и проверки"""
+
+    def __init__(self) -> None:
+        self._items: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.monotonic():
+                del self._items[key]
+                return None
+            return item[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+
+BACKENDS: Dict[str, Callable[[], CacheBackend]] = {
+    'local': LocalCacheBackend
+}
+
+
+def register_backend(name: str, factory: Callable[[], CacheBackend]) -> None:
+    BACKENDS[name] = factory
+
+
+class CachedList:
+    __slots__ = ('version', 'body', 'etag', 'expires_at')
+
+    def __init__(self, version: int, body: str, etag: str, expires_at: float) -> None:
+        self.version = version
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """
+    Готовые тела ответа get_servers по пользователям: LRU с TTL в процессе и необязательный
+    общий бэкенд. Запись годна, пока совпадает версия списка из server_list_versions;
+    TTL ограничивает только устаревание онлайна игроков, который версию не меняет.
+    """
+
+    def __init__(self, max_entries: int = SERVERS_CACHE_SIZE, ttl: float = SERVERS_CACHE_TTL,
+                 backend: Optional[CacheBackend] = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: 'OrderedDict[str, CachedList]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, version: int) -> Optional[CachedList]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                if entry.version == version and entry.expires_at > now:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return entry
+                del self._entries[user_id]
+                if entry.version != version:
+                    self.stale += 1
+
+        if self.backend is not None:
+            raw = self.backend.get(self._key(user_id))
+            if raw is not None:
+                data = json.loads(raw)
+                if data['version'] == version:
+                    entry = CachedList(version, data['body'], data['etag'], now + data['ttl'])
+                    self._remember(user_id, entry)
+                    with self._lock:
+                        self.shared_hits += 1
+                    return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, user_id: str, version: int, body: str) -> CachedList:
+        etag = '"' + hashlib.sha1(f'{version}|{body}'.encode('utf-8')).hexdigest()[:20] + '"'
+        entry = CachedList(version, body, etag, time.monotonic() + self.ttl)
+        self._remember(user_id, entry)
+        if self.backend is not None:
+            self.backend.set(
+                self._key(user_id),
+                json.dumps({'version': version, 'body': body, 'etag': etag, 'ttl': self.ttl}),
+                self.ttl
+            )
+        return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self, user_id: str) -> None:
+        """Сбросить запись после записи в этом процессе; другим процессам хватит смены версии"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+        if self.backend is not None:
+            self.backend.delete(self._key(user_id))
+
+    def _remember(self, user_id: str, entry: CachedList) -> None:
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f'servers:list:{user_id}'
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'sharedHits': self.shared_hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'notModified': self.not_modified,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'hitRate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None
+            }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_cache() -> ResponseCache:
+    """Кэш на уровне модуля: переживает тёплые вызовы функции"""
+    global _cache
+    if _cache is None:
+        factory = BACKENDS.get(SERVERS_CACHE_BACKEND)
+        _cache = ResponseCache(backend=factory() if factory else None)
+    return _cache
+
+
+def list_version(cur, user_id: str) -> int:
+    cur.execute("SELECT version FROM server_list_versions WHERE user_id = %s", (user_id,))
+    row = cur.fetchone()
+    if row is None:
+        return 0
+    return row['version'] if isinstance(row, dict) else row[0]
@@ -0,0 +1,270 @@
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from tracing import Sample, TracedConnection, record, register_collector, span
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '5'))
+POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE', '300'))
+POOL_MAX_LIFETIME_SECONDS = float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800'))
+POOL_HEALTHCHECK_AFTER_SECONDS = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', '30'))
+
+
+class PoolTimeout(Exception):
+    """Все соединения заняты дольше POOL_ACQUIRE_TIMEOUT"""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn) -> None:
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+
+
+class ConnectionPool:
+    """
+    Пул соединений PostgreSQL, живущий между тёплыми вызовами функции.
+    Соединения старше max_lifetime или простаивающие дольше max_idle пересоздаются,
+    давно не использованные проверяются через SELECT 1 перед выдачей.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_size: int = POOL_MAX_SIZE,
+        acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+        max_idle: float = POOL_MAX_IDLE_SECONDS,
+        max_lifetime: float = POOL_MAX_LIFETIME_SECONDS,
+        healthcheck_after: float = POOL_HEALTHCHECK_AFTER_SECONDS
+    ) -> None:
+        self.dsn = dsn
+        self.max_size = max(1, max_size)
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.healthcheck_after = healthcheck_after
+
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._cond = threading.Condition()
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+        self.recycled = 0
+        self.failed_healthchecks = 0
+
+    def acquire(self):
+        """Выдать соединение: свободное из пула, новое или дождаться освобождения"""
+        deadline = time.monotonic() + self.acquire_timeout
+        waited_from: Optional[float] = None
+
+        while True:
+            pooled: Optional[_PooledConnection] = None
+            with self._cond:
+                while not self._idle and len(self._in_use) >= self.max_size:
+                    now = time.monotonic()
+                    if waited_from is None:
+                        waited_from = now
+                        self.waits += 1
+                    if now >= deadline:
+                        self.timeouts += 1
+                        self._record_wait(waited_from)
+                        raise PoolTimeout(f'No free database connection after {self.acquire_timeout}s')
+                    self._cond.wait(deadline - now)
+
+                if self._idle:
+                    pooled = self._idle.pop()
+                    self._in_use[id(pooled.conn)] = pooled
+                else:
+                    # Резервируем слот до connect(), чтобы параллельные вызовы не превысили max_size
+                    placeholder = _PooledConnection(None)
+                    self._in_use[id(placeholder)] = placeholder
+
+            if pooled is not None:
+                # Проверка выполняется вне блокировки: зависший сокет не должен держать весь пул
+                if self._is_usable(pooled):
+                    with self._cond:
+                        self.hits += 1
+                        self._finish_wait(waited_from)
+                    return pooled.conn
+                _close_quietly(pooled.conn)
+                self._free_slot(id(pooled.conn))
+                continue
+
+            try:
+                with span('connect', 'psycopg2.connect'):
+                    conn = psycopg2.connect(self.dsn, connection_factory=TracedConnection)
+            except Exception:
+                self._free_slot(id(placeholder))
+                raise
+
+            with self._cond:
+                self._in_use.pop(id(placeholder), None)
+                self._in_use[id(conn)] = _PooledConnection(conn)
+                self.misses += 1
+                self._finish_wait(waited_from)
+            return conn
+
+    def release(self, conn) -> None:
+        """Вернуть соединение в пул; сломанные и незавершённые транзакции не возвращаются грязными"""
+        with self._cond:
+            pooled = self._in_use.get(id(conn))
+
+        if pooled is None:
+            _close_quietly(conn)
+            return
+
+        reusable = not conn.closed
+        if reusable:
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                reusable = False
+
+        now = time.monotonic()
+        if reusable and now - pooled.created_at > self.max_lifetime:
+            self.recycled += 1
+            reusable = False
+        if not reusable:
+            _close_quietly(conn)
+
+        with self._cond:
+            self._in_use.pop(id(conn), None)
+            if reusable:
+                pooled.last_used_at = now
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    def close_all(self) -> None:
+        """Закрыть все свободные соединения (занятые закроются при release)"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            _close_quietly(pooled.conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики пула для мониторинга"""
+        with self._cond:
+            return {
+                'maxSize': self.max_size,
+                'inUse': len(self._in_use),
+                'idle': len(self._idle),
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'waitTimeTotalMs': round(self.wait_time_total * 1000, 3),
+                'waitTimeMaxMs': round(self.wait_time_max * 1000, 3),
+                'timeouts': self.timeouts,
+                'recycled': self.recycled,
+                'failedHealthchecks': self.failed_healthchecks
+            }
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        conn = pooled.conn
+        if conn.closed:
+            return False
+
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_lifetime or now - pooled.last_used_at > self.max_idle:
+            self.recycled += 1
+            return False
+
+        if now - pooled.last_used_at > self.healthcheck_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT 1')
+                conn.rollback()
+            except Exception:
+                self.failed_healthchecks += 1
+                return False
+        return True
+
+    def _free_slot(self, key: int) -> None:
+        with self._cond:
+            self._in_use.pop(key, None)
+            self._cond.notify()
+
+    def _finish_wait(self, waited_from: Optional[float]) -> None:
+        if waited_from is not None:
+            self._record_wait(waited_from)
+
+    def _record_wait(self, waited_from: float) -> None:
+        waited = time.monotonic() - waited_from
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        record('pool', 'wait', waited)
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn: str) -> ConnectionPool:
+    """Пул на уровне модуля: переживает тёплые вызовы того же экземпляра функции"""
+    pool = _pools.get(dsn)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(dsn)
+            if pool is None:
+                pool = ConnectionPool(dsn)
+                _pools[dsn] = pool
+    return pool
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Счётчики всех пулов модуля (ключ — хост из DSN, без пароля)"""
+    return {_safe_dsn_label(dsn): pool.stats() for dsn, pool in list(_pools.items())}
+
+
+def _safe_dsn_label(dsn: str) -> str:
+    if '@' in dsn:
+        return dsn.rsplit('@', 1)[1]
+    return 'default'
+
+
+# (метрика, ключ stats(), тип, описание)
+_POOL_METRICS = [
+    ('db_pool_max_size', 'maxSize', 'gauge', 'Connection pool size limit'),
+    ('db_pool_in_use', 'inUse', 'gauge', 'Connections handed out'),
+    ('db_pool_idle', 'idle', 'gauge', 'Idle connections kept warm'),
+    ('db_pool_hits_total', 'hits', 'counter', 'Acquires served by a warm connection'),
+    ('db_pool_misses_total', 'misses', 'counter', 'Acquires that opened a new connection'),
+    ('db_pool_waits_total', 'waits', 'counter', 'Acquires that waited for a free connection'),
+    ('db_pool_timeouts_total', 'timeouts', 'counter', 'Acquires that gave up after the acquire timeout'),
+    ('db_pool_recycled_total', 'recycled', 'counter', 'Connections closed for age or idleness'),
+    ('db_pool_failed_healthchecks_total', 'failedHealthchecks', 'counter', 'Idle connections that failed SELECT 1')
+]
+
+
+def _pool_samples() -> Iterator[Sample]:
+    for label, stats in pool_stats().items():
+        labels = {'pool': label}
+        for name, key, kind, help_text in _POOL_METRICS:
+            yield name, kind, help_text, labels, stats[key]
+        yield ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free connection',
+               labels, stats['waitTimeTotalMs'] / 1000)
+        yield ('db_pool_wait_seconds_max', 'gauge', 'Longest wait for a free connection',
+               labels, stats['waitTimeMaxMs'] / 1000)
+
+
+register_collector(_pool_samples)
@@ -1,16 +1,25 @@
 import json
 import os
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import random
 import string
 
+from cache import get_cache, list_version
+from db_pool import get_pool, pool_stats
+from ports import PortsExhausted, allocate_server_ports, assign_ports
+from scheduler import NoCapacity, choose_host
+from profiles import UnknownProfile, profile_json, resource_profile
+from tracing import json_dumps, traced
+
+PLAYER_SNAPSHOT_MAX_AGE = int(os.environ.get('PLAYER_SNAPSHOT_MAX_AGE', '120'))
+
+@traced('servers')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
-    Business: Управление Minecraft серверами (создание, получение списка, управление)
-    Args: event с httpMethod, body, queryStringParameters
-    Returns: HTTP response с данными серверов
+    Business: Управление Minecraft серверами (создание, получение списка с кэшем и ETag, управление)
+    Args: event с httpMethod, body, queryStringParameters (view=cache — счётчики кэша и пула БД, view=prometheus — метрики обработчика)
+    Returns: HTTP response с данными серверов или 304, если список не изменился
     """
     method: str = event.get('httpMethod', 'GET')
     
@@ -20,7 +29,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, If-None-Match, X-Trace',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -32,14 +41,23 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database URL not configured'}),
+            'body': json_dumps({'error': 'Database URL not configured'}),
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(database_url)
+    pool = get_pool(database_url)
+    conn = pool.acquire()
     
     try:
         if method == 'GET':
+            params = event.get('queryStringParameters') or {}
+            if params.get('view') == 'cache':
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                    'body': json_dumps({'cache': get_cache().stats(), 'pool': pool_stats()}),
+                    'isBase64Encoded': False
+                }
             return get_servers(event, conn)
         elif method == 'POST':
             return create_server(event, conn)
@@ -49,42 +67,79 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             return {
                 'statusCode': 405,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}),
+                'body': json_dumps({'error': 'Method not allowed'}),
                 'isBase64Encoded': False
             }
     finally:
-        conn.close()
+        pool.release(conn)
 
 def get_servers(event: Dict[str, Any], conn) -> Dict[str, Any]:
-    """Получить список серверов пользователя"""
+    """
+    Получить список серверов пользователя; онлайн берётся из снимка опроса без обращения к серверам.
+    Смена онлайна увеличивает версию списка (V0019), поэтому кэш и ETag не отдают устаревшее число игроков.
+    """
     headers = event.get('headers', {})
     user_id = headers.get('X-User-Id', 'demo-user')
     
+    cache = get_cache()
+    
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute(
-            "SELECT id, name, server_ip, edition, version, max_players, status, port, created_at "
-            "FROM servers WHERE user_id = %s ORDER BY created_at DESC",
-            (user_id,)
-        )
-        servers = cur.fetchall()
+        # Версию читаем до списка: запись между запросами даст промах, а не устаревший ответ
+        version = list_version(cur, user_id)
+        entry = cache.get(user_id, version)
         
-        result = []
-        for server in servers:
-            result.append({
-                'id': str(server['id']),
-                'name': server['name'],
-                'ip': server['server_ip'],
-                'edition': server['edition'],
-                'version': server['version'],
-                'status': server['status'],
-                'players': {'current': 0, 'max': server['max_players']},
-                'port': server['port']
-            })
+        if entry is None:
+            cur.execute(
+                "SELECT s.id, s.name, s.server_ip, s.edition, s.version, s.max_players, s.status, s.port, s.created_at, "
+                "p.players_online, p.latency_ms FROM servers s "
+                "LEFT JOIN server_player_snapshots p ON p.server_id = s.id AND p.reachable "
+                "AND p.polled_at > CURRENT_TIMESTAMP - make_interval(secs => %s) "
+                "WHERE s.user_id = %s ORDER BY s.created_at DESC",
+                (PLAYER_SNAPSHOT_MAX_AGE, user_id)
+            )
+            servers = cur.fetchall()
+            
+            result = []
+            for server in servers:
+                players_online = server['players_online'] if server['status'] == 'online' else None
+                result.append({
+                    'id': str(server['id']),
+                    'name': server['name'],
+                    'ip': server['server_ip'],
+                    'edition': server['edition'],
+                    'version': server['version'],
+                    'status': server['status'],
+                    'players': {'current': players_online or 0, 'max': server['max_players']},
+                    'latencyMs': server['latency_ms'],
+                    'port': server['port']
+                })
+            entry = cache.put(user_id, version, json_dumps({'servers': result}))
+            cache_status = 'MISS'
+        else:
+            cache_status = 'HIT'
+    conn.commit()
     
+    response_headers = {
+        'ETag': entry.etag,
+        'X-Cache': cache_status,
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'ETag, X-Cache'
+    }
+    
+    if etag_matches(event, entry.etag):
+        cache.record_not_modified()
+        return {
+            'statusCode': 304,
+            'headers': response_headers,
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    response_headers['Content-Type'] = 'application/json'
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'servers': result}),
+        'headers': response_headers,
+        'body': entry.body,
         'isBase64Encoded': False
     }
 
@@ -104,22 +159,49 @@ def create_server(event: Dict[str, Any], conn) -> Dict[str, Any]:
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Name and IP are required'}),
+            'body': json_dumps({'error': 'Name and IP are required'}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        resources = resource_profile(edition, max_players, body_data.get('profile'), body_data.get('jvmGc'))
+    except UnknownProfile as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json_dumps({'error': str(e)}),
             'isBase64Encoded': False
         }
     
-    port = random.randint(25565, 35565)
-    rcon_port = port + 10000
     rcon_password = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
     
     with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        try:
+            host = choose_host(cur, resources['memory_mb'], resources['cpus'], body_data.get('placement'))
+            port, rcon_port = allocate_server_ports(cur, docker_host=host['name'])
+        except (NoCapacity, PortsExhausted) as e:
+            conn.rollback()
+            return {
+                'statusCode': 503,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'body': json_dumps({'error': str(e)}),
+                'isBase64Encoded': False
+            }
+        
         cur.execute(
-            "INSERT INTO servers (user_id, name, server_ip, edition, version, max_players, port, rcon_port, rcon_password) "
-            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id, name, server_ip, edition, version, max_players, status, port",
-            (user_id, name, server_ip, edition, version, max_players, port, rcon_port, rcon_password)
+            "INSERT INTO servers (user_id, name, server_ip, edition, version, max_players, port, rcon_port, rcon_password, "
+            "docker_host_id, memory_mb, cpus, cpu_limit, resource_profile, heap_mb, jvm_gc, view_distance, "
+            "simulation_distance) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) "
+            "RETURNING id, name, server_ip, edition, version, max_players, status, port",
+            (user_id, name, server_ip, edition, version, max_players, port, rcon_port, rcon_password,
+             host['id'], resources['memory_mb'], resources['cpus'], resources['cpu_limit'], resources['resource_profile'],
+             resources['heap_mb'], resources['jvm_gc'], resources['view_distance'], resources['simulation_distance'])
         )
         server = cur.fetchone()
         
+        assign_ports(cur, [port, rcon_port], server['id'], host['name'])
+        
         cur.execute(
             "INSERT INTO server_settings (server_id, motd) VALUES (%s, %s)",
             (server['id'], f'Welcome to {name}!')
@@ -131,6 +213,7 @@ def create_server(event: Dict[str, Any], conn) -> Dict[str, Any]:
         )
         
         conn.commit()
+        get_cache().invalidate(user_id)
         
         result = {
             'id': str(server['id']),
@@ -140,13 +223,15 @@ def create_server(event: Dict[str, Any], conn) -> Dict[str, Any]:
             'version': server['version'],
             'status': server['status'],
             'players': {'current': 0, 'max': server['max_players']},
-            'port': server['port']
+            'port': server['port'],
+            'dockerHost': host['name'],
+            'resources': profile_json(resources)
         }
     
     return {
         'statusCode': 201,
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'server': result}),
+        'body': json_dumps({'server': result}),
         'isBase64Encoded': False
     }
 
@@ -160,7 +245,7 @@ def update_server(event: Dict[str, Any], conn) -> Dict[str, Any]:
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Server ID and action are required'}),
+            'body': json_dumps({'error': 'Server ID and action are required'}),
             'isBase64Encoded': False
         }
     
@@ -174,9 +259,10 @@ def update_server(event: Dict[str, Any], conn) -> Dict[str, Any]:
     
     with conn.cursor() as cur:
         cur.execute(
-            "UPDATE servers SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+            "UPDATE servers SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING user_id",
             (new_status, server_id)
         )
+        updated = cur.fetchone()
         
         cur.execute(
             "INSERT INTO server_logs (server_id, log_type, message) VALUES (%s, %s, %s)",
@@ -185,9 +271,29 @@ def update_server(event: Dict[str, Any], conn) -> Dict[str, Any]:
         
         conn.commit()
     
+    if updated:
+        get_cache().invalidate(updated[0])
+    
     return {
         'statusCode': 200,
         'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'status': new_status, 'action': action}),
+        'body': json_dumps({'status': new_status, 'action': action}),
         'isBase64Encoded': False
     }
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    """Значение заголовка без учёта регистра имени"""
+    headers = event.get('headers', {}) or {}
+    lowered = name.lower()
+    for key, value in headers.items():
+        if key.lower() == lowered:
+            return value
+    return None
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    """Проверить заголовок If-None-Match"""
+    value = get_header(event, 'If-None-Match')
+    if not value:
+        return False
+    candidates = [v.strip() for v in value.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates or '*' in candidates
@@ -0,0 +1,93 @@
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+DEFAULT_JVM_GC = os.environ.get('DEFAULT_JVM_GC', 'aikar')
+JVM_GC_OPTIONS = ('aikar', 'default')
+
+# Доля памяти сверх кучи: metaspace, стеки потоков, direct-буферы Netty. Без запаса cgroup
+# убивает JVM (OOM kill) раньше, чем та успеет собрать мусор.
+JVM_OVERHEAD_RATIO = 0.25
+JVM_MIN_OVERHEAD_MB = 512
+MEMORY_STEP_MB = 256
+
+# (профиль, до скольких игроков, куча Java МБ, память Bedrock МБ, предел CPU, резерв CPU,
+#  view/simulation distance Java, view/tick distance Bedrock); чем больше игроков, тем меньше дальность.
+# Предел — NanoCpus контейнера, резерв — доля в планировщике и CpuShares: небольшой сервер почти всё
+# время простаивает и занимает ядро лишь на всплесках (генерация чанков), поэтому ядро хоста делят несколько.
+PROFILES: List[Tuple[str, Optional[int], int, int, float, float, int, int, int, int]] = [
+    ('small', 10, 1024, 1024, 1.0, 0.25, 10, 8, 32, 4),
+    ('medium', 20, 2048, 1536, 1.0, 0.5, 10, 8, 32, 4),
+    ('large', 50, 4096, 2048, 2.0, 1.0, 8, 6, 24, 4),
+    ('xlarge', 100, 6144, 3072, 3.0, 2.0, 7, 5, 16, 4),
+    ('huge', None, 8192, 4096, 4.0, 3.0, 6, 4, 12, 4)
+]
+PROFILE_NAMES = tuple(profile[0] for profile in PROFILES)
+DEFAULT_PROFILE = 'medium'
+
+
+class UnknownProfile(Exception):
+    """Профиль не из PROFILE_NAMES или неизвестный сборщик мусора"""
+
+
+def memory_limit_mb(heap_mb: int) -> int:
+    """Лимит cgroup для JVM: куча плюс max(512 МБ, 25%), с округлением вверх до 256 МБ"""
+    limit = heap_mb + max(JVM_MIN_OVERHEAD_MB, int(heap_mb * JVM_OVERHEAD_RATIO))
+    return -(-limit // MEMORY_STEP_MB) * MEMORY_STEP_MB
+
+
+def profile_name_for(max_players: int) -> str:
+    for name, players, *_ in PROFILES:
+        if players is None or max_players <= players:
+            return name
+    return PROFILES[-1][0]
+
+
+def resource_profile(edition: str, max_players: int, name: Optional[str] = None,
+                     jvm_gc: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ресурсы сервера по числу игроков или явному профилю; ключи совпадают с колонками servers.
+    cpus — резерв CPU на хосте, cpu_limit — предел контейнера.
+    У Bedrock нет JVM: heap_mb и jvm_gc равны None, memory_mb — сразу лимит контейнера.
+    """
+    name = name or profile_name_for(max_players)
+    if name not in PROFILE_NAMES:
+        raise UnknownProfile(f'Unknown profile {name}, expected one of {", ".join(PROFILE_NAMES)}')
+    jvm_gc = jvm_gc or DEFAULT_JVM_GC
+    if jvm_gc not in JVM_GC_OPTIONS:
+        raise UnknownProfile(f'Unknown GC {jvm_gc}, expected one of {", ".join(JVM_GC_OPTIONS)}')
+
+    _, _, heap_mb, bedrock_mb, cpu_limit, cpus, view, simulation, bedrock_view, tick = PROFILES[PROFILE_NAMES.index(name)]
+    if edition == 'java':
+        return {
+            'resource_profile': name,
+            'heap_mb': heap_mb,
+            'memory_mb': memory_limit_mb(heap_mb),
+            'cpus': cpus,
+            'cpu_limit': cpu_limit,
+            'jvm_gc': jvm_gc,
+            'view_distance': view,
+            'simulation_distance': simulation
+        }
+    return {
+        'resource_profile': name,
+        'heap_mb': None,
+        'memory_mb': bedrock_mb,
+        'cpus': cpus,
+        'cpu_limit': cpu_limit,
+        'jvm_gc': None,
+        'view_distance': bedrock_view,
+        'simulation_distance': tick
+    }
+
+
+def profile_json(resources: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'profile': resources.get('resource_profile'),
+        'heapMb': resources.get('heap_mb'),
+        'memoryMb': resources.get('memory_mb'),
+        'cpus': float(resources['cpus']) if resources.get('cpus') is not None else None,
+        'cpuLimit': float(resources['cpu_limit']) if resources.get('cpu_limit') is not None else None,
+        'jvmGc': resources.get('jvm_gc'),
+        'viewDistance': resources.get('view_distance'),
+        'simulationDistance': resources.get('simulation_distance')
+    }
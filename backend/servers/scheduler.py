@@ -0,0 +1,111 @@
+import os
+from typing import Dict, Any, List, Optional
+
+from ports import GAME_PORT_RANGE, RCON_PORT_RANGE, ensure_port_range
+
+SCHEDULER_STRATEGY = os.environ.get('SCHEDULER_STRATEGY', 'binpack')
+STRATEGIES = ('binpack', 'least-loaded')
+
+DEFAULT_MEMORY_MB = 2048
+DEFAULT_CPUS = 1.0
+
+HOST_CAPACITY_SQL = (
+    "SELECT h.id, h.name, h.memory_mb, h.cpus, "
+    "h.memory_mb - COALESCE(u.memory_mb, 0) AS free_memory_mb, "
+    "h.cpus - COALESCE(u.cpus, 0) AS free_cpus, "
+    "(SELECT COUNT(*) FROM port_allocations p "
+    " WHERE p.docker_host = h.name AND p.kind = 'game' AND NOT p.allocated) AS free_game_ports, "
+    "(SELECT COUNT(*) FROM port_allocations p "
+    " WHERE p.docker_host = h.name AND p.kind = 'rcon' AND NOT p.allocated) AS free_rcon_ports "
+    "FROM docker_hosts h "
+    "LEFT JOIN (SELECT docker_host_id, SUM(memory_mb) AS memory_mb, SUM(cpus) AS cpus "
+    "           FROM servers GROUP BY docker_host_id) u ON u.docker_host_id = h.id "
+    "WHERE h.enabled"
+)
+
+
+class NoCapacity(Exception):
+    """Ни на одном Docker хосте не хватает памяти, CPU или портов"""
+
+
+def fits(host: Dict[str, Any], memory_mb: int, cpus: float) -> bool:
+    return (
+        host['free_memory_mb'] >= memory_mb
+        and float(host['free_cpus']) >= cpus
+        and host['free_game_ports'] > 0
+        and host['free_rcon_ports'] > 0
+    )
+
+
+def rank_hosts(hosts: List[Dict[str, Any]], memory_mb: int, cpus: float,
+               strategy: str = SCHEDULER_STRATEGY) -> List[Dict[str, Any]]:
+    """
+    Подходящие хосты в порядке предпочтения.
+    binpack — самый заполненный из подходящих (меньше всего свободной памяти после размещения),
+    чтобы держать остальные хосты свободными под крупные серверы;
+    least-loaded — с наибольшей долей свободной памяти, чтобы размазать нагрузку.
+    """
+    candidates = [host for host in hosts if fits(host, memory_mb, cpus)]
+    if strategy == 'least-loaded':
+        candidates.sort(key=lambda h: (-(h['free_memory_mb'] / h['memory_mb']), -float(h['free_cpus']), h['id']))
+    else:
+        candidates.sort(key=lambda h: (h['free_memory_mb'] - memory_mb, float(h['free_cpus']), h['id']))
+    return candidates
+
+
+def choose_host(cur, memory_mb: int = DEFAULT_MEMORY_MB, cpus: float = DEFAULT_CPUS,
+                strategy: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Выбрать хост и заблокировать его строку до конца транзакции: параллельные размещения
+    на тот же хост ждут и пересчитывают остаток, поэтому хост не переподписывается.
+    """
+    strategy = strategy if strategy in STRATEGIES else SCHEDULER_STRATEGY
+
+    cur.execute(HOST_CAPACITY_SQL)
+    hosts = [dict(row) for row in cur.fetchall()]
+
+    for host in rank_hosts(hosts, memory_mb, cpus, strategy):
+        cur.execute("SELECT id FROM docker_hosts WHERE id = %s AND enabled FOR UPDATE", (host['id'],))
+        if cur.fetchone() is None:
+            continue
+        cur.execute(HOST_CAPACITY_SQL + " AND h.id = %s", (host['id'],))
+        fresh = cur.fetchone()
+        if fresh is not None and fits(dict(fresh), memory_mb, cpus):
+            return dict(fresh)
+
+    raise NoCapacity(f'No Docker host can fit {memory_mb} MB / {cpus} CPU')
+
+
+def can_grow(cur, host_id: Optional[int], memory_mb: int, cpus: float) -> bool:
+    """
+    Хватит ли на хосте сервера ещё memory_mb и cpus (рост профиля). Строка хоста блокируется
+    до конца транзакции, как в choose_host; выключенный хост не принимает и рост.
+    """
+    cur.execute("SELECT id FROM docker_hosts WHERE id = %s AND enabled FOR UPDATE", (host_id,))
+    if cur.fetchone() is None:
+        return False
+    cur.execute(HOST_CAPACITY_SQL + " AND h.id = %s", (host_id,))
+    host = cur.fetchone()
+    return host is not None and host['free_memory_mb'] >= memory_mb and float(host['free_cpus']) >= cpus
+
+
+def list_hosts(cur) -> List[Dict[str, Any]]:
+    """Включённые хосты с остатком памяти, CPU и портов"""
+    cur.execute(HOST_CAPACITY_SQL + " ORDER BY h.id")
+    return [dict(row) for row in cur.fetchall()]
+
+
+def register_host(cur, name: str, url: Optional[str], memory_mb: int, cpus: float,
+                  enabled: bool = True) -> Dict[str, Any]:
+    """Добавить или обновить Docker хост и завести для него диапазоны портов"""
+    cur.execute(
+        "INSERT INTO docker_hosts (name, url, memory_mb, cpus, enabled) VALUES (%s, %s, %s, %s, %s) "
+        "ON CONFLICT (name) DO UPDATE SET url = EXCLUDED.url, memory_mb = EXCLUDED.memory_mb, "
+        "cpus = EXCLUDED.cpus, enabled = EXCLUDED.enabled, updated_at = CURRENT_TIMESTAMP "
+        "RETURNING id, name, url, memory_mb, cpus, enabled",
+        (name, url, memory_mb, cpus, enabled)
+    )
+    host = cur.fetchone()
+    ensure_port_range(cur, name, 'game', *GAME_PORT_RANGE)
+    ensure_port_range(cur, name, 'rcon', *RCON_PORT_RANGE)
+    return dict(host)
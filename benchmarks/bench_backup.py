@@ -0,0 +1,177 @@
+"""
+Бэкапы миров: пропускная способность снимка /data через archive API заглушки Docker в хранилище
+кусков, коэффициент дедупликации второго бэкапа после правки части чанков против дедупликации
+целыми файлами и кусками фиксированного размера, затем восстановление и побайтовая сверка.
+
+    python benchmarks/bench_backup.py [регионов] [доля изменённых чанков]
+"""
+import hashlib
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backup import restore_into, snapshot_container  # noqa: E402
+from chunk_store import ChunkStore, fixed_pieces  # noqa: E402
+from docker_client import get_client, run  # noqa: E402
+from stub_docker import StubDockerServer  # noqa: E402
+
+SECTOR = 4096
+CHUNKS_PER_REGION = 1024
+
+
+def make_chunk(rng: random.Random) -> bytes:
+    """Чанк как в регионе: длина, тип сжатия 2 (zlib), сжатые данные. Блоки из небольшой палитры сжимаются как настоящие"""
+    palette = bytes(rng.randrange(256) for _ in range(16))
+    # Случайные байты через таблицу с перекосом к первым блокам палитры (камень, воздух)
+    table = bytes(palette[min(15, int(rng.expovariate(0.6)))] for _ in range(256))
+    blocks = rng.randbytes(rng.randrange(8192, 24576)).translate(table)
+    payload = b'\x02' + zlib.compress(blocks, 6)
+    return struct.pack('>I', len(payload)) + payload
+
+
+def build_region(chunks: List[bytes], timestamps: List[int]) -> bytes:
+    """Файл Anvil: таблица положений, метки времени, чанки по секторам с выравниванием"""
+    locations = bytearray(SECTOR)
+    body = bytearray()
+    sector = 2
+    for index, chunk in enumerate(chunks):
+        count = -(-len(chunk) // SECTOR)
+        struct.pack_into('>I', locations, index * 4, (sector << 8) | count)
+        body += chunk + b'\0' * (count * SECTOR - len(chunk))
+        sector += count
+    return bytes(locations) + struct.pack(f'>{CHUNKS_PER_REGION}I', *timestamps) + bytes(body)
+
+
+def make_region(rng: random.Random, chunk_count: int = CHUNKS_PER_REGION) -> bytes:
+    chunks = [make_chunk(rng) for _ in range(chunk_count)]
+    return build_region(chunks, [1_700_000_000] * chunk_count + [0] * (CHUNKS_PER_REGION - chunk_count))
+
+
+def make_world(rng: random.Random, regions: int) -> Dict[str, bytes]:
+    world = {
+        'server.properties': b'motd=bench\nmax-players=20\n',
+        'world/level.dat': zlib.compress(os.urandom(2048)),
+        'logs/latest.log': b'[Server thread/INFO]: Done\n' * 5000,
+        'minecraft_server.jar': os.urandom(512 * 1024)
+    }
+    for index in range(regions):
+        x, z = index % 4 - 2, index // 4 - 2
+        world[f'world/region/r.{x}.{z}.mca'] = make_region(rng)
+        world[f'world/entities/r.{x}.{z}.mca'] = make_region(rng, 64)
+    for index in range(20):
+        world[f'world/playerdata/{index:08x}-0000-0000-0000-000000000000.dat'] = zlib.compress(os.urandom(1024))
+    return world
+
+
+def mutate(rng: random.Random, world: Dict[str, bytes], fraction: float) -> int:
+    """
+    Переписать долю чанков, как это делает сервер: чанк, который влез в свои секторы, пишется на место,
+    выросший — в конец файла; меняется метка времени в заголовке. Возвращает число изменённых чанков.
+    """
+    changed = 0
+    for path in [p for p in world if p.startswith('world/region/')]:
+        data = bytearray(world[path])
+        for index in rng.sample(range(CHUNKS_PER_REGION), int(CHUNKS_PER_REGION * fraction)):
+            (entry,) = struct.unpack_from('>I', data, index * 4)
+            sector, count = entry >> 8, entry & 0xff
+            chunk = make_chunk(rng)
+            needed = -(-len(chunk) // SECTOR)
+            if needed > count:
+                sector, count = len(data) // SECTOR, needed
+                data += b'\0' * (needed * SECTOR)
+            padded = chunk + b'\0' * (count * SECTOR - len(chunk))
+            data[sector * SECTOR:(sector + count) * SECTOR] = padded
+            struct.pack_into('>I', data, index * 4, (sector << 8) | count)
+            (stamp,) = struct.unpack_from('>I', data, SECTOR + index * 4)
+            struct.pack_into('>I', data, SECTOR + index * 4, stamp + 600)
+            changed += 1
+        world[path] = bytes(data)
+    world['world/level.dat'] = zlib.compress(os.urandom(2048))
+    return changed
+
+
+def fixed_new_bytes(before: Dict[str, bytes], after: Dict[str, bytes], chunk_size: int) -> int:
+    """Сколько байт было бы новыми при кусках фиксированного размера (или целых файлах, если chunk_size=0)"""
+    def keys(data: bytes) -> List[str]:
+        pieces = fixed_pieces(len(data), chunk_size or max(len(data), 1))
+        return [hashlib.sha256(data[start:end]).hexdigest() for start, end in pieces]
+
+    seen = {key for data in before.values() for key in keys(data)}
+    total = 0
+    for data in after.values():
+        pieces = fixed_pieces(len(data), chunk_size or max(len(data), 1))
+        for (start, end), key in zip(pieces, keys(data)):
+            if key not in seen:
+                total += end - start
+                seen.add(key)
+    return total
+
+
+def main(argv: List[str]) -> None:
+    regions = int(argv[1]) if len(argv) > 1 else 16
+    fraction = float(argv[2]) if len(argv) > 2 else 0.05
+    rng = random.Random(11)
+    world = make_world(rng, regions)
+    backed_up = {path: data for path, data in world.items() if not path.startswith('logs/') and not path.endswith('.jar')}
+    total = sum(len(data) for data in backed_up.values())
+    print(f'world: {len(world)} files, {total / 2**20:.1f} MB in backup ({regions} regions x {CHUNKS_PER_REGION} chunks)')
+
+    stub = StubDockerServer().start()
+    client = get_client(stub.url)
+    root = tempfile.mkdtemp(prefix='bench-backup-')
+    store = ChunkStore(root)
+    try:
+        stub.add_container('minecraft-1', running=True, config={'HostConfig': {'Binds': ['minecraft-data-1:/data']}})
+        stub.add_files('minecraft-1', world)
+
+        started = time.perf_counter()
+        first = run(snapshot_container(client, 'minecraft-1', store))
+        elapsed = time.perf_counter() - started
+        stats = first.stats
+        print(f'full backup:        {elapsed * 1000:7.0f} ms  {stats["bytes"] / 2**20 / elapsed:6.1f} MB/s  '
+              f'chunks={stats["chunks"]} stored={stats["storedBytes"] / 2**20:.1f} MB '
+              f'(compression {stats["bytes"] / stats["storedBytes"]:.2f}x) excluded={stats["excluded"]}')
+
+        before = dict(backed_up)
+        changed = mutate(rng, world, fraction)
+        stub.add_files('minecraft-1', world)
+        after = {path: world[path] for path in backed_up}
+
+        started = time.perf_counter()
+        second = run(snapshot_container(client, 'minecraft-1', store))
+        elapsed = time.perf_counter() - started
+        stats = second.stats
+        print(f'incremental backup: {elapsed * 1000:7.0f} ms  {stats["bytes"] / 2**20 / elapsed:6.1f} MB/s  '
+              f'{changed} chunks changed ({fraction:.0%}), new={stats["newBytes"] / 2**20:.2f} MB '
+              f'stored={stats["storedBytes"] / 2**20:.2f} MB dedup={stats["bytes"] / max(stats["newBytes"], 1):.1f}x')
+        for label, chunk_size in (('whole files', 0), ('fixed 1 MiB', 1024 * 1024), ('fixed 64 KiB', 65536)):
+            new = fixed_new_bytes(before, after, chunk_size)
+            print(f'  {label:12s} would add {new / 2**20:7.2f} MB (dedup {total / max(new, 1):.1f}x)')
+
+        stub.add_container('restored', config={'HostConfig': {'Binds': ['minecraft-data-2:/data']}})
+        started = time.perf_counter()
+        written = run(restore_into(client, 'restored', store, second.manifest()))
+        elapsed = time.perf_counter() - started
+        restored = stub.find('restored')['Data']
+        exact = restored == after
+        print(f'restore:            {elapsed * 1000:7.0f} ms  {written / 2**20 / elapsed:6.1f} MB/s  '
+              f'byte-exact={exact}')
+        if not exact:
+            sys.exit(1)
+    finally:
+        stub.stop()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,54 @@
+"""
+Бенчмарк статусов контейнеров: N запросов /containers/{name}/json против одного листинга.
+Запуск: python benchmarks/bench_container_status.py [число серверов] [задержка Docker API, мс]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import index  # noqa: E402
+from reconcile import list_minecraft_containers  # noqa: E402
+from stub_docker import StubDockerServer  # noqa: E402
+
+
+def main() -> None:
+    servers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    stub = StubDockerServer(latency=latency_ms / 1000).start()
+    for server_id in range(1, servers + 1):
+        stub.add_container(f'minecraft-{server_id}', running=server_id % 3 != 0)
+    # Посторонние контейнеры, которые тоже попадут под фильтр подстроки
+    stub.add_container('not-minecraft-1', running=True)
+
+    try:
+        stub.requests = 0
+        started = time.perf_counter()
+        for server_id in range(1, servers + 1):
+            index.run(index.get_client(stub.url).inspect_container(f'minecraft-{server_id}', timeout=10))
+        single_elapsed = time.perf_counter() - started
+        single_requests = stub.requests
+
+        stub.requests = 0
+        started = time.perf_counter()
+        containers = list_minecraft_containers(stub.url)
+        bulk_elapsed = time.perf_counter() - started
+        bulk_requests = stub.requests
+
+        assert len(containers) == servers, len(containers)
+    finally:
+        stub.stop()
+
+    print(f'servers={servers} docker_latency={latency_ms}ms')
+    print(f'per-server inspect: {single_requests} docker calls, {single_elapsed * 1000:.1f} ms total, '
+          f'{single_elapsed * 1000 / servers:.3f} ms/server')
+    print(f'bulk listing:       {bulk_requests} docker calls, {bulk_elapsed * 1000:.1f} ms total, '
+          f'{bulk_elapsed * 1000 / servers:.3f} ms/server')
+
+
+if __name__ == '__main__':
+    main()
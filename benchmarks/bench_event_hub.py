@@ -0,0 +1,73 @@
+"""
+Раздача уведомлений ожидающим long-poll запросам одного процесса: тысячи ожидающих,
+уведомления адресованы одному пользователю. Проверяет, что просыпаются только его запросы,
+и меряет задержку пробуждения. Вместо соединения LISTEN уведомления подаются напрямую.
+
+    python benchmarks/bench_event_hub.py [ожидающих] [пользователей] [уведомлений]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'server-logs'))
+
+from events import EventHub  # noqa: E402
+
+
+def main() -> None:
+    waiters = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    notifications = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    hub = EventHub('')
+    hub._ensure_started = lambda: None
+    wakeups = [0] * users
+    latencies = []
+    sent_at = {}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def waiter(user_index: int) -> None:
+        user_id = f'user-{user_index}'
+        seen = hub.snapshot(user_id)
+        while not stop.is_set():
+            current = hub.wait(user_id, seen, 0.5)
+            if current != seen:
+                woke = time.perf_counter()
+                with lock:
+                    wakeups[user_index] += 1
+                    if user_id in sent_at:
+                        latencies.append(woke - sent_at[user_id])
+                seen = current
+
+    threads = [threading.Thread(target=waiter, args=(index % users,), daemon=True) for index in range(waiters)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+
+    for index in range(notifications):
+        user_id = f'user-{index % users}'
+        sent_at[user_id] = time.perf_counter()
+        hub._wake([user_id])
+        time.sleep(0.01)
+    time.sleep(0.5)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    per_user = waiters // users
+    targeted = {index % users for index in range(notifications)}
+    for index, count in enumerate(wakeups):
+        expected = per_user * sum(1 for n in range(notifications) if n % users == index)
+        assert count == expected, (index, count, expected)
+
+    print(f'{waiters} waiting requests for {users} users, {notifications} notifications to {len(targeted)} users')
+    print(f'  wakeups: {sum(wakeups)} (only addressed requests; broadcast would wake {waiters * notifications})')
+    print(f'  wake latency p50 {statistics.median(latencies) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
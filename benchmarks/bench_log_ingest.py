@@ -0,0 +1,134 @@
+"""
+Чтение логов контейнеров: скорость разбора мультиплексированного потока и сквозной прогон
+по заглушке Docker, где один сервер пишет в сотни раз больше остальных. Запись в БД заменена
+хранилищем в памяти с задержкой на строку, как у COPY.
+
+    python benchmarks/bench_log_ingest.py [тихих серверов] [строк у шумного] [мкс на строку при записи]
+"""
+import asyncio
+import os
+import struct
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_docker import StubDockerServer  # noqa: E402
+from log_ingest import LineEncoder, LogBatcher, LogDemuxer, LogIngester  # noqa: E402
+
+QUIET_LINES = 2000
+SAMPLE_LINES = [
+    (1, '[10:00:00] [Server thread/INFO]: Player{index} joined the game'),
+    (1, '[10:00:01 WARN]: Can\'t keep up! Is the server overloaded? Running {index}ms behind'),
+    (1, '[10:00:02] [Server thread/INFO]: <Player{index}> hello\tworld \\o/'),
+    (2, 'Exception in thread "main" java.lang.IllegalStateException: {index}'),
+    (1, '\x1b[0;32m[init] Running as uid=1000 gid=1000 with /data as \'drwxrwxr-x\' {index}\x1b[m'),
+]
+
+
+def synthetic_stream(count: int) -> bytes:
+    frames = []
+    for index in range(count):
+        stream, template = SAMPLE_LINES[index % len(SAMPLE_LINES)]
+        seconds, nanos = divmod(1714557600_000000000 + index * 1000, 1_000_000_000)
+        line = f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos:09d}Z {template.format(index=index)}\n"
+        data = line.encode('utf-8')
+        frames.append(struct.pack('>B3xI', stream, len(data)) + data)
+    return b''.join(frames)
+
+
+def parse_throughput(count: int = 200000) -> float:
+    data = synthetic_stream(count)
+    demuxer = LogDemuxer()
+    encoder = LineEncoder(1, 0)
+    started = time.perf_counter()
+    rows = 0
+    for offset in range(0, len(data), 65536):
+        rows += len(encoder.encode(demuxer.feed(data[offset:offset + 65536])))
+    elapsed = time.perf_counter() - started
+    assert rows == count, rows
+    return count / elapsed
+
+
+class MemoryLogStore:
+    """Хранилище вместо PostgresLogStore: курсоры и строки в памяти, запись стоит cost секунд на строку"""
+
+    def __init__(self, targets: List[Tuple[int, str]], cost: float) -> None:
+        self._targets = targets
+        self.cost = cost
+        self.rows: Dict[int, List[str]] = {}
+        self.saved_cursors: Dict[int, int] = {}
+        self.completed_at: Dict[int, float] = {}
+        self.expected: Dict[int, int] = {}
+        self.started = time.perf_counter()
+
+    def targets(self) -> List[Tuple[int, str]]:
+        return self._targets
+
+    def cursors(self, server_ids: List[int]) -> Dict[int, int]:
+        return {server_id: self.saved_cursors[server_id] for server_id in server_ids if server_id in self.saved_cursors}
+
+    def write(self, rows: List[str], cursors: Dict[int, int]) -> None:
+        time.sleep(len(rows) * self.cost)
+        for row in rows:
+            server_id = int(row[:row.index('\t')])
+            self.rows.setdefault(server_id, []).append(row)
+        for server_id, cursor in cursors.items():
+            self.saved_cursors[server_id] = max(cursor, self.saved_cursors.get(server_id, 0))
+            if len(self.rows.get(server_id, [])) >= self.expected.get(server_id, 0):
+                self.completed_at.setdefault(server_id, time.perf_counter() - self.started)
+
+
+def main() -> None:
+    quiet = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    noisy_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 300000
+    cost_us = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    print(f'demux + parse: {parse_throughput():,.0f} lines/s')
+
+    stub = StubDockerServer().start()
+    try:
+        targets = []
+        for server_id in range(1, quiet + 2):
+            stub.add_container(f'minecraft-{server_id}', running=True)
+            count = noisy_lines if server_id == 1 else QUIET_LINES
+            stub.add_logs(f'minecraft-{server_id}', (
+                (1, f'[10:00:00] [Server thread/INFO]: server {server_id} line {index}') for index in range(count)
+            ))
+            targets.append((server_id, stub.url))
+
+        store = MemoryLogStore(targets, cost_us / 1_000_000)
+        store.expected = {server_id: noisy_lines if server_id == 1 else QUIET_LINES for server_id, _ in targets}
+        ingester = LogIngester(store, LogBatcher(batch_lines=5000, max_pending=100000, server_max_pending=10000),
+                               flush_interval=0.2, backfill_seconds=3600)
+        started = time.perf_counter()
+        asyncio.run(ingester.run(follow=False))
+        elapsed = time.perf_counter() - started
+
+        total = noisy_lines + quiet * QUIET_LINES
+        for server_id, expected in store.expected.items():
+            rows = store.rows.get(server_id, [])
+            assert len(rows) == expected, (server_id, len(rows), expected)
+            numbers = [int(row.split('\t')[2].rsplit(' ', 1)[1]) for row in rows]
+            assert numbers == sorted(numbers), f'server {server_id} lines out of order'
+
+        # Повторный проход с сохранёнными курсорами не должен ничего дописать
+        again = LogIngester(store, flush_interval=0.2)
+        asyncio.run(again.run(follow=False))
+        assert again.flushed == 0, again.flushed
+    finally:
+        stub.stop()
+
+    quiet_done = max(store.completed_at[server_id] for server_id in store.expected if server_id != 1)
+    print(f'{quiet} quiet servers x {QUIET_LINES} lines + 1 noisy x {noisy_lines} lines, write cost {cost_us} us/line')
+    print(f'  ingested {total} lines in {elapsed:.2f} s ({total / elapsed:,.0f} lines/s), '
+          f'{ingester.flushes} COPY batches, {ingester.batcher.stalls} back-pressure stalls')
+    print(f'  all quiet servers flushed by {quiet_done:.2f} s, noisy server by {store.completed_at[1]:.2f} s')
+    print('  second pass from saved cursors: 0 duplicate lines')
+
+
+if __name__ == '__main__':
+    main()
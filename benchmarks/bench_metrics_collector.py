@@ -0,0 +1,63 @@
+"""
+Сборщик метрик на сотнях контейнеров: два цикла замеров по заглушкам Docker (второй даёт CPU),
+время цикла при ограниченном параллелизме и пик памяти Python во время сбора.
+
+    python benchmarks/bench_metrics_collector.py [контейнеров] [хостов] [задержка Docker API, мс] [параллелизм]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from docker_client import run  # noqa: E402
+from metrics import _cpu_previous, sample_servers  # noqa: E402
+from stub_docker import StubDockerServer  # noqa: E402
+
+
+def main() -> None:
+    containers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    host_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else 32
+
+    stubs = [StubDockerServer(latency=latency_ms / 1000).start() for _ in range(host_count)]
+    targets = []
+    for server_id in range(1, containers + 1):
+        stub = stubs[server_id % host_count]
+        stub.add_container(f'minecraft-{server_id}', running=True)
+        targets.append({'id': server_id, 'edition': 'java', 'docker_url': stub.url, 'address': '127.0.0.1',
+                        'rcon_port': None, 'rcon_password': None})
+
+    try:
+        run(sample_servers(targets, concurrency=concurrency, tps_command=None))
+        time.sleep(0.2)
+
+        started = time.perf_counter()
+        samples = run(sample_servers(targets, concurrency=concurrency, tps_command=None))
+        elapsed = time.perf_counter() - started
+
+        # Отдельный цикл под tracemalloc: трассировка сильно замедляет сбор и исказила бы время
+        tracemalloc.start()
+        run(sample_servers(targets, concurrency=concurrency, tps_command=None))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+    cpu_values = [cpu for _, cpu, _, _ in samples if cpu is not None]
+    assert len(cpu_values) == containers, len(cpu_values)
+    assert all(35 <= cpu <= 45 for cpu in cpu_values), (min(cpu_values), max(cpu_values))
+    assert len(_cpu_previous) == containers
+
+    print(f'containers={containers} hosts={host_count} docker_latency={latency_ms}ms concurrency={concurrency}')
+    print(f'cycle: {elapsed * 1000:.0f} ms ({containers * latency_ms / concurrency:.0f} ms lower bound), '
+          f'peak Python memory {peak / 1024:.0f} KiB, avg cpu {sum(cpu_values) / len(cpu_values):.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Опрос онлайна по фейковым серверам: Java и Bedrock, часть серверов молчит.
+Проверяет разбор ответов и что общее время ограничено таймаутом, а не числом молчащих серверов.
+
+    python benchmarks/bench_player_poller.py [серверов] [задержка ответа, мс] [параллелизм]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ping import FakePingServers  # noqa: E402
+from docker_client import run  # noqa: E402
+from player_query import poll_servers  # noqa: E402
+
+TIMEOUT = 0.5
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    fake = FakePingServers(latency=latency_ms / 1000).start()
+    try:
+        for index in range(count):
+            edition = 'bedrock' if index % 4 == 0 else 'java'
+            fake.add(edition, online=index % 17, max_players=20, motd=f'Server {index}', silent=index % 10 == 9)
+
+        started = time.perf_counter()
+        results = run(poll_servers(fake.targets(), concurrency=concurrency, timeout=TIMEOUT))
+        elapsed = time.perf_counter() - started
+    finally:
+        fake.stop()
+
+    for index, server in enumerate(fake.servers):
+        result = results[index]
+        if server['silent']:
+            assert result is None, index
+            continue
+        assert result is not None, index
+        assert (result['online'], result['max']) == (server['online'], server['max']), (index, result)
+        assert result['motd'].startswith(server['motd']), (index, result['motd'])
+
+    silent = sum(1 for server in fake.servers if server['silent'])
+    sequential = (count - silent) * latency_ms / 1000 + silent * TIMEOUT
+    print(f'servers={count} (silent={silent}) latency={latency_ms}ms concurrency={concurrency} timeout={TIMEOUT}s')
+    print(f'polled in {elapsed * 1000:.1f} ms; one-by-one would take at least {sequential * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Нагрузочная проверка реестра портов: параллельные выделения при заполненности диапазона 90%.
+Нужна база с применёнными миграциями; строки пишутся под отдельным docker_host и удаляются в конце.
+
+    DATABASE_URL=postgres://... python benchmarks/bench_port_allocator.py [потоки] [выделений на поток]
+"""
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+import psycopg2
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'servers'))
+
+from ports import PortsExhausted, allocate_port, ensure_port_range, release_ports  # noqa: E402
+
+RANGE_START = 20000
+RANGE_SIZE = 10000
+PREFILL = 0.9
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main() -> None:
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    database_url = os.environ['DATABASE_URL']
+    host = f'bench-{uuid.uuid4().hex[:8]}'
+
+    conn = psycopg2.connect(database_url)
+    with conn.cursor() as cur:
+        ensure_port_range(cur, host, 'game', RANGE_START, RANGE_START + RANGE_SIZE - 1)
+        cur.execute(
+            "UPDATE port_allocations SET allocated = true WHERE docker_host = %s AND port IN ("
+            "SELECT port FROM port_allocations WHERE docker_host = %s ORDER BY random() LIMIT %s)",
+            (host, host, int(RANGE_SIZE * PREFILL))
+        )
+    conn.commit()
+
+    allocated = []
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker() -> None:
+        local_conn = psycopg2.connect(database_url)
+        mine = []
+        try:
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                with local_conn.cursor() as cur:
+                    port = allocate_port(cur, 'game', docker_host=host)
+                local_conn.commit()
+                elapsed = time.perf_counter() - started
+                mine.append(port)
+                with lock:
+                    latencies.append(elapsed)
+                # Часть портов сразу освобождается, чтобы проверить их повторную выдачу
+                if random.random() < 0.2:
+                    with local_conn.cursor() as cur:
+                        release_ports(cur, [mine.pop()], docker_host=host)
+                    local_conn.commit()
+        except PortsExhausted as e:
+            with lock:
+                errors.append(str(e))
+        finally:
+            local_conn.close()
+            with lock:
+                allocated.extend(mine)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM port_allocations WHERE docker_host = %s", (host,))
+    conn.commit()
+    conn.close()
+
+    duplicates = len(allocated) - len(set(allocated))
+    print(f'threads={threads} allocations={len(latencies)} prefill={PREFILL:.0%} of {RANGE_SIZE} ports')
+    print(f'throughput: {len(latencies) / elapsed:.0f} allocations/s')
+    if latencies:
+        print(f'latency p50={percentile(latencies, 0.5) * 1000:.2f} ms p99={percentile(latencies, 0.99) * 1000:.2f} ms')
+    print(f'held ports: {len(allocated)}, duplicates: {duplicates}, exhausted: {len(errors)}')
+    if duplicates:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Профили ресурсов: сколько серверов и игроков помещается на хосты при фиксированных MEMORY=2G против профилей
+по max_players (с резервом CPU в долю ядра и с резервом, равным пределу), и сколько из них реально поместится
+в память (куча + память вне кучи); затем цена start с применением профиля (inspect, update, архив
+server.properties) против голого start на заглушке Docker. Завершается с кодом 1, если профили не дают выигрыша.
+
+    python benchmarks/bench_profiles.py [хостов] [серверов]
+"""
+import os
+import random
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from container_config import build_container_config  # noqa: E402
+from docker_client import get_client, run  # noqa: E402
+from profiles import PROFILES, memory_limit_mb, resource_profile  # noqa: E402
+from resources import start_with_profile  # noqa: E402
+from scheduler import rank_hosts  # noqa: E402
+from stub_docker import StubDockerServer  # noqa: E402
+
+HOST_MEMORY_MB = 65536
+# Хосты с 2 и 4 ГБ памяти на ядро: на первых резерв CPU ядро-в-ядро упирается раньше памяти
+HOST_SHAPES = (16, 32)
+# Большинство серверов — на пару друзей, крупные редки
+MAX_PLAYERS_WEIGHTS = [(5, 30), (10, 25), (20, 25), (50, 12), (100, 6), (200, 2)]
+
+
+def make_hosts(count: int, cpus: int) -> List[Dict[str, Any]]:
+    return [
+        {'id': host_id, 'name': f'host-{host_id}', 'memory_mb': HOST_MEMORY_MB, 'cpus': cpus,
+         'free_memory_mb': HOST_MEMORY_MB, 'free_cpus': cpus, 'free_game_ports': 1000, 'free_rcon_ports': 1000}
+        for host_id in range(1, count + 1)
+    ]
+
+
+def players_for_heap(heap_mb: int) -> int:
+    """Сколько игроков выдерживает куча: предел самого крупного профиля, чья куча не больше"""
+    served = [players or max(count for count, _ in MAX_PLAYERS_WEIGHTS)
+              for _, players, heap, *_ in PROFILES if heap <= heap_mb]
+    return max(served, default=0)
+
+
+def pack(hosts: List[Dict[str, Any]], servers: List[Tuple[int, float, int, int, int]]) -> Tuple[int, int, int, int]:
+    """
+    Разместить (резерв МБ, резерв CPU, реально нужно МБ, max_players, игроков по куче) binpack'ом; вернуть
+    (размещено, слотов игроков, слотов, которые куча реально выдержит, хостов, где реальная потребность
+    превышает память — кандидаты на OOM kill).
+    """
+    need: Dict[int, int] = {host['id']: 0 for host in hosts}
+    placed = slots = usable = 0
+    for reserve_mb, cpus, actual_mb, max_players, served in servers:
+        ranked = rank_hosts(hosts, reserve_mb, cpus, 'binpack')
+        if not ranked:
+            continue
+        host = ranked[0]
+        host['free_memory_mb'] -= reserve_mb
+        host['free_cpus'] -= cpus
+        need[host['id']] += actual_mb
+        placed += 1
+        slots += max_players
+        usable += min(max_players, served)
+    return placed, slots, usable, sum(1 for used in need.values() if used > HOST_MEMORY_MB)
+
+
+def main(argv: List[str]) -> None:
+    host_count = int(argv[1]) if len(argv) > 1 else 4
+    server_count = int(argv[2]) if len(argv) > 2 else 200
+    rng = random.Random(7)
+    players = rng.choices([p for p, _ in MAX_PLAYERS_WEIGHTS], [w for _, w in MAX_PLAYERS_WEIGHTS], k=server_count)
+
+    # Раньше резервировалось 2048 МБ и MEMORY=2G, но JVM занимает больше кучи;
+    # честный резерв для той же кучи — с запасом, как у лимита профиля. Куча 2G выдерживает
+    # столько игроков, сколько профиль medium, остальные слоты крупного сервера — только на бумаге
+    fixed_players = players_for_heap(2048)
+    fixed = [(2048, 1.0, memory_limit_mb(2048), count, fixed_players) for count in players]
+    fixed_safe = [(memory_limit_mb(2048), 1.0, memory_limit_mb(2048), count, fixed_players) for count in players]
+    profiled, profiled_full_cpu = [], []
+    for count in players:
+        resources = resource_profile('java', count)
+        memory_mb = resources['memory_mb']
+        profiled.append((memory_mb, resources['cpus'], memory_mb, count, count))
+        profiled_full_cpu.append((memory_mb, resources['cpu_limit'], memory_mb, count, count))
+
+    failures = []
+    fractional_placed = full_cpu_placed = 0
+    for host_cpus in HOST_SHAPES:
+        results = {}
+        for label, servers in (('fixed 2G', fixed), ('fixed safe', fixed_safe),
+                               ('profiles, CPU reserved = limit', profiled_full_cpu), ('profiles', profiled)):
+            placed, slots, usable, oom_hosts = pack(make_hosts(host_count, host_cpus), servers)
+            results[label] = (placed, usable, oom_hosts)
+            print(f'{host_count}x{HOST_MEMORY_MB // 1024}G/{host_cpus}CPU {label:30s} placed={placed}/{server_count} '
+                  f'player_slots={slots} usable_slots={usable} hosts_over_memory={oom_hosts}')
+        placed, usable, oom_hosts = results['profiles']
+        fractional_placed += placed
+        full_cpu_placed += results['profiles, CPU reserved = limit'][0]
+        if oom_hosts or usable <= results['fixed safe'][1]:
+            failures.append(f'usable slots on {host_cpus} CPU hosts')
+    if fractional_placed <= full_cpu_placed:
+        failures.append('placements from fractional CPU reservations')
+    small = sum(1 for count in players if count <= 10)
+    print(f'servers with <=10 players: {small} ({small * 100 // server_count}%), '
+          f'limit {resource_profile("java", 10)["memory_mb"]} MB instead of 2048 MB heap + overhead, '
+          f'{resource_profile("java", 10)["cpus"]} CPU reserved')
+    if failures:
+        print(f'FAIL: no gain in {", ".join(failures)}')
+        sys.exit(1)
+
+    stub = StubDockerServer(latency=0.002).start()
+    client = get_client(stub.url)
+    iterations = 200
+    server = {'id': 1, 'name': 'bench', 'edition': 'java', 'version': '1.20.1', 'port': 25565,
+              'max_players': 20, **resource_profile('java', 20)}
+    run(client.create_container('minecraft-1', build_container_config(server)))
+    try:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run(client.container_action('minecraft-1', 'stop'))
+            run(client.container_action('minecraft-1', 'start'))
+        plain = (time.perf_counter() - started) / iterations
+        started = time.perf_counter()
+        for _ in range(iterations):
+            run(start_with_profile(client, server, restart=True))
+        profiled_restart = (time.perf_counter() - started) / iterations
+    finally:
+        stub.stop()
+    print(f'restart: plain stop+start {plain * 1000:.1f} ms, with profile {profiled_restart * 1000:.1f} ms '
+          f'(+inspect, update, put_archive; Docker latency 2 ms)')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,83 @@
+"""
+RCON по фейковым серверам: новое соединение на каждую команду против пула,
+затем рассылка одной команды на много серверов через пул (p50/p99 по раундам).
+
+    python benchmarks/bench_rcon.py [серверов] [задержка рукопожатия, мс] [параллелизм]
+"""
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_rcon import FakeRconServers, respond  # noqa: E402
+from docker_client import run  # noqa: E402
+from rcon import RconError, rcon_command  # noqa: E402
+from rcon_pool import RconPool, broadcast  # noqa: E402
+
+COMMANDS = 200
+ROUNDS = 20
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    connect_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    parallelism = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    fake = FakeRconServers(latency=0.0005, connect_latency=connect_ms / 1000).start()
+    try:
+        for index in range(count):
+            fake.add(password=f'pw{index}', online=index % 20)
+        first = fake.servers[0]
+
+        started = time.perf_counter()
+        for _ in range(COMMANDS):
+            run(rcon_command('127.0.0.1', first['port'], first['password'], 'list'))
+        fresh = time.perf_counter() - started
+
+        pool = RconPool(max_per_server=2, idle_seconds=60)
+        first['connections'] = 0
+        started = time.perf_counter()
+        for _ in range(COMMANDS):
+            run(pool.command('127.0.0.1', first['port'], first['password'], 'list'))
+        pooled = time.perf_counter() - started
+        assert first['connections'] == 1, first['connections']
+
+        output = run(pool.command('127.0.0.1', first['port'], first['password'], 'help'))
+        assert output == respond(first, 'help'), 'multi-packet response was not reassembled'
+        try:
+            run(pool.command('127.0.0.1', first['port'], 'wrong', 'list'))
+            raise AssertionError('wrong password accepted')
+        except RconError:
+            pass
+
+        rounds = []
+        for round_index in range(ROUNDS):
+            started = time.perf_counter()
+            outcomes = run(broadcast(pool, fake.targets(), f'say round {round_index}', parallelism))
+            rounds.append(time.perf_counter() - started)
+            assert all(outcome == '' for outcome in outcomes), [o for o in outcomes if o != ''][:3]
+        connections = sum(server['connections'] for server in fake.servers)
+        pool.close_all()
+    finally:
+        fake.stop()
+
+    print(f'{COMMANDS} commands to one server (handshake {connect_ms} ms):')
+    print(f'  new connection each: {fresh * 1000:.1f} ms ({fresh / COMMANDS * 1000:.2f} ms/command)')
+    print(f'  pooled:              {pooled * 1000:.1f} ms ({pooled / COMMANDS * 1000:.2f} ms/command)')
+    print(f'broadcast to {count} servers, parallelism={parallelism}, {ROUNDS} rounds:')
+    print(f'  first round {rounds[0] * 1000:.1f} ms (connects), '
+          f'warm p50 {statistics.median(rounds[1:]) * 1000:.1f} ms, p99 {percentile(rounds[1:], 0.99) * 1000:.1f} ms')
+    print(f'  connections opened: {connections} for {count * ROUNDS} commands; pool {pool.stats()}')
+
+
+if __name__ == '__main__':
+    main()
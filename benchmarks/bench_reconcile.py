@@ -0,0 +1,81 @@
+"""
+Цикл сверки статусов на тысячах серверов: листинги заглушек Docker (по одному на хост)
+и сравнение со строками servers. Строки БД собираются в памяти с заданной долей дрейфа;
+запись поправок — это один UPDATE и один INSERT, здесь она не выполняется.
+
+    python benchmarks/bench_reconcile.py [серверов] [хостов] [задержка Docker API, мс]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_docker import StubDockerServer  # noqa: E402
+from reconcile import list_containers_on_hosts, plan_corrections  # noqa: E402
+
+
+def main() -> None:
+    servers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    host_count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 2.0
+
+    rng = random.Random(7)
+    stubs = [StubDockerServer(latency=latency_ms / 1000).start() for _ in range(host_count)]
+    rows = []
+    expected = {}
+    try:
+        for server_id in range(1, servers + 1):
+            stub = stubs[server_id % host_count]
+            roll = rng.random()
+            if roll < 0.6:
+                stub.add_container(f'minecraft-{server_id}', running=True, health='healthy')
+                actual = 'online'
+            elif roll < 0.7:
+                stub.add_container(f'minecraft-{server_id}', running=True, health='starting')
+                actual = 'starting'
+            elif roll < 0.95:
+                stub.add_container(f'minecraft-{server_id}', running=False)
+                actual = 'offline'
+            else:
+                actual = 'offline'
+
+            # 10% строк разошлись с Docker: симуляция записала «желаемый» статус
+            status = actual
+            if rng.random() < 0.1:
+                status = rng.choice([s for s in ('online', 'offline', 'starting') if s != actual])
+                expected[server_id] = actual
+            rows.append({
+                'id': server_id,
+                'status': status,
+                'updated_at': datetime(2024, 5, 1),
+                'docker_url': stub.url,
+                'recent': False,
+                'pending_job': False
+            })
+
+        for stub in stubs:
+            stub.requests = 0
+        started = time.perf_counter()
+        listings = list_containers_on_hosts([stub.url for stub in stubs])
+        listed = time.perf_counter()
+        corrections, skipped = plan_corrections(rows, listings)
+        planned = time.perf_counter()
+        docker_calls = sum(stub.requests for stub in stubs)
+    finally:
+        for stub in stubs:
+            stub.stop()
+
+    assert {server_id: new for server_id, _, new, _, _ in corrections} == expected
+    print(f'{servers} servers on {host_count} host(s), docker latency {latency_ms} ms')
+    print(f'  listing: {docker_calls} docker call(s), {(listed - started) * 1000:.1f} ms')
+    print(f'  diff: {len(corrections)} correction(s), {(planned - listed) * 1000:.1f} ms')
+    print(f'  cycle without DB: {(planned - started) * 1000:.1f} ms; writes: 1 UPDATE + 1 INSERT')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Размещение серверов по нескольким Docker хостам: сравнение стратегий binpack и least-loaded
+на одной последовательности серверов, затем проверка маршрутизации — статусы и массовый restart
+уходят на заглушку того хоста, куда сервер размещён.
+
+    python benchmarks/bench_scheduler.py [хостов] [серверов]
+"""
+import os
+import random
+import sys
+from typing import Dict, Any, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import index  # noqa: E402
+from profiles import resource_profile  # noqa: E402
+from scheduler import rank_hosts  # noqa: E402
+from stub_docker import StubDockerServer  # noqa: E402
+
+SERVER_SIZES = [(1024, 0.5), (2048, 1.0), (2048, 1.0), (4096, 2.0), (8192, 4.0)]
+
+
+def make_hosts(count: int) -> List[Dict[str, Any]]:
+    hosts = []
+    for host_id in range(1, count + 1):
+        memory_mb = 16384 if host_id % 2 else 32768
+        cpus = 8 if host_id % 2 else 16
+        hosts.append({
+            'id': host_id, 'name': f'host-{host_id}', 'memory_mb': memory_mb, 'cpus': cpus,
+            'free_memory_mb': memory_mb, 'free_cpus': cpus, 'free_game_ports': 100, 'free_rcon_ports': 100
+        })
+    return hosts
+
+
+def place(hosts: List[Dict[str, Any]], servers: List[Any], strategy: str) -> Dict[int, int]:
+    """Разместить серверы по очереди, как это делает create_server; вернуть server -> host"""
+    placement = {}
+    for server_id, (memory_mb, cpus) in enumerate(servers, start=1):
+        ranked = rank_hosts(hosts, memory_mb, cpus, strategy)
+        if not ranked:
+            continue
+        host = ranked[0]
+        host['free_memory_mb'] -= memory_mb
+        host['free_cpus'] -= cpus
+        host['free_game_ports'] -= 1
+        host['free_rcon_ports'] -= 1
+        placement[server_id] = host['id']
+    return placement
+
+
+def report(strategy: str, hosts: List[Dict[str, Any]], placement: Dict[int, int], total: int) -> None:
+    used = [h for h in hosts if h['free_memory_mb'] < h['memory_mb']]
+    loads = [1 - h['free_memory_mb'] / h['memory_mb'] for h in hosts]
+    # Крупнейший сервер, который ещё можно разместить: фрагментация свободной памяти
+    largest_fit = max((size for size, cpus in SERVER_SIZES if rank_hosts(hosts, size, cpus, strategy)), default=0)
+    print(f'{strategy:13s} placed={len(placement)}/{total} hosts_used={len(used)}/{len(hosts)} '
+          f'load min/max={min(loads):.2f}/{max(loads):.2f} largest_free_fit={largest_fit}MB')
+
+
+def check_routing(host_count: int, placement: Dict[int, int]) -> None:
+    stubs = {host_id: StubDockerServer(latency=0.001).start() for host_id in range(1, host_count + 1)}
+    try:
+        for server_id, host_id in placement.items():
+            stubs[host_id].add_container(f'minecraft-{server_id}', running=False)
+
+        listings = index.list_containers_on_hosts([stub.url for stub in stubs.values()])
+        for host_id, stub in stubs.items():
+            expected = {str(s) for s, h in placement.items() if h == host_id}
+            assert set(listings[stub.url]) == expected, (host_id, len(listings[stub.url]), len(expected))
+
+        targets = [
+            ({'id': server_id, 'name': f'bench-{server_id}', 'edition': 'java', 'version': '1.20.1', 'port': 25565,
+              'max_players': 20, **resource_profile('java', 20)}, index.get_client(stubs[host_id].url))
+            for server_id, host_id in sorted(placement.items())
+        ]
+        outcomes = index.run(index.run_bulk_action(targets, 'restart', 16))
+        failed = [server['id'] for (server, _), (_, error) in zip(targets, outcomes) if error is not None]
+        assert not failed, failed
+        for host_id, stub in stubs.items():
+            running = {name for name, c in stub.containers.items() if c['Running']}
+            expected = {f'minecraft-{s}' for s, h in placement.items() if h == host_id}
+            assert running == expected, host_id
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+    print(f'routing: {len(placement)} servers restarted on {host_count} stub hosts, each call hit its own host')
+
+
+def main() -> None:
+    host_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    server_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    rng = random.Random(42)
+    servers = [rng.choice(SERVER_SIZES) for _ in range(server_count)]
+
+    print(f'hosts={host_count} servers={server_count}')
+    placements = {}
+    for strategy in ('binpack', 'least-loaded'):
+        hosts = make_hosts(host_count)
+        placements[strategy] = place(hosts, servers, strategy)
+        report(strategy, hosts, placements[strategy], server_count)
+
+    check_routing(host_count, placements['binpack'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Кэш списка серверов: стоимость сборки и сериализации списка против попадания в кэш
+и доля попаданий при неравномерной нагрузке, когда часть пользователей меняет серверы.
+Чтение из БД не входит: здесь сравнивается только работа процесса функции.
+
+    python benchmarks/bench_servers_cache.py [пользователей] [серверов у пользователя] [запросов]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'servers'))
+
+from cache import ResponseCache  # noqa: E402
+
+
+def build_list(user_index: int, count: int) -> str:
+    result = []
+    for index in range(count):
+        result.append({
+            'id': str(user_index * 1000 + index),
+            'name': f'Server {index}',
+            'ip': f'mc{index}.example.net',
+            'edition': 'java',
+            'version': '1.20.1',
+            'status': 'online' if index % 3 else 'offline',
+            'players': {'current': index % 20, 'max': 20},
+            'latencyMs': 12,
+            'port': 25565 + index
+        })
+    return json.dumps({'servers': result})
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 200000
+
+    rng = random.Random(1)
+    weights = [1 / (index + 1) for index in range(users)]
+    order = rng.choices(range(users), weights=weights, k=requests)
+    versions = [1] * users
+
+    started = time.perf_counter()
+    for user_index in order[:20000]:
+        build_list(user_index, per_user)
+    build_cost = (time.perf_counter() - started) / 20000
+
+    cache = ResponseCache(max_entries=users // 2, ttl=60)
+    started = time.perf_counter()
+    for number, user_index in enumerate(order):
+        if number % 100 == 0:
+            versions[rng.randrange(users)] += 1
+        user_id = f'user-{user_index}'
+        if cache.get(user_id, versions[user_index]) is None:
+            cache.put(user_id, versions[user_index], build_list(user_index, per_user))
+    cached_cost = (time.perf_counter() - started) / requests
+
+    stats = cache.stats()
+    print(f'{users} users x {per_user} servers, {requests} requests (zipf), 1% writes, LRU for {users // 2} users')
+    print(f'  build + serialize: {build_cost * 1e6:.1f} us/request')
+    print(f'  with cache: {cached_cost * 1e6:.1f} us/request, hit rate {stats["hitRate"]:.1%}, '
+          f'stale {stats["stale"]}, evictions {stats["evictions"]}')
+
+
+if __name__ == '__main__':
+    main()
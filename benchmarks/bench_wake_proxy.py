@@ -0,0 +1,107 @@
+"""
+Прокси пробуждения на сотнях спящих серверов: время занять порты, задержка ответа на пинг
+списка серверов (Java и Bedrock) и время от попытки входа до вызова пробуждения и освобождения порта.
+БД заменена хранилищем в памяти.
+
+    python benchmarks/bench_wake_proxy.py [Java серверов] [Bedrock серверов] [первый порт]
+"""
+import asyncio
+import os
+import socket
+import statistics
+import struct
+import sys
+import time
+from typing import Dict, Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+
+from player_query import bedrock_status, encode_varint, java_status, pack_packet, pack_string  # noqa: E402
+from wake_proxy import WakeProxy  # noqa: E402
+
+
+class MemoryWakeStore:
+    def __init__(self, servers: Dict[int, Dict[str, Any]]) -> None:
+        self.servers = servers
+        self.woken: Dict[int, float] = {}
+
+    def sleeping(self) -> Dict[int, Dict[str, Any]]:
+        return {server_id: server for server_id, server in self.servers.items() if server_id not in self.woken}
+
+    def wake(self, server_id: int, reason: str) -> str:
+        self.woken[server_id] = time.perf_counter()
+        return 'starting'
+
+
+async def login(port: int) -> None:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    handshake = encode_varint(765) + pack_string('127.0.0.1') + struct.pack('>H', port) + encode_varint(2)
+    writer.write(pack_packet(0x00, handshake) + pack_packet(0x00, pack_string('Steve')))
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+def port_free(port: int) -> bool:
+    """Порт можно занять так же, как docker-proxy (с SO_REUSEADDR: соединения прокси остаются в TIME_WAIT)"""
+    with socket.socket() as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(('127.0.0.1', port))
+            return True
+        except OSError:
+            return False
+
+
+async def main() -> None:
+    java = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    bedrock = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    first_port = int(sys.argv[3]) if len(sys.argv) > 3 else 41000
+
+    servers = {}
+    for index in range(java + bedrock):
+        servers[index + 1] = {
+            'id': index + 1, 'name': f'Server {index + 1}', 'edition': 'java' if index < java else 'bedrock',
+            'version': '1.20.1', 'port': first_port + index, 'max_players': 20
+        }
+    store = MemoryWakeStore(servers)
+    proxy = WakeProxy(store, bind='127.0.0.1', refresh=0.2)
+
+    started = time.perf_counter()
+    await proxy.refresh()
+    bind_elapsed = time.perf_counter() - started
+    assert len(proxy.listeners) == java + bedrock, proxy.stats()
+
+    latencies = {'java': [], 'bedrock': []}
+    for server in servers.values():
+        if server['edition'] == 'java':
+            result = await java_status('127.0.0.1', server['port'], 2)
+        else:
+            result = await bedrock_status('127.0.0.1', server['port'], 2)
+        assert result['online'] == 0 and result['max'] == 20, result
+        latencies[server['edition']].append(result['latencyMs'])
+
+    wake_delays = []
+    for server_id in range(1, min(java, 50) + 1):
+        sent = time.perf_counter()
+        await login(servers[server_id]['port'])
+        while server_id not in store.woken:
+            await asyncio.sleep(0.001)
+        wake_delays.append((store.woken[server_id] - sent) * 1000)
+        assert port_free(servers[server_id]['port']), server_id
+
+    await proxy.close_all()
+
+    print(f'{java} Java + {bedrock} Bedrock sleeping servers')
+    print(f'  bind all ports: {bind_elapsed * 1000:.1f} ms')
+    for edition, values in latencies.items():
+        if values:
+            print(f'  {edition} status ping: p50 {statistics.median(values):.2f} ms, max {max(values):.2f} ms')
+    print(f'  login -> wake call: p50 {statistics.median(wake_delays):.2f} ms, max {max(wake_delays):.2f} ms; '
+          f'port released before wake')
+    print(f'  {proxy.stats()["pings"]} pings, {proxy.stats()["wakes"]} wakes')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Фейковые Minecraft серверы для проверки опроса онлайна: Java (Server List Ping по TCP)
+и Bedrock (RakNet Unconnected Ping по UDP). Каждый слушает свой порт на 127.0.0.1.
+Есть «молчащие» серверы: принимают соединение или датаграмму, но не отвечают.
+"""
+import asyncio
+import json
+import os
+import struct
+import sys
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+
+from player_query import (  # noqa: E402
+    RAKNET_MAGIC, RAKNET_UNCONNECTED_PING, RAKNET_UNCONNECTED_PONG, decode_varint, pack_packet, pack_string,
+    read_varint
+)
+
+
+class _BedrockResponder(asyncio.DatagramProtocol):
+    def __init__(self, server: Dict[str, Any], latency: float) -> None:
+        self.server = server
+        self.latency = latency
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        if self.server['silent'] or data[:1] != bytes([RAKNET_UNCONNECTED_PING]):
+            return
+        info = (f"MCPE;{self.server['motd']};594;1.20.10;{self.server['online']};{self.server['max']};"
+                f"1234567890;world;Survival;1;{self.server['port']};{self.server['port'] + 1};").encode('utf-8')
+        pong = (struct.pack('>BQQ', RAKNET_UNCONNECTED_PONG, struct.unpack_from('>Q', data, 1)[0], 42)
+                + RAKNET_MAGIC + struct.pack('>H', len(info)) + info)
+        asyncio.get_running_loop().call_later(self.latency, self.transport.sendto, pong, addr)
+
+
+class FakePingServers:
+    """Набор фейковых серверов в отдельном потоке со своим циклом событий"""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.servers: List[Dict[str, Any]] = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._closers: List[Any] = []
+
+    def start(self) -> 'FakePingServers':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        async def close_all() -> None:
+            for closer in self._closers:
+                closer()
+        asyncio.run_coroutine_threadsafe(close_all(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def add(self, edition: str, online: int, max_players: int = 20, motd: str = 'Fake server',
+            silent: bool = False) -> Dict[str, Any]:
+        """Запустить сервер на свободном порту; silent — не отвечать (для проверки таймаутов)"""
+        server = {'edition': edition, 'online': online, 'max': max_players, 'motd': motd, 'silent': silent}
+        future = asyncio.run_coroutine_threadsafe(self._listen(server), self._loop)
+        server['port'] = future.result()
+        self.servers.append(server)
+        return server
+
+    async def _listen(self, server: Dict[str, Any]) -> int:
+        loop = asyncio.get_running_loop()
+        if server['edition'] == 'bedrock':
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _BedrockResponder(server, self.latency), local_addr=('127.0.0.1', 0)
+            )
+            self._closers.append(transport.close)
+            return transport.get_extra_info('sockname')[1]
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                if server['silent']:
+                    await reader.read()
+                    return
+                for _ in range(2):
+                    length = await read_varint(reader)
+                    packet = await reader.readexactly(length)
+                    packet_id, _ = decode_varint(packet)
+                    if packet_id == 0x00 and length == 1:
+                        break
+                status = {
+                    'version': {'name': '1.20.1', 'protocol': 763},
+                    'players': {'online': server['online'], 'max': server['max']},
+                    'description': {'text': server['motd'], 'extra': [{'text': '!'}]}
+                }
+                await asyncio.sleep(self.latency)
+                writer.write(pack_packet(0x00, pack_string(json.dumps(status))))
+                await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        tcp_server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        self._closers.append(tcp_server.close)
+        return tcp_server.sockets[0].getsockname()[1]
+
+    def targets(self) -> List[Tuple[int, str, str, int]]:
+        """Цели для poll_servers: номер сервера — его индекс"""
+        return [(index, s['edition'], '127.0.0.1', s['port']) for index, s in enumerate(self.servers)]
@@ -0,0 +1,119 @@
+"""
+Фейковые RCON серверы Minecraft Java для проверки пула и бенчмарков. Каждый слушает свой порт
+на 127.0.0.1 и отвечает как ванильный сервер: авторизация, ответ на команду (длинный режется
+на пакеты по 4096 байт) и «Unknown request» на пакеты других типов.
+"""
+import asyncio
+import os
+import struct
+import sys
+import threading
+from typing import Dict, Any, List, Set, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'docker-manager'))
+
+from rcon import PACKET_AUTH, PACKET_COMMAND, PACKET_RESPONSE  # noqa: E402
+
+MAX_PAYLOAD = 4096
+
+
+def respond(server: Dict[str, Any], command: str) -> str:
+    name, _, argument = command.partition(' ')
+    if name == 'list':
+        return f"There are {server['online']} of a max of 20 players online: "
+    if name == 'save-all':
+        return 'Saving the game (this may take a moment!)Saved the game'
+    if name == 'say':
+        return ''
+    if name == 'tps':
+        return 'TPS from last 1m, 5m, 15m: 20.0, 20.0, 19.97'
+    if name == 'help':
+        return '\n'.join(f'/command{index} <argument>' for index in range(600))
+    return f'Unknown or incomplete command, see below for error{argument}'
+
+
+def pack(request_id: int, packet_type: int, payload: str) -> bytes:
+    body = struct.pack('<ii', request_id, packet_type) + payload.encode('utf-8') + b'\x00\x00'
+    return struct.pack('<i', len(body)) + body
+
+
+class FakeRconServers:
+    """Набор фейковых серверов в отдельном потоке со своим циклом событий"""
+
+    def __init__(self, latency: float = 0.0, connect_latency: float = 0.0) -> None:
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.servers: List[Dict[str, Any]] = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._closers: List[Any] = []
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    def start(self) -> 'FakeRconServers':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        async def close_all() -> None:
+            for closer in self._closers:
+                closer()
+            # Открытые соединения клиентов висят в чтении — закрываем их и ждём обработчики
+            for writer in list(self._writers):
+                writer.close()
+            handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*handlers, return_exceptions=True)
+        asyncio.run_coroutine_threadsafe(close_all(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def add(self, password: str = 'secret', online: int = 0) -> Dict[str, Any]:
+        """Запустить сервер на свободном порту; connections и commands считают нагрузку"""
+        server = {'password': password, 'online': online, 'connections': 0, 'commands': []}
+        future = asyncio.run_coroutine_threadsafe(self._listen(server), self._loop)
+        server['port'] = future.result()
+        self.servers.append(server)
+        return server
+
+    async def _listen(self, server: Dict[str, Any]) -> int:
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            server['connections'] += 1
+            self._writers.add(writer)
+            authenticated = False
+            try:
+                # Задержка рукопожатия: TCP и авторизация до удалённого хоста
+                await asyncio.sleep(self.connect_latency)
+                while True:
+                    (length,) = struct.unpack('<i', await reader.readexactly(4))
+                    data = await reader.readexactly(length)
+                    request_id, packet_type = struct.unpack_from('<ii', data)
+                    payload = data[8:-2].decode('utf-8')
+
+                    if packet_type == PACKET_AUTH:
+                        authenticated = payload == server['password']
+                        writer.write(pack(request_id if authenticated else -1, PACKET_COMMAND, ''))
+                    elif not authenticated:
+                        writer.write(pack(-1, PACKET_RESPONSE, ''))
+                    elif packet_type == PACKET_COMMAND:
+                        await asyncio.sleep(self.latency)
+                        server['commands'].append(payload)
+                        output = respond(server, payload)
+                        chunks = [output[i:i + MAX_PAYLOAD] for i in range(0, len(output), MAX_PAYLOAD)] or ['']
+                        for chunk in chunks:
+                            writer.write(pack(request_id, PACKET_RESPONSE, chunk))
+                    else:
+                        writer.write(pack(request_id, PACKET_RESPONSE, f'Unknown request {packet_type:x}'))
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                self._writers.discard(writer)
+                writer.close()
+
+        tcp_server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        self._closers.append(tcp_server.close)
+        return tcp_server.sockets[0].getsockname()[1]
+
+    def targets(self) -> List[Tuple[int, str, int, str]]:
+        """Цели для broadcast: номер сервера — его индекс"""
+        return [(index, '127.0.0.1', s['port'], s['password']) for index, s in enumerate(self.servers)]
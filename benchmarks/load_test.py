@@ -0,0 +1,358 @@
+"""
+Нагрузочный прогон обработчиков функций в процессе: синтетические события вызывают handler каждой
+функции (servers, docker-manager, server-logs) против локального PostgreSQL и заглушки Docker.
+Парк растёт ступенями (10 → 10 000 серверов, по LOAD_LOGS_PER_SERVER строк логов на сервер),
+на каждой ступени сценарии гоняются с разным числом параллельных пользователей.
+Отчёт: p50/p99, запросы к БД и вызовы Docker на запрос, пропускная способность.
+
+Нужна отдельная база с применёнными миграциями: строки пишутся под пользователями load-<run>-*
+и удаляются в конце (кроме --keep).
+
+    DATABASE_URL=postgres://... python benchmarks/load_test.py [--fleet 10,100,1000,10000]
+        [--concurrency 1,8,32] [--requests 400] [--scenarios servers,logs.page] [--save base.json]
+        [--compare base.json] [--tolerance 0.5] [--keep]
+
+С --compare прогон завершается с кодом 1, если на какой-то ступени выросло число запросов к БД
+на запрос или p99 хуже базового больше чем на --tolerance.
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_docker import StubDockerServer  # noqa: E402
+
+FUNCTIONS = ('servers', 'docker-manager', 'server-logs')
+LOGS_PER_SERVER = int(os.environ.get('LOAD_LOGS_PER_SERVER', '200'))
+SERVERS_PER_USER = 5
+DOCKER_LATENCY = float(os.environ.get('LOAD_DOCKER_LATENCY', '0.002'))
+
+_counter = threading.local()
+
+
+def _counting_cursor(base: type, cache: Dict[type, type] = {}) -> type:
+    """Подкласс курсора (обычного или RealDictCursor), считающий execute в текущем потоке"""
+    if base not in cache:
+        def execute(self, query, vars=None):
+            _counter.queries = getattr(_counter, 'queries', 0) + 1
+            return base.execute(self, query, vars)
+
+        def executemany(self, query, vars_list):
+            _counter.queries = getattr(_counter, 'queries', 0) + 1
+            return base.executemany(self, query, vars_list)
+
+        cache[base] = type('Counting' + base.__name__, (base,), {'execute': execute, 'executemany': executemany})
+    return cache[base]
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    def cursor(self, *args, **kwargs):
+        kwargs['cursor_factory'] = _counting_cursor(
+            kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        )
+        return super().cursor(*args, **kwargs)
+
+
+def count_queries() -> None:
+    """
+    Пулы функций открывают соединения через psycopg2.connect (с TracedConnection) — подменяем
+    фабрику соединений её подклассом, считающим запросы
+    """
+    connect = psycopg2.connect
+    factories: Dict[type, type] = {}
+
+    def counting_connect(dsn=None, connection_factory=None, **kwargs):
+        base = connection_factory or psycopg2.extensions.connection
+        if base not in factories:
+            factories[base] = type('Counting' + base.__name__, (CountingConnection, base), {})
+        return connect(dsn, connection_factory=factories[base], **kwargs)
+
+    psycopg2.connect = counting_connect
+
+
+def load_handler(function: str) -> Callable[[Dict[str, Any], Any], Dict[str, Any]]:
+    """
+    Импортировать index.py функции как при деплое: у каждой функции свои db_pool, ports, profiles,
+    поэтому модули с совпадающими именами выгружаются до и после импорта — handler держит свои.
+    """
+    directory = os.path.join(ROOT, 'backend', function)
+    local = {name[:-3] for name in os.listdir(directory) if name.endswith('.py')}
+    for name in local:
+        sys.modules.pop(name, None)
+    sys.path.insert(0, directory)
+    try:
+        module = importlib.import_module('index')
+    finally:
+        sys.path.remove(directory)
+        for name in local:
+            sys.modules.pop(name, None)
+    return module.handler
+
+
+class Fleet:
+    """Синтетический парк в базе и в заглушке Docker; растёт ступенями, удаляется в cleanup"""
+
+    def __init__(self, database_url: str, stub: StubDockerServer) -> None:
+        self.database_url = database_url
+        self.stub = stub
+        self.run = f'load-{uuid.uuid4().hex[:8]}'
+        self.server_ids: List[int] = []
+        self.users: List[str] = []
+        self.log_rows = 0
+
+    def grow(self, size: int) -> float:
+        """Добавить серверы до size (и логи к новым); вернуть секунды на посев"""
+        started = time.perf_counter()
+        missing = size - len(self.server_ids)
+        if missing <= 0:
+            return 0.0
+        conn = psycopg2.connect(self.database_url)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO servers (user_id, name, server_ip, edition, version, max_players, status, port, "
+                    "rcon_port, docker_host_id) "
+                    "SELECT %(run)s || '-u' || (g / %(per_user)s), 'Load ' || g, %(run)s || '-' || g || '.local', "
+                    "CASE WHEN g %% 10 = 0 THEN 'bedrock' ELSE 'java' END, '1.20.1', 20, "
+                    "CASE WHEN g %% 3 = 0 THEN 'offline' ELSE 'online' END, 30000 + g %% 30000, NULL, "
+                    "(SELECT id FROM docker_hosts WHERE name = 'default') "
+                    "FROM generate_series(%(start)s, %(end)s) g RETURNING id, status, user_id",
+                    {'run': self.run, 'per_user': SERVERS_PER_USER,
+                     'start': len(self.server_ids), 'end': size - 1}
+                )
+                created = cur.fetchall()
+                new_ids = [row[0] for row in created]
+                # Логи за неделю: created_at разбросан по дневным партициям, каждая десятая строка — WARN
+                cur.execute(
+                    "INSERT INTO server_logs (server_id, log_type, message, created_at) "
+                    "SELECT ids.id, CASE WHEN n %% 10 = 0 THEN 'WARN' ELSE 'INFO' END, "
+                    "'[Server thread/INFO]: load line ' || n, "
+                    "CURRENT_TIMESTAMP - make_interval(secs => (random() * 604800)::int) "
+                    "FROM unnest(%s::int[]) AS ids(id), generate_series(1, %s) n",
+                    (new_ids, LOGS_PER_SERVER)
+                )
+                self.log_rows += cur.rowcount
+                cur.execute("ANALYZE servers")
+                cur.execute("ANALYZE server_logs")
+            conn.commit()
+        finally:
+            conn.close()
+
+        known = set(self.users)
+        for server_id, status, user_id in created:
+            self.stub.add_container(
+                f'minecraft-{server_id}', running=status == 'online',
+                config={'Image': 'itzg/minecraft-server:latest', 'Env': ['EULA=TRUE', 'MEMORY=2G'],
+                        'HostConfig': {'Binds': [f'minecraft-data-{server_id}:/data']}}
+            )
+            if user_id not in known:
+                known.add(user_id)
+                self.users.append(user_id)
+        self.server_ids.extend(new_ids)
+        return time.perf_counter() - started
+
+    def cleanup(self) -> None:
+        """Удалить строки прогона из всех таблиц со server_id, затем серверы"""
+        conn = psycopg2.connect(self.database_url)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT c.relname FROM pg_attribute a JOIN pg_class c ON c.oid = a.attrelid "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE a.attname = 'server_id' AND NOT a.attisdropped AND c.relkind IN ('r', 'p') "
+                    "AND NOT c.relispartition AND n.nspname = current_schema() AND c.relname <> 'servers'"
+                )
+                tables = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT id FROM servers WHERE user_id LIKE %s", (self.run + '-%',))
+                ids = [row[0] for row in cur.fetchall()]
+                # Задачи ссылаются на серверы, бэкапы — на задачи: сначала всё, кроме container_jobs
+                for table in sorted(tables, key=lambda name: name == 'container_jobs'):
+                    cur.execute(f'DELETE FROM {table} WHERE server_id = ANY(%s)', (ids,))
+                cur.execute("DELETE FROM servers WHERE id = ANY(%s)", (ids,))
+                cur.execute("DELETE FROM server_list_versions WHERE user_id LIKE %s", (self.run + '-%',))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def _get(query: Dict[str, str], user: Optional[str] = None) -> Dict[str, Any]:
+    return {'httpMethod': 'GET', 'queryStringParameters': query,
+            'headers': {'X-User-Id': user} if user else {}, 'body': None}
+
+
+def _post(body: Dict[str, Any]) -> Dict[str, Any]:
+    return {'httpMethod': 'POST', 'queryStringParameters': None,
+            'headers': {'Content-Type': 'application/json'}, 'body': json.dumps(body)}
+
+
+# Сценарий: функция и фабрика события по парку; пользователи и серверы выбираются с перекосом к «горячим»
+SCENARIOS: Dict[str, Tuple[str, Callable[[Fleet, random.Random], Dict[str, Any]]]] = {
+    'servers.list': ('servers', lambda fleet, rng: _get({}, _hot(rng, fleet.users))),
+    'docker.status': ('docker-manager', lambda fleet, rng: _get({'serverId': str(_hot(rng, fleet.server_ids))})),
+    'docker.user-status': ('docker-manager', lambda fleet, rng: _get({'all': '1'}, _hot(rng, fleet.users))),
+    'docker.bulk-status': ('docker-manager', lambda fleet, rng: _get(
+        {'serverIds': ','.join(str(i) for i in rng.sample(fleet.server_ids, min(50, len(fleet.server_ids))))}
+    )),
+    'docker.restart': ('docker-manager', lambda fleet, rng: _post(
+        {'serverId': str(rng.choice(fleet.server_ids)), 'action': 'restart'}
+    )),
+    'logs.page': ('server-logs', lambda fleet, rng: _get({'serverId': str(_hot(rng, fleet.server_ids)), 'limit': '100'})),
+    'logs.warn': ('server-logs', lambda fleet, rng: _get(
+        {'serverId': str(_hot(rng, fleet.server_ids)), 'limit': '100', 'logType': 'WARN'}
+    )),
+    'logs.rollup': ('server-logs', lambda fleet, rng: _get({'serverId': str(_hot(rng, fleet.server_ids)), 'view': 'rollup'}))
+}
+
+
+def _hot(rng: random.Random, items: List[Any]) -> Any:
+    """Примерно Zipf: большая часть запросов к первым элементам"""
+    return items[min(len(items) - 1, int(len(items) * rng.random() ** 3))]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_step(handler: Callable, make_event: Callable, fleet: Fleet, stub: StubDockerServer,
+             concurrency: int, requests: int) -> Dict[str, Any]:
+    """requests вызовов handler из concurrency потоков; события готовятся заранее, вне замера"""
+    rng = random.Random(requests * 31 + concurrency)
+    events = [make_event(fleet, rng) for _ in range(requests)]
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = [0]
+    lock = threading.Lock()
+    position = [0]
+
+    def worker() -> None:
+        while True:
+            with lock:
+                if position[0] >= len(events):
+                    return
+                event = events[position[0]]
+                position[0] += 1
+            _counter.queries = 0
+            started = time.perf_counter()
+            try:
+                response = handler(event, None)
+                failed = response.get('statusCode', 500) >= 500
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                queries.append(_counter.queries)
+                errors[0] += failed
+
+    docker_before = stub.requests
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': errors[0],
+        'rps': round(requests / wall, 1),
+        'p50Ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p99Ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queriesPerRequest': round(sum(queries) / requests, 2),
+        'dockerPerRequest': round((stub.requests - docker_before) / requests, 2)
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Регрессии против сохранённого прогона: больше запросов к БД на запрос или p99 хуже допуска"""
+    with open(baseline_path) as f:
+        baseline = {(r['scenario'], r['fleet'], r['concurrency']): r for r in json.load(f)['results']}
+    problems = []
+    for result in results:
+        base = baseline.get((result['scenario'], result['fleet'], result['concurrency']))
+        if base is None:
+            continue
+        label = f"{result['scenario']} fleet={result['fleet']} c={result['concurrency']}"
+        if result['queriesPerRequest'] > base['queriesPerRequest'] + 0.5:
+            problems.append(f"{label}: queries/request {base['queriesPerRequest']} -> {result['queriesPerRequest']}")
+        if result['p99Ms'] > base['p99Ms'] * (1 + tolerance):
+            problems.append(f"{label}: p99 {base['p99Ms']} ms -> {result['p99Ms']} ms")
+        if result['errors'] > base['errors']:
+            problems.append(f"{label}: errors {base['errors']} -> {result['errors']}")
+    return problems
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description='Load test of backend handlers')
+    parser.add_argument('--fleet', default='10,100,1000,10000')
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--requests', type=int, default=400, help='requests per scenario and concurrency level')
+    parser.add_argument('--scenarios', default='', help='comma-separated names or prefixes (servers, docker, logs)')
+    parser.add_argument('--save')
+    parser.add_argument('--compare')
+    parser.add_argument('--tolerance', type=float, default=0.5)
+    parser.add_argument('--keep', action='store_true', help='do not delete seeded rows')
+    args = parser.parse_args(argv[1:])
+
+    fleet_sizes = sorted(int(size) for size in args.fleet.split(','))
+    levels = [int(level) for level in args.concurrency.split(',')]
+    wanted = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    scenarios = [name for name in SCENARIOS if not wanted or any(name.startswith(w) for w in wanted)]
+    database_url = os.environ['DATABASE_URL']
+
+    stub = StubDockerServer(latency=DOCKER_LATENCY).start()
+    # Окружение читается при импорте и вызове: пул на максимум пользователей, Docker — заглушка
+    os.environ['DOCKER_HOST_URL'] = stub.url
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(max(levels)))
+    os.environ.pop('MAINTENANCE_TOKEN', None)
+    # Трасса пишется как в проде, но строка лога на каждый запрос заглушила бы отчёт
+    os.environ.setdefault('TRACE_LOG', '0')
+    count_queries()
+    handlers = {function: load_handler(function) for function in FUNCTIONS}
+
+    fleet = Fleet(database_url, stub)
+    results = []
+    try:
+        for size in fleet_sizes:
+            seeded = fleet.grow(size)
+            print(f'fleet {size}: {len(fleet.users)} users, {fleet.log_rows} log rows (seeded in {seeded:.1f} s)')
+            print(f"  {'scenario':20s} {'users':>5s} {'rps':>8s} {'p50 ms':>8s} {'p99 ms':>8s} "
+                  f"{'db/req':>7s} {'docker/req':>10s} {'errors':>6s}")
+            for name in scenarios:
+                function, make_event = SCENARIOS[name]
+                for concurrency in levels:
+                    step = run_step(handlers[function], make_event, fleet, stub, concurrency,
+                                    max(args.requests, concurrency * 10))
+                    results.append({'scenario': name, 'fleet': size, 'concurrency': concurrency, **step})
+                    print(f"  {name:20s} {concurrency:5d} {step['rps']:8.1f} {step['p50Ms']:8.2f} {step['p99Ms']:8.2f} "
+                          f"{step['queriesPerRequest']:7.2f} {step['dockerPerRequest']:10.2f} {step['errors']:6d}")
+    finally:
+        stub.stop()
+        if not args.keep:
+            fleet.cleanup()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'run': fleet.run, 'results': results}, f, indent=2)
+    if args.compare:
+        problems = compare(results, args.compare, args.tolerance)
+        for problem in problems:
+            print('REGRESSION ' + problem)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,432 @@
+"""
+Локальная заглушка Docker Engine API для бенчмарков и ручной проверки docker-manager.
+Хранит контейнеры в памяти и отвечает на подмножество эндпоинтов, которыми пользуется бэкенд.
+
+    stub = StubDockerServer(latency=0.002).start()
+    stub.add_container('minecraft-1', running=True)
+    os.environ['DOCKER_HOST_URL'] = stub.url
+"""
+import bisect
+import io
+import json
+import socket
+import struct
+import tarfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Стандартная очередь из 5 соединений теряет SYN при параллельном подключении клиентов
+    request_queue_size = 256
+
+
+class StubDockerServer:
+    def __init__(self, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0, pull_seconds: float = 0.5) -> None:
+        self.latency = latency
+        self.pull_seconds = pull_seconds
+        self.containers: Dict[str, Dict[str, Any]] = {}
+        self.images: Set[str] = set()
+        self.volumes: Dict[str, Dict[str, bytes]] = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._httpd = _Server((host, port), _make_handler(self))
+        self._thread: Optional[threading.Thread] = None
+        self.stopping = False
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'StubDockerServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopping = True
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def add_container(self, name: str, running: bool = False, config: Optional[Dict[str, Any]] = None,
+                      health: Optional[str] = None) -> Dict[str, Any]:
+        """health — состояние HEALTHCHECK в листинге: starting, healthy, unhealthy или None (проверки нет)"""
+        container = {
+            'Id': uuid.uuid4().hex + uuid.uuid4().hex,
+            'Name': name,
+            'Config': config or {},
+            'Running': running,
+            'Health': health,
+            'StartedAt': time.time() if running else None
+        }
+        with self.lock:
+            # Файлы /data: общий словарь именованного тома из Binds или свой у контейнера
+            volume = _data_volume(container['Config'])
+            container['Data'] = self.volumes.setdefault(volume, {}) if volume else {}
+            self.containers[name] = container
+        return container
+
+    def add_files(self, name: str, files: Dict[str, bytes]) -> None:
+        """Положить файлы в /data контейнера (пути относительно /data)"""
+        container = self.find(name)
+        with self.lock:
+            container['Data'].update(files)
+
+    def add_logs(self, name: str, lines: Iterable[Tuple[int, str]]) -> int:
+        """Дописать строки (поток 1/2, текст) в лог контейнера: кадры как у dockerd без Tty, метка — 1 мкс на строку"""
+        container = self.find(name)
+        with self.lock:
+            stamps = container.setdefault('LogStamps', [])
+            frames = container.setdefault('LogFrames', [])
+            stamp = max(time.time_ns(), stamps[-1] + 1000 if stamps else 0)
+            for stream, text in lines:
+                seconds, nanos = divmod(stamp, 1_000_000_000)
+                line = f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos:09d}Z {text}\n".encode('utf-8')
+                frames.append(struct.pack('>B3xI', stream, len(line)) + line)
+                stamps.append(stamp)
+                stamp += 1000
+            return len(frames)
+
+    def find(self, ref: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if ref in self.containers:
+                return self.containers[ref]
+            for container in self.containers.values():
+                if container['Id'].startswith(ref):
+                    return container
+        return None
+
+
+def _data_volume(config: Dict[str, Any]) -> Optional[str]:
+    for bind in (config.get('HostConfig') or {}).get('Binds') or []:
+        source, _, destination = bind.partition(':')
+        if destination.split(':')[0] == '/data' and not source.startswith('/'):
+            return source
+    return None
+
+
+def _data_archive(container: Dict[str, Any]) -> bytes:
+    """tar каталога /data, как его отдаёт dockerd: префикс data/, каталоги перед файлами"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w', format=tarfile.PAX_FORMAT) as archive:
+        files = sorted(container['Data'].items())
+        dirs = {'data'}
+        for path, _ in files:
+            parts = path.split('/')[:-1]
+            dirs.update('/'.join(['data'] + parts[:i + 1]) for i in range(len(parts)))
+        for directory in sorted(dirs):
+            info = tarfile.TarInfo(directory)
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            archive.addfile(info)
+        for path, data in files:
+            info = tarfile.TarInfo('data/' + path)
+            info.size = len(data)
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def _normalize_image(image: str) -> str:
+    return image if ':' in image.rsplit('/', 1)[-1] else image + ':latest'
+
+
+def _summary(container: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'Id': container['Id'],
+        'Names': ['/' + container['Name']],
+        'Image': container['Config'].get('Image', ''),
+        'State': ('paused' if container.get('Paused') else 'running') if container['Running'] else 'exited',
+        'Status': _status_text(container)
+    }
+
+
+def _status_text(container: Dict[str, Any]) -> str:
+    if not container['Running']:
+        return 'Exited (0)'
+    health = container.get('Health')
+    if health == 'starting':
+        return 'Up 5 seconds (health: starting)'
+    return f'Up 5 minutes ({health})' if health else 'Up'
+
+
+def _mounts(host_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Mounts из inspect по Binds ('том:/путь') и Mounts ({Type, Source, Target}) конфигурации"""
+    mounts = []
+    for bind in host_config.get('Binds') or []:
+        source, _, destination = bind.partition(':')
+        kind = 'bind' if source.startswith('/') else 'volume'
+        mounts.append({'Type': kind, 'Name' if kind == 'volume' else 'Source': source,
+                       'Destination': destination.split(':')[0]})
+    for mount in host_config.get('Mounts') or []:
+        mounts.append({'Type': mount.get('Type', 'volume'), 'Name': mount.get('Source'), 'Destination': mount.get('Target')})
+    return mounts
+
+
+def _inspect(container: Dict[str, Any]) -> Dict[str, Any]:
+    host_config = container['Config'].get('HostConfig') or {}
+    return {
+        'Id': container['Id'],
+        'Name': '/' + container['Name'],
+        'Config': {key: value for key, value in container['Config'].items() if key != 'HostConfig'},
+        'HostConfig': host_config,
+        'Mounts': _mounts(host_config),
+        'State': {
+            'Running': container['Running'],
+            'Status': 'running' if container['Running'] else 'exited'
+        }
+    }
+
+
+def _stats(container: Dict[str, Any]) -> Dict[str, Any]:
+    """Снимок /stats: запущенный контейнер занимает около 40% одного ядра"""
+    now = time.time()
+    busy = (now - container['StartedAt']) * 0.4 if container['Running'] and container['StartedAt'] else 0
+    return {
+        'read': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'cpu_stats': {
+            'cpu_usage': {'total_usage': int(busy * 1e9)},
+            'system_cpu_usage': int(now * 1e9) * 4,
+            'online_cpus': 4
+        },
+        'precpu_stats': {},
+        'memory_stats': {
+            'usage': (900 + hash(container['Name']) % 400) * 1024 * 1024 if container['Running'] else 0,
+            'stats': {'inactive_file': 100 * 1024 * 1024 if container['Running'] else 0},
+            'limit': 8 * 1024 * 1024 * 1024
+        }
+    }
+
+
+def _make_handler(stub: StubDockerServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self) -> None:
+            super().setup()
+            # Как и настоящий dockerd, отвечаем без алгоритма Нейгла: иначе keep-alive ловит задержку ACK в 40 мс
+            if self.connection.family in (socket.AF_INET, socket.AF_INET6):
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _reply(self, status: int, payload: Any = None) -> None:
+            body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self) -> Dict[str, Any]:
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+        def _route(self, method: str) -> None:
+            with stub.lock:
+                stub.requests += 1
+            if stub.latency:
+                time.sleep(stub.latency)
+
+            parsed = urlparse(self.path)
+            query = parse_qs(parsed.query)
+            parts = [unquote(p) for p in parsed.path.split('/') if p]
+            if parts and parts[0].startswith('v1.'):
+                parts = parts[1:]
+
+            if method == 'GET' and parts == ['containers', 'json']:
+                prefixes = json.loads(query.get('filters', ['{}'])[0]).get('name', [''])
+                show_all = query.get('all', ['0'])[0] in ('1', 'true')
+                with stub.lock:
+                    listing = [
+                        _summary(c) for c in stub.containers.values()
+                        if any(p in c['Name'] for p in prefixes) and (show_all or c['Running'])
+                    ]
+                return self._reply(200, listing)
+
+            if method == 'GET' and len(parts) >= 3 and parts[0] == 'images' and parts[-1] == 'json':
+                image = _normalize_image('/'.join(parts[1:-1]))
+                if image not in stub.images:
+                    return self._reply(404, {'message': f'No such image: {image}'})
+                return self._reply(200, {'Id': 'sha256:' + uuid.uuid5(uuid.NAMESPACE_URL, image).hex, 'RepoTags': [image]})
+
+            if method == 'POST' and parts == ['images', 'create']:
+                image = _normalize_image(query.get('fromImage', [''])[0] + ':' + query.get('tag', ['latest'])[0])
+                return self._pull(image)
+
+            if method == 'POST' and parts == ['containers', 'create']:
+                name = query.get('name', [''])[0] or uuid.uuid4().hex[:12]
+                self._create(name)
+                return
+
+            if len(parts) == 3 and parts[0] == 'containers':
+                container = stub.find(parts[1])
+                if container is None:
+                    return self._reply(404, {'message': f'No such container: {parts[1]}'})
+                action = parts[2]
+                if method == 'GET' and action == 'json':
+                    return self._reply(200, _inspect(container))
+                if method == 'GET' and action == 'stats':
+                    return self._reply(200, _stats(container))
+                if method == 'GET' and action == 'logs':
+                    return self._logs(container, query)
+                if method == 'POST' and action in ('start', 'restart'):
+                    container['Running'] = True
+                    container['StartedAt'] = time.time()
+                    return self._reply(204)
+                if method == 'POST' and action == 'stop':
+                    container['Running'] = False
+                    container['Paused'] = False
+                    return self._reply(204)
+                if method == 'POST' and action in ('pause', 'unpause'):
+                    if not container['Running']:
+                        return self._reply(409, {'message': f'Container {parts[1]} is not running'})
+                    container['Paused'] = action == 'pause'
+                    return self._reply(204)
+                if method == 'POST' and action == 'rename':
+                    new_name = query.get('name', [''])[0]
+                    with stub.lock:
+                        if new_name in stub.containers:
+                            return self._reply(409, {'message': f'Conflict. The name "{new_name}" is already in use'})
+                        stub.containers.pop(container['Name'], None)
+                        container['Name'] = new_name
+                        stub.containers[new_name] = container
+                    return self._reply(204)
+                if method == 'POST' and action == 'update':
+                    with stub.lock:
+                        container['Config'].setdefault('HostConfig', {}).update(self._read_body())
+                    return self._reply(200, {'Warnings': []})
+                if method == 'PUT' and action == 'archive':
+                    data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                    path = query.get('path', [''])[0]
+                    container.setdefault('Archives', []).append((path, data))
+                    if path.rstrip('/') == '/data':
+                        with tarfile.open(fileobj=io.BytesIO(data), mode='r') as archive, stub.lock:
+                            for member in archive.getmembers():
+                                if member.isfile():
+                                    container['Data'][member.name] = archive.extractfile(member).read()
+                    return self._reply(200)
+                if method == 'GET' and action == 'archive':
+                    with stub.lock:
+                        data = _data_archive(container)
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/x-tar')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for start in range(0, len(data), 65536):
+                        piece = data[start:start + 65536]
+                        self.wfile.write(f'{len(piece):x}\r\n'.encode('ascii') + piece + b'\r\n')
+                    self.wfile.write(b'0\r\n\r\n')
+                    return
+
+            if method == 'DELETE' and len(parts) == 2 and parts[0] == 'volumes':
+                with stub.lock:
+                    if parts[1] not in stub.volumes:
+                        return self._reply(404, {'message': f'get {parts[1]}: no such volume'})
+                    if any(_data_volume(c['Config']) == parts[1] for c in stub.containers.values()):
+                        return self._reply(409, {'message': f'remove {parts[1]}: volume is in use'})
+                    stub.volumes.pop(parts[1])
+                return self._reply(204)
+
+            if method == 'DELETE' and len(parts) == 2 and parts[0] == 'containers':
+                container = stub.find(parts[1])
+                if container is None:
+                    return self._reply(404, {'message': f'No such container: {parts[1]}'})
+                with stub.lock:
+                    stub.containers.pop(container['Name'], None)
+                return self._reply(204)
+
+            return self._reply(404, {'message': 'page not found'})
+
+        def _pull(self, image: str) -> None:
+            # Как dockerd: поток JSON-строк с прогрессом по слоям в chunked-ответе
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            steps = 10
+            for step in range(steps + 1):
+                for layer in ('layer-a', 'layer-b'):
+                    self._chunk({'status': 'Downloading', 'id': layer,
+                                 'progressDetail': {'current': step * 1000, 'total': steps * 1000}})
+                time.sleep(stub.pull_seconds / steps)
+            self._chunk({'status': f'Status: Downloaded newer image for {image}'})
+            self.wfile.write(b'0\r\n\r\n')
+            with stub.lock:
+                stub.images.add(image)
+
+        def _logs(self, container: Dict[str, Any], query: Dict[str, Any]) -> None:
+            # Мультиплексированный поток с since (включительно); follow держит ответ, пока контейнер запущен
+            seconds, _, fraction = query.get('since', ['0'])[0].partition('.')
+            position = bisect.bisect_left(container.get('LogStamps', []),
+                                          int(seconds) * 1_000_000_000 + int((fraction + '000000000')[:9]))
+            follow = query.get('follow', ['0'])[0] in ('1', 'true')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.docker.multiplexed-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                while True:
+                    with stub.lock:
+                        frames = container.get('LogFrames', [])[position:position + 500]
+                    if frames:
+                        position += len(frames)
+                        data = b''.join(frames)
+                        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+                        continue
+                    if not follow or not container['Running'] or stub.stopping:
+                        break
+                    time.sleep(0.01)
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def _chunk(self, payload: Dict[str, Any]) -> None:
+            data = json.dumps(payload).encode('utf-8') + b'\r\n'
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+
+        def _create(self, name: str) -> None:
+            config = self._read_body()
+            if stub.find(name) is not None:
+                return self._reply(409, {'message': f'Conflict. The container name "/{name}" is already in use'})
+            container = stub.add_container(name, running=False, config=config)
+            self._reply(201, {'Id': container['Id'], 'Warnings': []})
+
+        def do_GET(self) -> None:
+            self._route('GET')
+
+        def do_POST(self) -> None:
+            self._route('POST')
+
+        def do_PUT(self) -> None:
+            self._route('PUT')
+
+        def do_DELETE(self) -> None:
+            self._route('DELETE')
+
+    return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Заглушка Docker Engine API')
+    parser.add_argument('--port', type=int, default=2375)
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа, секунды')
+    parser.add_argument('--pull-seconds', type=float, default=5.0, help='длительность pull образа')
+    args = parser.parse_args()
+
+    stub = StubDockerServer(latency=args.latency, port=args.port, pull_seconds=args.pull_seconds).start()
+    print(f'Stub Docker API listening on {stub.url}', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,3 @@
+CREATE INDEX IF NOT EXISTS idx_server_logs_server_id_id ON server_logs(server_id, id DESC);
+
+DROP INDEX IF EXISTS idx_server_logs_server_id;
@@ -0,0 +1,52 @@
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS log_retention_days INTEGER CHECK (log_retention_days > 0);
+
+CREATE TABLE IF NOT EXISTS server_log_rollups (
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    day DATE NOT NULL,
+    log_type VARCHAR(50) NOT NULL,
+    lines INTEGER NOT NULL,
+    first_at TIMESTAMP NOT NULL,
+    last_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (server_id, day, log_type)
+);
+
+ALTER TABLE server_logs RENAME TO server_logs_legacy;
+ALTER TABLE server_logs_legacy RENAME CONSTRAINT server_logs_pkey TO server_logs_legacy_pkey;
+ALTER INDEX idx_server_logs_server_id_id RENAME TO idx_server_logs_legacy_server_id_id;
+ALTER SEQUENCE server_logs_id_seq OWNED BY NONE;
+
+CREATE TABLE server_logs (
+    id INTEGER NOT NULL DEFAULT nextval('server_logs_id_seq'),
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    log_type VARCHAR(50) NOT NULL,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE server_logs_id_seq OWNED BY server_logs.id;
+
+CREATE INDEX IF NOT EXISTS idx_server_logs_server_id_id ON server_logs(server_id, id DESC);
+
+CREATE TABLE IF NOT EXISTS server_logs_default PARTITION OF server_logs DEFAULT;
+
+DO $$
+DECLARE
+    day DATE;
+    last_day DATE := CURRENT_DATE + 7;
+BEGIN
+    SELECT COALESCE(MIN(created_at)::date, CURRENT_DATE) INTO day FROM server_logs_legacy;
+    WHILE day <= last_day LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF server_logs FOR VALUES FROM (%L) TO (%L)',
+            'server_logs_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+        );
+        day := day + 1;
+    END LOOP;
+END $$;
+
+INSERT INTO server_logs (id, server_id, log_type, message, created_at)
+SELECT id, server_id, log_type, message, COALESCE(created_at, CURRENT_TIMESTAMP)
+FROM server_logs_legacy;
+
+DROP TABLE server_logs_legacy;
@@ -0,0 +1,22 @@
+CREATE TABLE IF NOT EXISTS container_jobs (
+    id SERIAL PRIMARY KEY,
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    kind VARCHAR(20) NOT NULL DEFAULT 'create' CHECK (kind IN ('create')),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    stage VARCHAR(20) NOT NULL DEFAULT 'queued',
+    progress INTEGER NOT NULL DEFAULT 0 CHECK (progress BETWEEN 0 AND 100),
+    message TEXT,
+    result JSONB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(255),
+    locked_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_container_jobs_queued ON container_jobs(run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_container_jobs_running ON container_jobs(locked_at) WHERE status = 'running';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_container_jobs_active_server
+    ON container_jobs(server_id, kind) WHERE status IN ('queued', 'running');
@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS warm_containers (
+    id SERIAL PRIMARY KEY,
+    edition VARCHAR(20) NOT NULL CHECK (edition IN ('java', 'bedrock')),
+    version VARCHAR(50) NOT NULL,
+    container_id VARCHAR(64) NOT NULL UNIQUE,
+    container_name VARCHAR(255) NOT NULL UNIQUE,
+    port INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_warm_containers_combo ON warm_containers(edition, version, id);
@@ -0,0 +1,37 @@
+CREATE TABLE IF NOT EXISTS port_allocations (
+    docker_host VARCHAR(255) NOT NULL DEFAULT 'default',
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('game', 'rcon')),
+    port INTEGER NOT NULL CHECK (port BETWEEN 1 AND 65535),
+    allocated BOOLEAN NOT NULL DEFAULT false,
+    server_id INTEGER REFERENCES servers(id),
+    allocated_at TIMESTAMP,
+    PRIMARY KEY (docker_host, port)
+);
+
+CREATE INDEX IF NOT EXISTS idx_port_allocations_free
+    ON port_allocations(docker_host, kind, port) WHERE NOT allocated;
+CREATE INDEX IF NOT EXISTS idx_port_allocations_server_id
+    ON port_allocations(server_id) WHERE server_id IS NOT NULL;
+
+INSERT INTO port_allocations (docker_host, kind, port)
+SELECT 'default', 'game', port FROM generate_series(25565, 35564) AS port
+ON CONFLICT DO NOTHING;
+
+INSERT INTO port_allocations (docker_host, kind, port)
+SELECT 'default', 'rcon', port FROM generate_series(35565, 45564) AS port
+ON CONFLICT DO NOTHING;
+
+UPDATE port_allocations pa
+SET allocated = true, server_id = s.id, allocated_at = CURRENT_TIMESTAMP
+FROM (SELECT DISTINCT ON (port) id, port FROM servers WHERE port IS NOT NULL ORDER BY port, id) s
+WHERE pa.docker_host = 'default' AND pa.port = s.port AND NOT pa.allocated;
+
+UPDATE port_allocations pa
+SET allocated = true, server_id = s.id, allocated_at = CURRENT_TIMESTAMP
+FROM (SELECT DISTINCT ON (rcon_port) id, rcon_port FROM servers WHERE rcon_port IS NOT NULL ORDER BY rcon_port, id) s
+WHERE pa.docker_host = 'default' AND pa.port = s.rcon_port AND NOT pa.allocated;
+
+UPDATE port_allocations pa
+SET allocated = true, allocated_at = CURRENT_TIMESTAMP
+FROM warm_containers w
+WHERE pa.docker_host = 'default' AND pa.port = w.port AND NOT pa.allocated;
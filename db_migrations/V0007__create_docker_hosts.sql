@@ -0,0 +1,32 @@
+CREATE TABLE IF NOT EXISTS docker_hosts (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE,
+    url VARCHAR(255),
+    memory_mb INTEGER NOT NULL DEFAULT 16384 CHECK (memory_mb > 0),
+    cpus NUMERIC(6, 2) NOT NULL DEFAULT 8 CHECK (cpus > 0),
+    enabled BOOLEAN NOT NULL DEFAULT true,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO docker_hosts (name, url, memory_mb, cpus) VALUES ('default', NULL, 262144, 128)
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS docker_host_id INTEGER REFERENCES docker_hosts(id);
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS memory_mb INTEGER NOT NULL DEFAULT 2048;
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS cpus NUMERIC(6, 2) NOT NULL DEFAULT 1;
+
+UPDATE servers SET docker_host_id = (SELECT id FROM docker_hosts WHERE name = 'default')
+WHERE docker_host_id IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_servers_docker_host_id ON servers(docker_host_id);
+
+ALTER TABLE warm_containers ADD COLUMN IF NOT EXISTS docker_host_id INTEGER REFERENCES docker_hosts(id);
+
+UPDATE warm_containers SET docker_host_id = (SELECT id FROM docker_hosts WHERE name = 'default')
+WHERE docker_host_id IS NULL;
+
+ALTER TABLE warm_containers ALTER COLUMN docker_host_id SET NOT NULL;
+
+DROP INDEX IF EXISTS idx_warm_containers_combo;
+CREATE INDEX IF NOT EXISTS idx_warm_containers_combo ON warm_containers(docker_host_id, edition, version, id);
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS server_player_snapshots (
+    server_id INTEGER PRIMARY KEY REFERENCES servers(id),
+    reachable BOOLEAN NOT NULL DEFAULT false,
+    players_online INTEGER NOT NULL DEFAULT 0,
+    players_max INTEGER,
+    motd TEXT,
+    latency_ms REAL,
+    polled_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,27 @@
+CREATE TABLE IF NOT EXISTS server_metric_chunks (
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    chunk_start TIMESTAMP NOT NULL,
+    offsets SMALLINT[] NOT NULL DEFAULT '{}',
+    cpu REAL[] NOT NULL DEFAULT '{}',
+    memory_mb REAL[] NOT NULL DEFAULT '{}',
+    tps REAL[] NOT NULL DEFAULT '{}',
+    PRIMARY KEY (server_id, chunk_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_server_metric_chunks_start ON server_metric_chunks(chunk_start);
+
+CREATE TABLE IF NOT EXISTS server_metric_rollups (
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    resolution VARCHAR(2) NOT NULL CHECK (resolution IN ('1m', '1h')),
+    bucket TIMESTAMP NOT NULL,
+    samples INTEGER NOT NULL,
+    cpu_avg REAL,
+    cpu_max REAL,
+    memory_avg REAL,
+    memory_max REAL,
+    tps_avg REAL,
+    tps_min REAL,
+    PRIMARY KEY (server_id, resolution, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_server_metric_rollups_bucket ON server_metric_rollups(resolution, bucket);
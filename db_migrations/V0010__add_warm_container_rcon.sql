@@ -0,0 +1,2 @@
+ALTER TABLE warm_containers ADD COLUMN IF NOT EXISTS rcon_port INTEGER;
+ALTER TABLE warm_containers ADD COLUMN IF NOT EXISTS rcon_password VARCHAR(255);
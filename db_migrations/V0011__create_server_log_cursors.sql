@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS server_log_cursors (
+    server_id INTEGER PRIMARY KEY REFERENCES servers(id),
+    since_ns BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,54 @@
+CREATE TABLE IF NOT EXISTS server_events (
+    id BIGSERIAL PRIMARY KEY,
+    server_id INTEGER NOT NULL,
+    user_id VARCHAR(255) NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_server_events_user_id_id ON server_events(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_server_events_created_at ON server_events(created_at);
+
+-- Уведомление несёт только user_id: одинаковые NOTIFY в одной транзакции PostgreSQL схлопывает сам
+CREATE OR REPLACE FUNCTION server_status_event() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO server_events (server_id, user_id, kind, payload)
+    VALUES (NEW.id, NEW.user_id, 'status', jsonb_build_object('status', NEW.status, 'previous', OLD.status));
+    PERFORM pg_notify('server_events', NEW.user_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS servers_status_event ON servers;
+CREATE TRIGGER servers_status_event
+AFTER UPDATE OF status ON servers
+FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION server_status_event();
+
+-- Одно событие на сервер за вставку: COPY пачки логов даёт столько событий, сколько в ней серверов
+CREATE OR REPLACE FUNCTION server_logs_event() RETURNS trigger AS $$
+DECLARE
+    users TEXT;
+BEGIN
+    WITH inserted AS (
+        INSERT INTO server_events (server_id, user_id, kind, payload)
+        SELECT n.server_id, s.user_id, 'logs', jsonb_build_object('lastId', MAX(n.id), 'lines', COUNT(*))
+        FROM new_logs n JOIN servers s ON s.id = n.server_id
+        GROUP BY n.server_id, s.user_id
+        RETURNING user_id
+    )
+    SELECT string_agg(DISTINCT user_id, ',') INTO users FROM inserted;
+    IF users IS NOT NULL THEN
+        PERFORM pg_notify('server_events', CASE WHEN length(users) > 7000 THEN '*' ELSE users END);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS server_logs_event ON server_logs;
+CREATE TRIGGER server_logs_event
+AFTER INSERT ON server_logs
+REFERENCING NEW TABLE AS new_logs
+FOR EACH STATEMENT
+EXECUTE FUNCTION server_logs_event();
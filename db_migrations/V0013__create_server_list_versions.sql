@@ -0,0 +1,54 @@
+-- Версия списка серверов пользователя: кэш get_servers сверяет её одним чтением по ключу.
+-- Триггеры уровня оператора: массовое обновление статусов увеличивает версию один раз на пользователя.
+CREATE TABLE IF NOT EXISTS server_list_versions (
+    user_id VARCHAR(255) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_server_list_version() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO server_list_versions (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM new_servers
+        ON CONFLICT (user_id) DO UPDATE SET version = server_list_versions.version + 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO server_list_versions (user_id, version)
+        SELECT DISTINCT user_id, 1 FROM old_servers
+        ON CONFLICT (user_id) DO UPDATE SET version = server_list_versions.version + 1;
+    ELSE
+        -- Только изменения полей, которые попадают в список (не updated_at, не пароль RCON)
+        INSERT INTO server_list_versions (user_id, version)
+        SELECT DISTINCT u.user_id, 1 FROM (
+            SELECT n.user_id FROM new_servers n JOIN old_servers o ON o.id = n.id
+            WHERE (n.user_id, n.name, n.server_ip, n.edition, n.version, n.max_players, n.status, n.port)
+                IS DISTINCT FROM (o.user_id, o.name, o.server_ip, o.edition, o.version, o.max_players, o.status, o.port)
+            UNION
+            SELECT o.user_id FROM new_servers n JOIN old_servers o ON o.id = n.id
+            WHERE n.user_id IS DISTINCT FROM o.user_id
+        ) u
+        ON CONFLICT (user_id) DO UPDATE SET version = server_list_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS servers_list_version_insert ON servers;
+CREATE TRIGGER servers_list_version_insert
+AFTER INSERT ON servers
+REFERENCING NEW TABLE AS new_servers
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_server_list_version();
+
+DROP TRIGGER IF EXISTS servers_list_version_update ON servers;
+CREATE TRIGGER servers_list_version_update
+AFTER UPDATE ON servers
+REFERENCING OLD TABLE AS old_servers NEW TABLE AS new_servers
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_server_list_version();
+
+DROP TRIGGER IF EXISTS servers_list_version_delete ON servers;
+CREATE TRIGGER servers_list_version_delete
+AFTER DELETE ON servers
+REFERENCING OLD TABLE AS old_servers
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_server_list_version();
@@ -0,0 +1,14 @@
+-- Спящий сервер: контейнер остановлен (stop) или заморожен (pause), пока никто не заходит
+ALTER TABLE servers DROP CONSTRAINT IF EXISTS servers_status_check;
+ALTER TABLE servers ADD CONSTRAINT servers_status_check
+    CHECK (status IN ('online', 'offline', 'starting', 'stopping', 'sleeping'));
+
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS auto_hibernate BOOLEAN NOT NULL DEFAULT true;
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS hibernated_at TIMESTAMP;
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS hibernation_mode VARCHAR(10)
+    CHECK (hibernation_mode IN ('stop', 'pause'));
+-- Память контейнера в момент усыпления: столько освобождает остановленный сервер
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS hibernated_memory_mb INTEGER;
+
+-- Последний опрос, в котором на сервере были игроки; первая строка снимка считается активностью
+ALTER TABLE server_player_snapshots ADD COLUMN IF NOT EXISTS last_active_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
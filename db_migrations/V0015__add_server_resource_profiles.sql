@@ -0,0 +1,15 @@
+-- Профиль ресурсов сервера: memory_mb и cpus — лимиты cgroup контейнера и резерв на хосте,
+-- heap_mb — куча JVM (MEMORY образа itzg), у Bedrock NULL
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS resource_profile VARCHAR(20) NOT NULL DEFAULT 'custom';
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS heap_mb INTEGER CHECK (heap_mb > 0);
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS jvm_gc VARCHAR(20) CHECK (jvm_gc IN ('aikar', 'default'));
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS view_distance INTEGER CHECK (view_distance BETWEEN 2 AND 64);
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS simulation_distance INTEGER CHECK (simulation_distance BETWEEN 2 AND 32);
+
+-- Существующие Java контейнеры запущены с MEMORY = memory_mb: куча сохраняется, а лимит
+-- и резерв получают запас под память вне кучи (max(512 МБ, 25%), кратно 256 МБ)
+UPDATE servers SET
+    heap_mb = memory_mb,
+    jvm_gc = 'default',
+    memory_mb = ((memory_mb + GREATEST(512, memory_mb / 4) + 255) / 256) * 256
+WHERE edition = 'java' AND heap_mb IS NULL;
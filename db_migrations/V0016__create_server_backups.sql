@@ -0,0 +1,28 @@
+-- Бэкапы миров: содержимое лежит в хранилище кусков (BACKUP_STORE_DIR), здесь — ключ манифеста и статистика
+CREATE TABLE IF NOT EXISTS server_backups (
+    id SERIAL PRIMARY KEY,
+    server_id INTEGER NOT NULL REFERENCES servers(id),
+    job_id INTEGER REFERENCES container_jobs(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'succeeded', 'failed')),
+    -- sha256 манифеста в хранилище
+    manifest CHAR(64),
+    -- save-off (RCON), paused (контейнер заморожен) или stopped
+    consistency VARCHAR(20),
+    file_count INTEGER,
+    total_bytes BIGINT,
+    chunk_count INTEGER,
+    new_chunks INTEGER,
+    new_bytes BIGINT,
+    stored_bytes BIGINT,
+    elapsed_ms INTEGER,
+    message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_server_backups_server ON server_backups(server_id, id DESC);
+
+-- Бэкап и восстановление идут через ту же очередь, что и создание контейнера
+ALTER TABLE container_jobs DROP CONSTRAINT IF EXISTS container_jobs_kind_check;
+ALTER TABLE container_jobs ADD CONSTRAINT container_jobs_kind_check CHECK (kind IN ('create', 'backup', 'restore'));
+ALTER TABLE container_jobs ADD COLUMN IF NOT EXISTS params JSONB;
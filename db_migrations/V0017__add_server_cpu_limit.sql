@@ -0,0 +1,14 @@
+-- Предел CPU контейнера (NanoCpus) отдельно от резерва на хосте (servers.cpus, по нему считает планировщик):
+-- небольшие серверы простаивают, и резерв в долю ядра позволяет поставить на хост больше серверов
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS cpu_limit NUMERIC(6, 2) CHECK (cpu_limit > 0);
+
+-- Предел остаётся прежним, резерв серверов с профилем — по новой таблице профилей
+UPDATE servers SET cpu_limit = cpus WHERE cpu_limit IS NULL;
+UPDATE servers SET cpus = CASE resource_profile
+        WHEN 'small' THEN 0.25
+        WHEN 'medium' THEN 0.5
+        WHEN 'large' THEN 1.0
+        WHEN 'xlarge' THEN 2.0
+        WHEN 'huge' THEN 3.0
+    END
+WHERE resource_profile IN ('small', 'medium', 'large', 'xlarge', 'huge');
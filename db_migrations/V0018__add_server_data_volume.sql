@@ -0,0 +1,3 @@
+-- Имя тома /data сервера. Тёплый контейнер приносит свой том, восстановление из бэкапа создаёт новый:
+-- пересоздание контейнера монтирует том из этой колонки, NULL — том по умолчанию minecraft-data-<id>
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS data_volume VARCHAR(255);
@@ -0,0 +1,33 @@
+-- Онлайн игроков входит в кэшированный список серверов: опрос, изменивший число игроков или доступность,
+-- увеличивает версию списка владельца. Задержка не сравнивается: она меняется каждый опрос и обновляется вместе со списком.
+CREATE OR REPLACE FUNCTION bump_server_list_version_players() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO server_list_versions (user_id, version)
+        SELECT DISTINCT s.user_id, 1 FROM new_snapshots n JOIN servers s ON s.id = n.server_id
+        ON CONFLICT (user_id) DO UPDATE SET version = server_list_versions.version + 1;
+    ELSE
+        INSERT INTO server_list_versions (user_id, version)
+        SELECT DISTINCT s.user_id, 1 FROM new_snapshots n
+        JOIN old_snapshots o ON o.server_id = n.server_id
+        JOIN servers s ON s.id = n.server_id
+        WHERE (n.reachable, n.players_online) IS DISTINCT FROM (o.reachable, o.players_online)
+        ON CONFLICT (user_id) DO UPDATE SET version = server_list_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS player_snapshots_list_version_insert ON server_player_snapshots;
+CREATE TRIGGER player_snapshots_list_version_insert
+AFTER INSERT ON server_player_snapshots
+REFERENCING NEW TABLE AS new_snapshots
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_server_list_version_players();
+
+DROP TRIGGER IF EXISTS player_snapshots_list_version_update ON server_player_snapshots;
+CREATE TRIGGER player_snapshots_list_version_update
+AFTER UPDATE ON server_player_snapshots
+REFERENCING OLD TABLE AS old_snapshots NEW TABLE AS new_snapshots
+FOR EACH STATEMENT
+EXECUTE FUNCTION bump_server_list_version_players();
@@ -11,7 +11,7 @@ import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle, Di
 import { Checkbox } from '@/components/ui/checkbox';
 import Icon from '@/components/ui/icon';
 
-type ServerStatus = 'online' | 'offline' | 'starting';
+type ServerStatus = 'online' | 'offline' | 'starting' | 'sleeping';
 type ServerEdition = 'java' | 'bedrock';
 
 interface Server {
@@ -56,6 +56,52 @@ const Index = () => {
     fetchServers();
   }, []);
 
+  useEffect(() => {
+    let active = true;
+    let cursor: number | null = null;
+
+    const subscribe = async () => {
+      while (active) {
+        try {
+          const query = cursor === null ? '' : `&cursor=${cursor}&wait=25`;
+          const response = await fetch(`${LOGS_API_URL}?view=events${query}`, {
+            headers: {
+              'X-User-Id': USER_ID
+            }
+          });
+          const data = await response.json();
+          if (!response.ok || typeof data.cursor !== 'number') {
+            throw new Error(data.error || `HTTP ${response.status}`);
+          }
+          cursor = data.cursor;
+
+          if (data.reset) {
+            fetchServers();
+            continue;
+          }
+
+          const statuses = new Map<string, ServerStatus>();
+          for (const event of data.events || []) {
+            if (event.type === 'status' && ['online', 'offline', 'starting', 'sleeping'].includes(event.data.status)) {
+              statuses.set(String(event.serverId), event.data.status);
+            }
+          }
+          if (statuses.size) {
+            setServers(prev => prev.map(s => statuses.has(s.id) ? { ...s, status: statuses.get(s.id)! } : s));
+          }
+        } catch (error) {
+          console.error('Event subscription failed:', error);
+          await new Promise(resolve => setTimeout(resolve, 5000));
+        }
+      }
+    };
+
+    subscribe();
+    return () => {
+      active = false;
+    };
+  }, []);
+
   const fetchServers = async () => {
     setLoading(true);
     try {
@@ -117,6 +163,8 @@ const Index = () => {
           
           if (dockerData.simulation) {
             alert(`Сервер создан!\n\nРежим симуляции: данные сохранены в БД.\nДля реального запуска нужен Docker хост.`);
+          } else if (dockerResponse.status === 202) {
+            alert(`Сервер создан!\nКонтейнер создаётся в фоне (задача #${dockerData.jobId}), порт: ${dockerData.port}`);
           } else {
             alert(`Сервер создан и запущен!\nПорт: ${dockerData.port}\nContainer ID: ${dockerData.containerId}`);
           }
@@ -153,6 +201,8 @@ const Index = () => {
         return 'bg-gray-400';
       case 'starting':
         return 'bg-yellow-500';
+      case 'sleeping':
+        return 'bg-blue-400';
     }
   };
 
@@ -164,6 +214,8 @@ const Index = () => {
         return 'Оффлайн';
       case 'starting':
         return 'Запускается';
+      case 'sleeping':
+        return 'Спит';
     }
   };
 
@@ -219,10 +271,37 @@ const Index = () => {
     }
   };
 
-  const executeRconCommand = () => {
-    if (rconCommand.trim()) {
-      setConsoleLog(prev => [...prev, `> ${rconCommand}`, '[INFO] Command executed']);
-      setRconCommand('');
+  const executeRconCommand = async () => {
+    const command = rconCommand.trim();
+    if (!command || !selectedServer) return;
+    
+    setConsoleLog(prev => [...prev, `> ${command}`]);
+    setRconCommand('');
+    
+    try {
+      const response = await fetch(DOCKER_API_URL, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+          serverId: selectedServer.id,
+          action: 'command',
+          command
+        })
+      });
+      
+      const data = await response.json();
+      
+      if (response.ok) {
+        const lines = (data.output || '').split('\n').filter((line: string) => line.trim());
+        setConsoleLog(prev => [...prev, ...(lines.length ? lines : ['[INFO] Command executed'])]);
+      } else {
+        setConsoleLog(prev => [...prev, `[ERROR] ${data.error || 'Command failed'}`]);
+      }
+    } catch (error) {
+      console.error('Failed to execute command:', error);
+      setConsoleLog(prev => [...prev, '[ERROR] Не удалось выполнить команду']);
     }
   };
 